@@ -0,0 +1,80 @@
+"""
+Compare async search latency with a session per call and a pooled session.
+
+Runs against a local stand-in server, so it measures client-side overhead only:
+connection setup, request handling and response parsing. Against a real Vespa
+Cloud endpoint the gap is larger, as each new session also pays for a TLS
+handshake.
+
+Usage: python benchmarks/bench_async_session.py [--queries 200]
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+from stand_in import stand_in_vespa
+
+from cpr_sdk.models.search import SearchParameters
+from cpr_sdk.search_adaptors import VespaSearchAdapter
+from cpr_sdk.vespa import build_vespa_request_body, parse_vespa_response
+
+SESSION_KWARGS = {"http2_only": False}
+
+
+async def per_call_sessions(adaptor: VespaSearchAdapter, n: int) -> list[float]:
+    """Latencies when every query opens and closes its own session"""
+    body = build_vespa_request_body(SearchParameters(query_string="the"))
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        async with adaptor.client.asyncio(**SESSION_KWARGS) as session:
+            parse_vespa_response(await session.query(body=body))
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+async def pooled_session(adaptor: VespaSearchAdapter, n: int) -> list[float]:
+    """Latencies when every query goes through the adaptor's pooled session"""
+    parameters = SearchParameters(query_string="the")
+    latencies = []
+    async with adaptor:
+        for _ in range(n):
+            start = time.perf_counter()
+            await adaptor.async_search(parameters)
+            latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def report(name: str, latencies: list[float], connections: int) -> None:
+    """Print a one line latency summary"""
+    ms = sorted(latency * 1000 for latency in latencies)
+    p99 = ms[min(len(ms) - 1, int(len(ms) * 0.99))]
+    print(
+        f"{name:<20} mean {statistics.mean(ms):7.2f}ms  "
+        f"p50 {statistics.median(ms):7.2f}ms  p99 {p99:7.2f}ms  "
+        f"connections {connections}"
+    )
+
+
+def main() -> None:
+    """Run both modes against the same stand-in server"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    for name, run in [
+        ("per-call sessions", per_call_sessions),
+        ("pooled session", pooled_session),
+    ]:
+        with stand_in_vespa() as server:
+            adaptor = VespaSearchAdapter(
+                server.url, skip_cert_usage=True, async_session_kwargs=SESSION_KWARGS
+            )
+            latencies = asyncio.run(run(adaptor, args.queries))
+            report(name, latencies, server.connection_count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,271 @@
+"""
+Measure each stage of a search's hot path, and compare it against a saved baseline.
+
+Times building YQL and request bodies for a few typical searches, then decoding and
+parsing a synthetic grouped response (see `synthetic_responses.py`), building its
+hits one by one, and comparing parsed responses, reporting for each stage:
+- operations per second, where an operation is one query, response or hit
+- the most memory allocated at once during an operation, by tracemalloc
+- how much memory an operation's result keeps allocated afterwards
+
+Everything runs offline. Save a baseline on one commit with `--save-baseline`, then
+`--compare` against it on another; comparing exits non-zero if any stage is slower,
+or allocates more, by more than the tolerance. Timings are only comparable on the
+same machine with the same response size.
+
+Usage: python benchmarks/bench_hot_path.py [--families 1000] [--passages 10]
+    [--save-baseline baseline.json] [--compare baseline.json] [--tolerance 0.2]
+"""
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from typing import Any, Callable
+
+from synthetic_responses import synthetic_response
+
+from cpr_sdk.models.search import (
+    ConceptV2DocumentFilter,
+    ConceptV2PassageFilter,
+    Filters,
+    Hit,
+    MetadataFilter,
+    OperandTypeEnum,
+    SearchParameters,
+)
+from cpr_sdk.vespa import (
+    build_vespa_request_body,
+    decode_vespa_response,
+    encode_vespa_request_body,
+    parse_vespa_response,
+)
+from cpr_sdk.yql_builder import YQLBuilder, _compiled, _compiled_where_clause
+
+# Searches typical of the traffic the client sees
+SEARCHES = {
+    "browse": SearchParameters(
+        query_string="", filters=Filters(family_geography=["MHL"]), sort_by="date"
+    ),
+    "search": SearchParameters(
+        query_string="energy policy",
+        filters=Filters(family_category=["Executive"], document_languages=["English"]),
+        metadata=[MetadataFilter(name="family.sector", value="Price")],
+        year_range=(2010, 2020),
+    ),
+    "concepts": SearchParameters(
+        query_string="floods",
+        concept_v2_passage_filters=[
+            ConceptV2PassageFilter(concept_id="y28e4s6n", classifier_id="kx7m3p9w"),
+            ConceptV2PassageFilter(concept_wikibase_id="Q374", negate=True),
+        ],
+        concept_v2_document_filters=[
+            ConceptV2DocumentFilter(
+                concept_wikibase_id="Q100", count=5, operand=OperandTypeEnum(">")
+            )
+        ],
+    ),
+    "1000 family ids": SearchParameters(
+        query_string="adaptation",
+        family_ids=[f"CCLW.family.{i}.0" for i in range(1000)],
+    ),
+}
+
+
+@dataclass
+class StageResult:
+    """How one stage of the hot path performed"""
+
+    ops_per_s: float
+    peak_kb: float
+    kept_kb: float
+
+
+def ops_per_second(
+    function: Callable[[], Any], ops: int, repeats: int, min_time_s: float
+) -> float:
+    """
+    The best rate of several timed runs of a function
+
+    Each run calls the function repeatedly for at least `min_time_s` seconds.
+
+    :param int ops: how many operations each call of the function is
+    """
+    calls = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        if time.perf_counter() - start >= min_time_s:
+            break
+        calls *= 2
+    best_s = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(calls):
+            function()
+        best_s = min(best_s, time.perf_counter() - start)
+    return calls * ops / best_s
+
+
+def memory_kb(function: Callable[[], Any], ops: int) -> tuple[float, float]:
+    """
+    Memory allocated by a function per operation, in kilobytes
+
+    :return tuple[float, float]: the most allocated at once during the call, and
+        how much its result keeps allocated afterwards
+    """
+    tracemalloc.start()
+    try:
+        result = function()
+        kept, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak / 1e3 / ops, kept / 1e3 / ops
+
+
+def uncached_yql(parameters: SearchParameters) -> str:
+    """Build a search's YQL without the memoised parts of earlier searches"""
+    _compiled.cache_clear()
+    _compiled_where_clause.cache_clear()
+    return YQLBuilder(parameters).to_str()
+
+
+def stages(n_families: int, passages_per_family: int) -> dict[str, tuple]:
+    """Each stage of the hot path, as a function and how many operations it is"""
+    content = encode_vespa_request_body(
+        synthetic_response(n_families, passages_per_family)
+    )
+    vespa_response = decode_vespa_response(content, status_code=200, url="")
+    hits = [
+        hit
+        for family in vespa_response.json["root"]["children"][0]["children"][0][
+            "children"
+        ]
+        for hit in family["children"][0]["children"]
+    ]
+    validated = parse_vespa_response(vespa_response)
+    trusted = parse_vespa_response(vespa_response, trusted=True)
+    assert validated == trusted, "trusted parse differs from validated parse"
+
+    hot_path: dict[str, tuple] = {}
+    for name, parameters in SEARCHES.items():
+        hot_path[f"YQLBuilder.to_str, {name}"] = (
+            lambda parameters=parameters: YQLBuilder(parameters).to_str(),
+            1,
+        )
+    hot_path["YQLBuilder.to_str, 1000 family ids, uncached"] = (
+        lambda: uncached_yql(SEARCHES["1000 family ids"]),
+        1,
+    )
+    for name, parameters in SEARCHES.items():
+        hot_path[f"build_vespa_request_body, {name}"] = (
+            lambda parameters=parameters: build_vespa_request_body(parameters),
+            1,
+        )
+    hot_path |= {
+        "decode_vespa_response": (
+            lambda: decode_vespa_response(content, status_code=200, url=""),
+            1,
+        ),
+        "parse_vespa_response": (lambda: parse_vespa_response(vespa_response), 1),
+        "parse_vespa_response, trusted": (
+            lambda: parse_vespa_response(vespa_response, trusted=True),
+            1,
+        ),
+        "Hit.from_vespa_response": (
+            lambda: [Hit.from_vespa_response(hit) for hit in hits],
+            len(hits),
+        ),
+        "Hit.from_trusted_vespa_response": (
+            lambda: [Hit.from_trusted_vespa_response(hit) for hit in hits],
+            len(hits),
+        ),
+        "SearchResponse.__eq__": (lambda: validated == trusted, 1),
+    }
+    return hot_path
+
+
+def change(now: float, then: float) -> float:
+    """The relative change from a baseline value"""
+    return (now - then) / then if then else 0.0
+
+
+def main() -> None:
+    """Time each stage, then save or compare against a baseline"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--families", type=int, default=1000)
+    parser.add_argument("--passages", type=int, default=10)
+    parser.add_argument("--repeats", type=int, default=3)
+    parser.add_argument("--min-time", type=float, default=0.2, dest="min_time_s")
+    parser.add_argument("--save-baseline", help="a file to save the results to")
+    parser.add_argument("--compare", help="a baseline file to compare against")
+    parser.add_argument(
+        "--tolerance",
+        type=float,
+        default=0.2,
+        help="the relative slowdown or growth in memory counted as a regression",
+    )
+    args = parser.parse_args()
+
+    setup = {
+        "families": args.families,
+        "passages": args.passages,
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        if baseline["setup"] != setup:
+            print(f"warning: the baseline was run with {baseline['setup']}")
+
+    hits = args.families * (args.passages + 1)
+    print(f"{args.families} families, {hits} hits")
+    results: dict[str, StageResult] = {}
+    regressions = []
+    for name, (function, ops) in stages(args.families, args.passages).items():
+        peak_kb, kept_kb = memory_kb(function, ops)
+        result = StageResult(
+            ops_per_second(function, ops, args.repeats, args.min_time_s),
+            peak_kb,
+            kept_kb,
+        )
+        results[name] = result
+        line = (
+            f"{name:<45}{result.ops_per_s:14,.0f} ops/s"
+            f"{result.peak_kb:12.1f}KB peak{result.kept_kb:12.1f}KB kept"
+        )
+        then = baseline["stages"].get(name) if baseline else None
+        if then is not None:
+            speed = change(result.ops_per_s, then["ops_per_s"])
+            memory = change(result.peak_kb, then["peak_kb"])
+            line += f"{speed:+9.1%} ops/s{memory:+9.1%} peak"
+            if speed < -args.tolerance or memory > args.tolerance:
+                regressions.append(name)
+                line += "  REGRESSED"
+        print(line)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w") as f:
+            json.dump(
+                {
+                    "setup": setup,
+                    "stages": {name: asdict(r) for name, r in results.items()},
+                },
+                f,
+                indent=2,
+            )
+        print(f"saved a baseline to {args.save_baseline}")
+    if regressions:
+        print(f"{len(regressions)} stages regressed by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Measure indexing time and search latency of the in-memory local search adaptor.
+
+Builds a synthetic dataset of documents with a handful of text blocks each, drawn
+from a small vocabulary so that common terms match many passages, then runs a mix
+of queries against it.
+
+Usage: python benchmarks/bench_local_search.py [--documents 20000] [--queries 200]
+"""
+
+import argparse
+import datetime
+import random
+import statistics
+import time
+
+from cpr_sdk.local_search import LocalSearchAdapter
+from cpr_sdk.models import CPRDocument, CPRDocumentMetadata, Dataset, TextBlock
+from cpr_sdk.models.search import Filters, SearchParameters
+from cpr_sdk.parser_models import BlockType
+
+WORDS = (
+    "climate adaptation mitigation emissions energy renewable solar wind forest "
+    "flood drought carbon tax transport agriculture water coastal biodiversity "
+    "finance resilience methane coal electricity buildings efficiency targets "
+    "national strategy policy law framework action plan reduction sector"
+).split()
+QUERIES = ["forest", "carbon tax", "renewable energy targets", "flood resilience"]
+GEOGRAPHIES = ["GBR", "FRA", "BRA", "IND", "USA", "KEN"]
+
+
+def synthetic_dataset(n_documents: int, blocks_per_document: int) -> Dataset:
+    """A dataset of random documents from a small vocabulary"""
+    rng = random.Random(0)
+    documents = []
+    for i in range(n_documents):
+        blocks = [
+            TextBlock(
+                text=[" ".join(rng.choices(WORDS, k=rng.randint(10, 60)))],
+                text_block_id=f"b{j}",
+                type=BlockType.TEXT,
+                type_confidence=1.0,
+                page_number=-1,
+            )
+            for j in range(blocks_per_document)
+        ]
+        name = " ".join(rng.choices(WORDS, k=4))
+        geography = rng.choice(GEOGRAPHIES)
+        documents.append(
+            CPRDocument(
+                document_id=f"CCLW.executive.{i}.0",
+                document_name=name,
+                document_description=" ".join(rng.choices(WORDS, k=20)),
+                document_slug=f"document-{i}",
+                document_content_type="text/html",
+                languages=["en"],
+                translated=False,
+                has_valid_text=True,
+                text_blocks=blocks,
+                document_metadata=CPRDocumentMetadata(
+                    geography=geography,
+                    geography_iso=geography,
+                    slug=f"family-{i}",
+                    category="Executive",
+                    source="CCLW",
+                    type="Law",
+                    sectors=[],
+                    family_id=f"CCLW.family.{i}.0",
+                    family_name=name,
+                    family_slug=f"family-{i}",
+                    status="PUBLISHED",
+                    publication_ts=datetime.datetime(rng.randint(1990, 2024), 1, 1),
+                ),
+            )
+        )
+    return Dataset(document_model=CPRDocument, documents=documents)
+
+
+def main() -> None:
+    """Index a synthetic dataset and time queries against it"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--documents", type=int, default=20_000)
+    parser.add_argument("--blocks", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=200)
+    args = parser.parse_args()
+
+    dataset = synthetic_dataset(args.documents, args.blocks)
+    start = time.perf_counter()
+    adaptor = LocalSearchAdapter(dataset)
+    print(
+        f"indexed {args.documents} documents, {args.documents * args.blocks} "
+        f"passages in {time.perf_counter() - start:.2f}s"
+    )
+
+    for name, filters in [
+        ("unfiltered", None),
+        ("filtered", Filters(family_geography=["GBR", "FRA"])),
+    ]:
+        latencies = []
+        for i in range(args.queries):
+            parameters = SearchParameters(
+                query_string=QUERIES[i % len(QUERIES)], filters=filters
+            )
+            start = time.perf_counter()
+            adaptor.search(parameters)
+            latencies.append((time.perf_counter() - start) * 1000)
+        latencies.sort()
+        p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+        print(
+            f"{name:<12} mean {statistics.mean(latencies):7.2f}ms  "
+            f"p50 {statistics.median(latencies):7.2f}ms  p99 {p99:7.2f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Measure decoding and parsing of a large vespa search response.
+
+Builds a synthetic grouped search response (see `synthetic_responses.py`) with as
+many families and passages as asked for, then times decoding it with the standard
+library and with orjson (if installed), and parsing it with and without pydantic
+validation, with hits projected to a few fields, lazily, and streamed a family at
+a time.
+Lazy parses are timed reading only the family IDs and each family's first hit, as
+many callers do, and streamed ones reading each family then letting it go.
+
+Usage: python benchmarks/bench_parse.py [--families 200] [--passages 500]
+"""
+
+import argparse
+import json
+import time
+import tracemalloc
+from typing import Any, Callable, Iterator
+
+from synthetic_responses import synthetic_response
+from vespa.io import VespaQueryResponse
+
+from cpr_sdk.models.search import SearchParameters, SearchResponse
+from cpr_sdk.search_streaming import SearchResponseStream
+from cpr_sdk.vespa import (
+    _loads,
+    build_vespa_request_body,
+    decode_vespa_response,
+    encode_vespa_request_body,
+    parse_vespa_response,
+    summary_field_projection,
+)
+
+STREAM_CHUNK_BYTES = 64 * 1024
+# The fields projected parses build hits with, as e.g. a list of results might
+PROJECTED_FIELDS = summary_field_projection(
+    build_vespa_request_body(
+        SearchParameters(summary_fields=["family_name", "document_import_id"])
+    )
+)
+
+
+def best_of(repeats: int, function: Callable[[], Any]) -> float:
+    """The fastest of several timed calls, in seconds"""
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def memory_mb(function: Callable[[], Any]) -> tuple[float, float]:
+    """
+    Memory allocated by a function, in megabytes
+
+    :return tuple[float, float]: the most allocated at once during the call, and
+        how much its result keeps allocated afterwards
+    """
+    tracemalloc.start()
+    try:
+        result = function()
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    del result
+    return peak / 1e6, retained / 1e6
+
+
+def read_first_hits(response: SearchResponse) -> list[tuple[str, Any]]:
+    """Read each family's ID and first hit, as many callers do"""
+    return [(family.id, family.hits[0]) for family in response.results]
+
+
+def with_first_hits_read(response: SearchResponse) -> SearchResponse:
+    """A response, once each family's ID and first hit have been read"""
+    read_first_hits(response)
+    return response
+
+
+def in_chunks(content: bytes) -> Iterator[bytes]:
+    """A response body in chunks, as it's read from the network"""
+    for start in range(0, len(content), STREAM_CHUNK_BYTES):
+        yield content[start : start + STREAM_CHUNK_BYTES]
+
+
+def count_streamed_families(content: bytes, trusted: bool = False) -> int:
+    """Stream the families in a response body, keeping none of them"""
+    return sum(1 for _ in SearchResponseStream(in_chunks(content), trusted=trusted))
+
+
+def main() -> None:
+    """Time decoding and parsing a synthetic response"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--families", type=int, default=200)
+    parser.add_argument("--passages", type=int, default=500)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    content = encode_vespa_request_body(
+        synthetic_response(args.families, args.passages)
+    )
+    vespa_response = decode_vespa_response(content, status_code=200, url="")
+    hits = args.families * (args.passages + 1)
+    print(f"{hits} hits, {len(content) / 1e6:.1f}MB of JSON")
+
+    decoders = {"json": json.loads, "orjson if installed": _loads}
+    for name, decode in decoders.items():
+        seconds = best_of(args.repeats, lambda: decode(content))
+        print(f"decode with {name:<20}{seconds * 1000:10.1f}ms")
+
+    validated = parse_vespa_response(vespa_response)
+    trusted = parse_vespa_response(vespa_response, trusted=True)
+    assert trusted == validated, "trusted parse differs from validated parse"
+    lazy = parse_vespa_response(vespa_response, lazy=True)
+    assert read_first_hits(lazy) == read_first_hits(validated)
+
+    parses: dict[str, Callable[[VespaQueryResponse], Any]] = {
+        "validated": lambda response: parse_vespa_response(response),
+        "trusted": lambda response: parse_vespa_response(response, trusted=True),
+        "validated, projected": lambda response: parse_vespa_response(
+            response, summary_fields=PROJECTED_FIELDS
+        ),
+        "lazy, first hits": lambda response: with_first_hits_read(
+            parse_vespa_response(response, lazy=True)
+        ),
+        "lazy trusted, first hits": lambda response: with_first_hits_read(
+            parse_vespa_response(response, trusted=True, lazy=True)
+        ),
+    }
+    print(
+        "Memory is measured decoding as well as parsing, and kept is what the "
+        "parsed response holds on to once the decoded JSON isn't needed"
+    )
+    for name, parse in parses.items():
+        seconds = best_of(args.repeats, lambda: parse(vespa_response))
+        peak_mb, kept_mb = memory_mb(
+            lambda: parse(decode_vespa_response(content, status_code=200, url=""))
+        )
+        print(
+            f"parse {name:<26}{seconds * 1000:10.1f}ms"
+            f"{peak_mb:10.1f}MB peak{kept_mb:10.1f}MB kept"
+        )
+
+    # Streamed parses decode as they go, so are timed decoding too
+    streams: dict[str, Callable[[], Any]] = {
+        "streamed, every family": lambda: count_streamed_families(content),
+        "streamed trusted": lambda: count_streamed_families(content, trusted=True),
+    }
+    for name, stream in streams.items():
+        seconds = best_of(args.repeats, stream)
+        peak_mb, kept_mb = memory_mb(stream)
+        print(
+            f"parse {name:<26}{seconds * 1000:10.1f}ms"
+            f"{peak_mb:10.1f}MB peak{kept_mb:10.1f}MB kept"
+        )
+
+
+if __name__ == "__main__":
+    main()
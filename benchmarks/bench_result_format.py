@@ -0,0 +1,80 @@
+"""
+Compare vespa's JSON and CBOR result formats, by payload size and decode time.
+
+Reads the responses in a recording made with `RecordingSearchAdapter`, or if none
+is given, a synthetic one from `synthetic_responses.py`. Each is re-encoded as CBOR,
+as vespa would send it with `result_format="cbor"`, then decoded both ways, checking
+that they parse to the same results.
+
+Usage: python benchmarks/bench_result_format.py [--recording recording.sqlite]
+"""
+
+import argparse
+import json
+
+import cbor2
+from bench_parse import best_of
+from synthetic_responses import synthetic_response
+
+from cpr_sdk.search_recording import RecordingStore
+from cpr_sdk.vespa import (
+    _loads,
+    decode_vespa_response,
+    encode_vespa_request_body,
+    parse_vespa_response,
+)
+
+
+def recorded_responses(path: str) -> list[bytes]:
+    """The JSON bodies of every response in a recording"""
+    store = RecordingStore(path)
+    try:
+        responses = []
+        for vespa_request_body in store.request_bodies():
+            recorded = store.get(vespa_request_body)
+            if recorded is not None and recorded.status_code == 200:
+                responses.append(recorded.content)
+        return responses
+    finally:
+        store.close()
+
+
+def main() -> None:
+    """Time decoding each response as JSON and as CBOR"""
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--recording", help="a recording to read responses from")
+    parser.add_argument("--families", type=int, default=100)
+    parser.add_argument("--passages", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=5)
+    args = parser.parse_args()
+
+    if args.recording:
+        json_bodies = recorded_responses(args.recording)
+    else:
+        json_bodies = [
+            encode_vespa_request_body(synthetic_response(args.families, args.passages))
+        ]
+    cbor_bodies = [cbor2.dumps(json.loads(body)) for body in json_bodies]
+    for json_body, cbor_body in zip(json_bodies, cbor_bodies):
+        as_json = decode_vespa_response(json_body, status_code=200, url="")
+        as_cbor = decode_vespa_response(cbor_body, status_code=200, url="")
+        assert parse_vespa_response(as_cbor) == parse_vespa_response(as_json)
+
+    json_mb = sum(map(len, json_bodies)) / 1e6
+    cbor_mb = sum(map(len, cbor_bodies)) / 1e6
+    print(f"{len(json_bodies)} responses")
+    print(f"payload as JSON{json_mb:19.1f}MB")
+    print(f"payload as CBOR{cbor_mb:19.1f}MB{cbor_mb / json_mb:8.0%} of JSON")
+
+    decoders = {
+        "JSON with json": (json.loads, json_bodies),
+        "JSON with orjson if installed": (_loads, json_bodies),
+        "CBOR with cbor2": (cbor2.loads, cbor_bodies),
+    }
+    for name, (decode, bodies) in decoders.items():
+        seconds = best_of(args.repeats, lambda: [decode(body) for body in bodies])
+        print(f"decode {name:<30}{seconds * 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
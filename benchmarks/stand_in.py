@@ -0,0 +1,128 @@
+"""A local stand-in for a Vespa container, used by the benchmarks and tests."""
+
+import json
+import threading
+import time
+from contextlib import contextmanager, suppress
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Iterator
+
+from cpr_sdk.search_adaptors import VespaSearchAdapter
+
+SEARCH_RESPONSE_PATH = (
+    Path(__file__).parent.parent
+    / "tests/test_data/search_responses/search_response.json"
+)
+
+
+class StandInVespa:
+    """
+    A minimal local HTTP server standing in for a Vespa container.
+
+    Serves a canned search response for every query, and any documents added to
+    `documents` (keyed on their document/v1 path) for gets. Queries take
+    `latency_s` and respond with `status_code`, or the next of `latencies_s` and
+    `status_codes` if any are left. Counts the requests and connections it sees so
+    tests can assert on client behaviour.
+    """
+
+    def __init__(self, search_response: bytes):
+        self.search_response = search_response
+        self.documents: dict[str, bytes] = {}
+        self.latency_s = 0.0
+        self.latencies_s: list[float] = []
+        self.status_code = 200
+        self.status_codes: list[int] = []
+        self.request_count = 0
+        self.connection_count = 0
+        self.request_bodies: list[bytes] = []
+
+        stand_in = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def setup(self):
+                super().setup()
+                stand_in.connection_count += 1
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                stand_in.request_bodies.append(self.rfile.read(length))
+                stand_in.request_count += 1
+                latency_s = (
+                    stand_in.latencies_s.pop(0)
+                    if stand_in.latencies_s
+                    else stand_in.latency_s
+                )
+                if latency_s:
+                    time.sleep(latency_s)
+                status_code = (
+                    stand_in.status_codes.pop(0)
+                    if stand_in.status_codes
+                    else stand_in.status_code
+                )
+                # The client may have given up waiting and closed the connection
+                with suppress(ConnectionError):
+                    self.send_response(status_code)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header(
+                        "Content-Length", str(len(stand_in.search_response))
+                    )
+                    self.end_headers()
+                    self.wfile.write(stand_in.search_response)
+
+            def do_GET(self):
+                stand_in.request_count += 1
+                if stand_in.latency_s:
+                    time.sleep(stand_in.latency_s)
+                document = stand_in.documents.get(self.path.split("?")[0])
+                status_code = 200 if document is not None else 404
+                body = document or json.dumps({"pathId": self.path}).encode()
+                self.send_response(status_code)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        self.thread = threading.Thread(
+            target=self.server.serve_forever, args=(0.05,), daemon=True
+        )
+
+    def adaptor(self, **kwargs) -> VespaSearchAdapter:
+        """An adaptor pointed at this server, speaking HTTP/1.1 for async calls"""
+        return VespaSearchAdapter(
+            instance_url=self.url,
+            skip_cert_usage=True,
+            async_session_kwargs={"http2_only": False},
+            **kwargs,
+        )
+
+
+@contextmanager
+def running_stand_ins(count: int) -> Iterator[list[StandInVespa]]:
+    """Start some stand-in Vespa servers, shutting them down on exit"""
+    search_response = SEARCH_RESPONSE_PATH.read_bytes()
+    stand_ins = [StandInVespa(search_response) for _ in range(count)]
+    for stand_in in stand_ins:
+        stand_in.thread.start()
+    try:
+        yield stand_ins
+    finally:
+        for stand_in in stand_ins:
+            stand_in.server.shutdown()
+            stand_in.server.server_close()
+
+
+@contextmanager
+def stand_in_vespa(latency_s: float = 0.0) -> Iterator[StandInVespa]:
+    """Run a stand-in Vespa server in a background thread for the duration"""
+    with running_stand_ins(1) as (stand_in,):
+        stand_in.latency_s = latency_s
+        yield stand_in
@@ -0,0 +1,129 @@
+"""
+Synthetic vespa search responses, seeded from the local vespa test documents.
+
+Each family takes its family document from those fed to the local vespa test
+instance, and its passages from the passage files, with every hit carrying only the
+fields in its schema's `search_summary`, as vespa would return them. Families are
+given distinct IDs, so responses scale to as many families and hits as asked for,
+and the same seed always gives the same response.
+"""
+
+import json
+import random
+import re
+from functools import cache
+from pathlib import Path
+from typing import Any
+
+from cpr_sdk.models.search import SCHEMA_NAME_FIELD_NAME
+
+LOCAL_VESPA = Path(__file__).parent.parent / "tests/local_vespa"
+TEST_DOCUMENTS = LOCAL_VESPA / "test_documents"
+SCHEMAS = LOCAL_VESPA / "test_app/schemas"
+
+_SUMMARY = re.compile(r"document-summary search_summary \{(.*?)\}\s*\}", re.DOTALL)
+_SUMMARY_FIELD = re.compile(r"summary (\w+) \{")
+
+
+@cache
+def summary_fields(schema: str) -> tuple[str, ...]:
+    """The fields in a schema's `search_summary`, read from its definition"""
+    definition = (SCHEMAS / f"{schema}.sd").read_text()
+    match = _SUMMARY.search(definition)
+    assert match is not None, f"{schema} has no search_summary"
+    return tuple(_SUMMARY_FIELD.findall(match.group(1)))
+
+
+@cache
+def test_documents() -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Every family document and passage fed to the local vespa test instance"""
+    documents: list[dict[str, Any]] = []
+    for path in sorted(TEST_DOCUMENTS.glob("family_document*.json")):
+        loaded = json.loads(path.read_text())
+        documents.extend(loaded if isinstance(loaded, list) else [loaded])
+    passages: list[dict[str, Any]] = []
+    for path in sorted(TEST_DOCUMENTS.glob("document_passage.*.json")):
+        passages.extend(json.loads(path.read_text()))
+    return documents, passages
+
+
+def _hit(
+    hit_id: str, relevance: float, fields: dict[str, Any], schema: str
+) -> dict[str, Any]:
+    """A hit as vespa would return it, with only its summary fields"""
+    return {
+        "id": hit_id,
+        "relevance": relevance,
+        "fields": {
+            name: fields[name] for name in summary_fields(schema) if name in fields
+        }
+        | {SCHEMA_NAME_FIELD_NAME: schema},
+    }
+
+
+def synthetic_family(
+    index: int, passages_per_family: int, rng: random.Random
+) -> dict[str, Any]:
+    """
+    A family grouping node, with a family document hit followed by passage hits
+
+    :param int index: the family's position in the response, which its IDs include
+    :param int passages_per_family: how many passage hits the family has
+    :param random.Random rng: chooses the family's document, passages and relevance
+    :return dict: the family, as in a grouped vespa search response
+    """
+    documents, passages = test_documents()
+    document = rng.choice(documents)
+    family_import_id = f"{document['fields']['family_import_id']}.{index}"
+    fields = document["fields"] | {
+        "family_import_id": family_import_id,
+        "document_import_id": f"{document['fields']['document_import_id']}.{index}",
+    }
+    relevance = rng.uniform(1.0, 10.0)
+    hits = [_hit(document["id"], relevance, fields, "family_document")]
+    start = rng.randrange(len(passages))
+    for offset in range(passages_per_family):
+        passage = passages[(start + offset) % len(passages)]
+        hits.append(
+            _hit(
+                passage["id"],
+                relevance * rng.random(),
+                fields | passage["fields"],
+                "document_passage",
+            )
+        )
+    return {
+        "value": family_import_id,
+        "relevance": relevance,
+        "fields": {"count()": len(hits)},
+        "children": [{"continuation": {"next": "next"}, "children": hits}],
+    }
+
+
+def synthetic_response(
+    n_families: int, passages_per_family: int, seed: int = 0
+) -> dict[str, Any]:
+    """
+    A grouped search response, as vespa would return it
+
+    :param int n_families: how many families the response has
+    :param int passages_per_family: how many passage hits each family has, after
+        its family document hit
+    :param int seed: seeds the choice of documents, passages and relevances
+    :return dict: the response's JSON
+    """
+    rng = random.Random(seed)
+    families = [
+        synthetic_family(index, passages_per_family, rng) for index in range(n_families)
+    ]
+    return {
+        "root": {
+            "fields": {"totalCount": n_families * (passages_per_family + 1)},
+            "children": [
+                {
+                    "fields": {"count()": n_families},
+                    "children": [{"children": families}],
+                }
+            ],
+        }
+    }
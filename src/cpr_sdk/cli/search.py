@@ -41,12 +41,6 @@ def get_rank_feature_names(search_response: SearchResponse) -> list[str]:
     return rank_feature_names
 
 
-def add_tokens_summary_to_yql(yql: str) -> str:
-    """Amend the summary requested in a YQL query to return tokens."""
-
-    return yql.replace("summary(search_summary)", "summary(search_summary_with_tokens)")
-
-
 @app.command()
 def main(
     query: str = typer.Argument(..., help="The search query to run."),
@@ -76,6 +70,9 @@ def main(
         concept_filters=[
             ConceptFilter(name="id", value=concept_id) for concept_id in concept_id
         ],
+        summary_class=(
+            "search_summary_with_tokens" if experimental_tokens else "search_summary"
+        ),
     )
     request_body = build_vespa_request_body(search_parameters)
 
@@ -83,7 +80,6 @@ def main(
         print(
             "WARNING: tokens are not fed into the final Vespa response, so you will see no change unless you set a breakpoint just after `search_response_raw` following these lines."
         )
-        request_body["yql"] = add_tokens_summary_to_yql(request_body["yql"])
 
     start_time = time.time()
     search_response_raw = search_adapter.client.query(body=request_body)
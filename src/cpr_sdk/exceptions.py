@@ -23,3 +23,25 @@ class DocumentNotFoundError(DataAccessError):
     def __init__(self, document_id):
         self.document_id = document_id
         super().__init__(f"Failed to find document with ID: {document_id}")
+
+
+class CircuitOpenError(FetchError):
+    """Raised when a request is refused because the search engine is failing"""
+
+    def __init__(self):
+        super().__init__("requests are paused after too many failures")
+
+
+class RecordingNotFoundError(FetchError):
+    """Raised when a replayed request was never recorded"""
+
+    def __init__(self, key):
+        self.key = key
+        super().__init__(f"no response was recorded for request {key}")
+
+
+class DeadlineExceededError(FetchError):
+    """Raised when a search runs out of time before vespa responds"""
+
+    def __init__(self):
+        super().__init__("the search's deadline passed before vespa responded")
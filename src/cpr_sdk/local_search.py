@@ -0,0 +1,679 @@
+"""An in-memory search engine over a Dataset, for testing and offline use"""
+
+import asyncio
+import datetime
+import logging
+import re
+from collections import Counter, defaultdict
+from typing import Any, Iterable, Optional
+
+import numpy as np
+from typing_extensions import override
+
+from cpr_sdk.exceptions import DocumentNotFoundError, QueryError
+from cpr_sdk.models import BaseDocument, Dataset
+from cpr_sdk.models.search import (
+    Document,
+    Family,
+    Hit,
+    Passage,
+    SearchParameters,
+    SearchResponse,
+)
+from cpr_sdk.search_adaptors import SearchAdapter
+from cpr_sdk.search_middleware import SearchContext
+from cpr_sdk.vespa import split_document_id
+
+LOGGER = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Units of the index that aren't a text block, but a whole document
+_DOCUMENT_UNIT = -1
+
+_FAMILY_TOKEN = "F"
+_PASSAGE_TOKEN = "P"
+_TOKEN_DIGITS = "ABCDEFGHIJ"
+_TOKEN_SEPARATOR = "X"
+
+_UNSUPPORTED_PARAMETERS = (
+    "concept_filters",
+    "concept_count_filters",
+    "concept_v2_passage_filters",
+    "concept_v2_document_filters",
+)
+
+
+def tokenise(text: str) -> list[str]:
+    """Split text into lowercase word tokens"""
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+class LocalSearchIndex:
+    """
+    An inverted index over the documents and text blocks of a dataset
+
+    Every document is indexed as a document hit, on its family name, title and
+    description, and each of its text blocks as a passage hit. Postings are held in
+    flat NumPy arrays so queries are scored with BM25 in a few vectorised
+    operations, and document-level attributes are held per distinct value so
+    filters are cheap to apply.
+    """
+
+    def __init__(self, dataset: Dataset, k1: float = 1.2, b: float = 0.75) -> None:
+        """
+        Build an index
+
+        :param Dataset dataset: the documents to index
+        :param float k1: BM25 term frequency saturation
+        :param float b: BM25 document length normalisation
+        """
+        self.k1 = k1
+        self.b = b
+        self.documents: list[BaseDocument] = list(dataset.documents)
+
+        self._document_fields = [_hit_fields(d) for d in self.documents]
+        self._document_index = {d.document_id: i for i, d in enumerate(self.documents)}
+
+        family_ids = [
+            fields["family_import_id"] or document.document_id
+            for fields, document in zip(self._document_fields, self.documents)
+        ]
+        self.family_ids: list[str] = list(dict.fromkeys(family_ids))
+        family_index = {family_id: i for i, family_id in enumerate(self.family_ids)}
+        self._document_family = np.array(
+            [family_index[f] for f in family_ids], dtype=np.int32
+        )
+        self._document_year = np.array(
+            [
+                ts.year if (ts := fields["family_publication_ts"]) else np.nan
+                for fields in self._document_fields
+            ],
+            dtype=np.float64,
+        )
+        self._document_timestamp = np.array(
+            [
+                ts.timestamp() if (ts := fields["family_publication_ts"]) else np.nan
+                for fields in self._document_fields
+            ],
+            dtype=np.float64,
+        )
+        self._documents_by_value = self._index_values()
+        self._build_postings()
+
+    def __len__(self) -> int:
+        """The number of hits in the index, counting documents and text blocks"""
+        return len(self._unit_document)
+
+    def _index_values(self) -> dict[str, dict[str, np.ndarray]]:
+        """Map each filterable field's values to the documents that have them"""
+        by_value: dict[str, dict[str, list[int]]] = defaultdict(
+            lambda: defaultdict(list)
+        )
+        for i, fields in enumerate(self._document_fields):
+            family_id = self.family_ids[self._document_family[i]]
+            by_value["family_import_id"][family_id].append(i)
+            by_value["document_import_id"][fields["document_import_id"]].append(i)
+            for field in (
+                "corpus_type_name",
+                "corpus_import_id",
+                "family_geography",
+                "family_category",
+                "family_source",
+            ):
+                if fields[field] is not None:
+                    by_value[field][fields[field]].append(i)
+            for field in ("family_geographies", "document_languages"):
+                for value in fields[field] or []:
+                    by_value[field][value].append(i)
+            for item in fields["metadata"] or []:
+                by_value["metadata"][f"{item['name']}={item['value']}"].append(i)
+        return {
+            field: {
+                value: np.array(indices, dtype=np.int32)
+                for value, indices in values.items()
+            }
+            for field, values in by_value.items()
+        }
+
+    def _build_postings(self) -> None:
+        """Tokenise every document and text block into flat postings arrays"""
+        vocabulary: dict[str, int] = {}
+        unit_document: list[int] = []
+        unit_block: list[int] = []
+        unit_length: list[int] = []
+        posting_terms: list[int] = []
+        posting_units: list[int] = []
+        posting_counts: list[int] = []
+
+        def add_unit(document_idx: int, block_idx: int, text: str) -> None:
+            tokens = tokenise(text)
+            unit = len(unit_document)
+            unit_document.append(document_idx)
+            unit_block.append(block_idx)
+            unit_length.append(len(tokens))
+            for token, count in Counter(tokens).items():
+                posting_terms.append(vocabulary.setdefault(token, len(vocabulary)))
+                posting_units.append(unit)
+                posting_counts.append(count)
+
+        for document_idx, document in enumerate(self.documents):
+            fields = self._document_fields[document_idx]
+            add_unit(
+                document_idx,
+                _DOCUMENT_UNIT,
+                " ".join(
+                    text
+                    for text in (
+                        fields["family_name"],
+                        fields["document_title"],
+                        fields["family_description"],
+                    )
+                    if text
+                ),
+            )
+            for block_idx, block in enumerate(document.text_blocks or []):
+                add_unit(document_idx, block_idx, block.to_string())
+
+        self.vocabulary = vocabulary
+        self._unit_document = np.array(unit_document, dtype=np.int32)
+        self._unit_block = np.array(unit_block, dtype=np.int32)
+        self._unit_family = self._document_family[self._unit_document]
+        lengths = np.array(unit_length, dtype=np.float32)
+        average_length = lengths.mean() if len(lengths) and lengths.mean() else 1.0
+        self._length_norm = self.k1 * (1 - self.b + self.b * lengths / average_length)
+
+        terms = np.array(posting_terms, dtype=np.int32)
+        order = np.argsort(terms, kind="stable")
+        self._posting_units = np.array(posting_units, dtype=np.int32)[order]
+        self._posting_counts = np.array(posting_counts, dtype=np.float32)[order]
+        document_frequency = np.bincount(terms, minlength=len(vocabulary))
+        self._posting_offsets = np.concatenate(([0], np.cumsum(document_frequency)))
+        n_units = len(unit_document)
+        self._idf = np.log(
+            1 + (n_units - document_frequency + 0.5) / (document_frequency + 0.5)
+        ).astype(np.float32)
+
+    def score(self, query_string: str, exact_match: bool = False) -> np.ndarray:
+        """
+        Score every hit in the index against a query with BM25
+
+        :param str query_string: the query
+        :param bool exact_match: if True, only hits containing the query as a phrase
+            are scored
+        :return np.ndarray: a score per hit, which is 0 for hits that don't match
+        """
+        scores = np.zeros(len(self), dtype=np.float32)
+        query_tokens = tokenise(query_string)
+        term_ids = [self.vocabulary.get(token) for token in dict.fromkeys(query_tokens)]
+        if exact_match and (None in term_ids or not term_ids):
+            return scores
+        term_ids = [t for t in term_ids if t is not None]
+        if not term_ids:
+            return scores
+
+        units = np.concatenate(
+            [
+                self._posting_units[
+                    self._posting_offsets[t] : self._posting_offsets[t + 1]
+                ]
+                for t in term_ids
+            ]
+        )
+        counts = np.concatenate(
+            [
+                self._posting_counts[
+                    self._posting_offsets[t] : self._posting_offsets[t + 1]
+                ]
+                for t in term_ids
+            ]
+        )
+        idf = np.repeat(
+            self._idf[term_ids],
+            [self._posting_offsets[t + 1] - self._posting_offsets[t] for t in term_ids],
+        )
+        contributions = (
+            idf * counts * (self.k1 + 1) / (counts + self._length_norm[units])
+        )
+        scores += np.bincount(units, weights=contributions, minlength=len(self)).astype(
+            np.float32
+        )
+
+        if exact_match:
+            matched_terms = np.bincount(units, minlength=len(self))
+            candidates = np.flatnonzero(matched_terms == len(term_ids))
+            phrase = f" {' '.join(query_tokens)} "
+            keep = [
+                unit
+                for unit in candidates
+                if phrase in f" {' '.join(tokenise(self._unit_text(int(unit))))} "
+            ]
+            exact_scores = np.zeros_like(scores)
+            exact_scores[keep] = scores[keep]
+            scores = exact_scores
+        return scores
+
+    def filter_mask(self, parameters: SearchParameters) -> np.ndarray:
+        """
+        Find the hits that pass a search's filters
+
+        :param SearchParameters parameters: the search
+        :return np.ndarray: a boolean mask over every hit in the index
+        """
+        documents = np.ones(len(self.documents), dtype=bool)
+
+        def restrict(field: str, values: Optional[Iterable[str]]) -> None:
+            if values is None:
+                return
+            values = list(values)
+            if not values:
+                return
+            allowed = np.zeros(len(self.documents), dtype=bool)
+            by_value = self._documents_by_value.get(field, {})
+            for value in values:
+                if value in by_value:
+                    allowed[by_value[value]] = True
+            documents[~allowed] = False
+
+        restrict("family_import_id", parameters.family_ids)
+        restrict("document_import_id", parameters.document_ids)
+        restrict("corpus_type_name", parameters.corpus_type_names)
+        restrict("corpus_import_id", parameters.corpus_import_ids)
+        if parameters.filters is not None:
+            for field in (
+                "family_geographies",
+                "family_geography",
+                "family_category",
+                "document_languages",
+                "family_source",
+            ):
+                restrict(field, getattr(parameters.filters, field))
+        for metadata_filter in parameters.metadata or []:
+            restrict("metadata", [f"{metadata_filter.name}={metadata_filter.value}"])
+        if parameters.year_range is not None:
+            start, end = parameters.year_range
+            if start is not None:
+                documents &= self._document_year >= start
+            if end is not None:
+                documents &= self._document_year <= end
+
+        mask = documents[self._unit_document]
+        if parameters.documents_only:
+            mask &= self._unit_block == _DOCUMENT_UNIT
+        return mask
+
+    def search(self, parameters: SearchParameters) -> SearchResponse[Family]:
+        """
+        Search the index
+
+        :param SearchParameters parameters: the search
+        :raises QueryError: if the search uses concept filters or sorting, which the
+            index can't apply
+        :return SearchResponse[Family]: matching families, in the same shape as a
+            vespa search
+        """
+        for name in _UNSUPPORTED_PARAMETERS:
+            if getattr(parameters, name):
+                raise QueryError(f"{name} are not supported by local search")
+        if parameters.sort_by == "concept_counts":
+            raise QueryError(
+                "Sorting by concept_counts is not supported by local search"
+            )
+
+        family_offset, passage_family, passage_offset = _parse_continuation_tokens(
+            parameters.continuation_tokens
+        )
+        mask = self.filter_mask(parameters)
+        if parameters.all_results or not parameters.query_string:
+            scores = np.zeros(len(self), dtype=np.float32)
+        else:
+            scores = self.score(parameters.query_string, parameters.exact_match)
+            mask &= scores > 0
+        if passage_family is not None:
+            mask &= self._unit_family == passage_family
+
+        matched = np.flatnonzero(mask)
+        total_hits = len(matched)
+        # Group hits by family, best first within each family
+        order = np.lexsort((matched, -scores[matched], self._unit_family[matched]))
+        matched = matched[order]
+        families, starts, counts = np.unique(
+            self._unit_family[matched], return_index=True, return_counts=True
+        )
+        family_order = self._order_families(
+            parameters, families, starts, scores, matched
+        )
+
+        if passage_family is not None:
+            page = family_order
+        else:
+            page = family_order[family_offset : family_offset + parameters.limit]
+        hit_offset = passage_offset if passage_family is not None else 0
+
+        results = []
+        for position in page:
+            family_idx = int(families[position])
+            start, count = int(starts[position]), int(counts[position])
+            family_units = matched[start + hit_offset : start + count][
+                : parameters.max_hits_per_family
+            ]
+            shown_to = hit_offset + len(family_units)
+            results.append(
+                Family(
+                    id=self.family_ids[family_idx],
+                    hits=[
+                        self._hit(unit, float(scores[unit])) for unit in family_units
+                    ],
+                    total_passage_hits=count,
+                    continuation_token=(
+                        _encode_token(_PASSAGE_TOKEN, family_idx, shown_to)
+                        if shown_to < count
+                        else None
+                    ),
+                    prev_continuation_token=(
+                        _encode_token(
+                            _PASSAGE_TOKEN,
+                            family_idx,
+                            max(hit_offset - parameters.max_hits_per_family, 0),
+                        )
+                        if hit_offset > 0
+                        else None
+                    ),
+                    relevance=float(scores[matched[start]]),
+                )
+            )
+
+        paging_families = passage_family is None
+        return SearchResponse(
+            total_hits=total_hits,
+            total_result_hits=len(families),
+            results=results,
+            continuation_token=(
+                _encode_token(_FAMILY_TOKEN, family_offset + parameters.limit)
+                if paging_families
+                and family_offset + parameters.limit < len(family_order)
+                else None
+            ),
+            this_continuation_token=(
+                _encode_token(_FAMILY_TOKEN, family_offset) if paging_families else None
+            ),
+            prev_continuation_token=(
+                _encode_token(_FAMILY_TOKEN, max(family_offset - parameters.limit, 0))
+                if paging_families and family_offset > 0
+                else None
+            ),
+        )
+
+    def _order_families(
+        self,
+        parameters: SearchParameters,
+        families: np.ndarray,
+        starts: np.ndarray,
+        scores: np.ndarray,
+        matched: np.ndarray,
+    ) -> np.ndarray:
+        """Order matched families by relevance, or the requested sort field"""
+        if len(families) == 0:
+            return np.array([], dtype=np.int64)
+        descending = parameters.vespa_sort_order == "-"
+        if parameters.sort_by is None:
+            family_scores = scores[matched[starts]]
+            return np.lexsort((families, -family_scores))
+
+        first_documents = self._unit_document[matched[starts]]
+        if parameters.sort_by == "date":
+            keys = self._document_timestamp[first_documents]
+            # Families without a date sort last, whichever the order
+            missing = np.isnan(keys)
+            keys = np.where(missing, 0, -keys if descending else keys)
+            return np.lexsort((families, keys, missing))
+
+        names = [self._document_fields[d]["family_name"] or "" for d in first_documents]
+        order = sorted(range(len(families)), key=lambda i: (names[i], families[i]))
+        if descending:
+            order.reverse()
+        return np.array(order, dtype=np.int64)
+
+    def get(self, document_id: str) -> Hit:
+        """
+        Get a single document or passage by its vespa-style ID
+
+        :param str document_id: e.g. "id:doc_search:family_document::CCLW.executive.1.0"
+            or "id:doc_search:document_passage::CCLW.executive.1.0.12", where the
+            last part of a passage ID is the text block's position in the document
+        :raises DocumentNotFoundError: if there's no such document or passage
+        :return Hit: a single document or passage
+        """
+        document_id_parts = split_document_id(document_id)
+        data_id = document_id_parts.data_id
+        block_idx = _DOCUMENT_UNIT
+        if document_id_parts.schema == "document_passage":
+            data_id, _, block_position = data_id.rpartition(".")
+            if not block_position.isdigit():
+                raise DocumentNotFoundError(document_id)
+            block_idx = int(block_position)
+        elif document_id_parts.schema != "family_document":
+            raise DocumentNotFoundError(document_id)
+
+        document_idx = self._document_index.get(data_id)
+        if document_idx is None:
+            raise DocumentNotFoundError(document_id)
+        text_blocks = self.documents[document_idx].text_blocks or []
+        if block_idx != _DOCUMENT_UNIT and block_idx >= len(text_blocks):
+            raise DocumentNotFoundError(document_id)
+        return self._make_hit(document_idx, block_idx, relevance=None)
+
+    def _unit_text(self, unit: int) -> str:
+        """The text a hit was indexed on"""
+        document_idx = int(self._unit_document[unit])
+        block_idx = int(self._unit_block[unit])
+        if block_idx == _DOCUMENT_UNIT:
+            fields = self._document_fields[document_idx]
+            return " ".join(
+                text
+                for text in (
+                    fields["family_name"],
+                    fields["document_title"],
+                    fields["family_description"],
+                )
+                if text
+            )
+        text_blocks = self.documents[document_idx].text_blocks or []
+        return text_blocks[block_idx].to_string()
+
+    def _hit(self, unit: int, relevance: float) -> Hit:
+        """Create the Hit for a unit of the index"""
+        return self._make_hit(
+            int(self._unit_document[unit]), int(self._unit_block[unit]), relevance
+        )
+
+    def _make_hit(
+        self, document_idx: int, block_idx: int, relevance: Optional[float]
+    ) -> Hit:
+        """Create a Document or Passage hit"""
+        fields = self._document_fields[document_idx]
+        if block_idx == _DOCUMENT_UNIT:
+            return Document(**fields, relevance=relevance)
+        block = (self.documents[document_idx].text_blocks or [])[block_idx]
+        return Passage.model_validate(
+            fields
+            | {
+                "text_block": block.to_string(),
+                "text_block_id": block.text_block_id,
+                "text_block_type": block.type.value,
+                "text_block_page": block.page_number,
+                "text_block_coords": block.coords,
+                "relevance": relevance,
+            }
+        )
+
+
+class LocalSearchAdapter(SearchAdapter):
+    """
+    Search a dataset in memory, without vespa
+
+    Results have the same shape as the `VespaSearchAdapter`'s, ranked with BM25
+    rather than vespa's rank profiles, and with the same filters except concept
+    filters. Vespa-specific request settings, like `custom_vespa_request_body` and
+    `replace_acronyms`, are ignored.
+    """
+
+    def __init__(self, dataset: Dataset, k1: float = 1.2, b: float = 0.75) -> None:
+        """
+        Index a dataset to search
+
+        :param Dataset dataset: the documents to search
+        :param float k1: BM25 term frequency saturation
+        :param float b: BM25 document length normalisation
+        """
+        self.index = LocalSearchIndex(dataset, k1=k1, b=b)
+
+    @override
+    def search(self, parameters: SearchParameters) -> SearchResponse[Family]:
+        """
+        Search the dataset
+
+        :param SearchParameters parameters: a search request object
+        :return SearchResponse[Family]: a list of families, with response metadata
+        """
+        if not self.middlewares:
+            return self.index.search(parameters)
+
+        return self._search_with_middleware(
+            SearchContext(parameters=parameters),
+            lambda context: self.index.search(context.parameters),
+        )
+
+    @override
+    async def async_search(
+        self, parameters: SearchParameters
+    ) -> SearchResponse[Family]:
+        """
+        Search the dataset in a thread, so the event loop isn't blocked
+
+        :param SearchParameters parameters: a search request object
+        :return SearchResponse[Family]: a list of families, with response metadata
+        """
+        if not self.middlewares:
+            return await asyncio.to_thread(self.index.search, parameters)
+
+        return await self._async_search_with_middleware(
+            SearchContext(parameters=parameters),
+            lambda context: asyncio.to_thread(self.index.search, context.parameters),
+        )
+
+    @override
+    def get_by_id(self, document_id: str) -> Hit:
+        """
+        Get a single document or passage by its ID
+
+        :param str document_id: IDs should look something like
+            "id:doc_search:family_document::CCLW.family.11171.0"
+        :return Hit: a single document or passage
+        """
+        return self.index.get(document_id)
+
+
+def _hit_fields(document: BaseDocument) -> dict[str, Any]:
+    """
+    The hit fields for a document, from whichever metadata model it has
+
+    Works with CPR, GST and backend document metadata, leaving fields a model
+    doesn't have as None.
+    """
+    metadata = document.document_metadata
+
+    def get(*names: str) -> Any:
+        for obj in (document, metadata):
+            for name in names:
+                value = getattr(obj, name, None)
+                if value is not None:
+                    return value
+        return None
+
+    publication_ts = get("publication_ts", "date")
+    if isinstance(publication_ts, datetime.date) and not isinstance(
+        publication_ts, datetime.datetime
+    ):
+        publication_ts = datetime.datetime.combine(publication_ts, datetime.time())
+    geography = get("geography_iso", "geography")
+    geographies = get("geographies")
+    source_url = get("document_source_url", "source_url")
+    return {
+        "family_name": get("family_name"),
+        "family_description": get("document_description", "description"),
+        "family_source": get("source"),
+        "family_import_id": get("family_id", "family_import_id"),
+        "family_slug": get("family_slug"),
+        "family_category": get("category"),
+        "family_publication_ts": publication_ts,
+        "family_geography": geography,
+        "family_geographies": list(geographies or ([geography] if geography else [])),
+        "document_import_id": document.document_id,
+        "document_slug": get("document_slug", "slug"),
+        "document_languages": list(document.languages or []),
+        "document_content_type": document.document_content_type,
+        "document_cdn_object": get("document_cdn_object"),
+        "document_source_url": str(source_url) if source_url is not None else None,
+        "document_title": document.document_name,
+        "corpus_type_name": get("corpus_type_name"),
+        "corpus_import_id": get("corpus_import_id"),
+        "metadata": _metadata_items(metadata) or None,
+    }
+
+
+def _metadata_items(metadata: Any) -> list[dict[str, str]]:
+    """Flatten document metadata into the name/value pairs vespa hits carry"""
+    items = []
+    for sector in getattr(metadata, "sectors", None) or []:
+        items.append({"name": "family.sector", "value": sector})
+    raw_metadata = getattr(metadata, "metadata", None)
+    if isinstance(raw_metadata, dict):
+        for name, values in raw_metadata.items():
+            for value in values if isinstance(values, list) else [values]:
+                items.append({"name": f"family.{name}", "value": str(value)})
+    return items
+
+
+def _encode_token(kind: str, *numbers: int) -> str:
+    """Encode numbers as a continuation token, which must be uppercase letters"""
+    return kind + _TOKEN_SEPARATOR.join(
+        "".join(_TOKEN_DIGITS[int(digit)] for digit in str(number))
+        for number in numbers
+    )
+
+
+def _decode_token(token: str) -> tuple[str, list[int]]:
+    """Decode a continuation token made by `_encode_token`"""
+    try:
+        numbers = [
+            int("".join(str(_TOKEN_DIGITS.index(letter)) for letter in part))
+            for part in token[1:].split(_TOKEN_SEPARATOR)
+        ]
+    except ValueError:
+        raise QueryError(f"Invalid continuation token for local search: {token}")
+    return token[0], numbers
+
+
+def _parse_continuation_tokens(
+    tokens: Optional[Iterable[str]],
+) -> tuple[int, Optional[int], int]:
+    """
+    Read the family offset, and passage family and offset, from continuation tokens
+
+    :return tuple[int, Optional[int], int]: the offset into the list of families,
+        and if a passage token was given, the family it's for and the offset into
+        that family's hits
+    """
+    family_offset, passage_family, passage_offset = 0, None, 0
+    for token in tokens or []:
+        if not token:
+            continue
+        kind, numbers = _decode_token(token)
+        if kind == _FAMILY_TOKEN and len(numbers) == 1:
+            family_offset = numbers[0]
+        elif kind == _PASSAGE_TOKEN and len(numbers) == 2:
+            passage_family, passage_offset = numbers
+        else:
+            raise QueryError(f"Invalid continuation token for local search: {token}")
+    return family_offset, passage_family, passage_offset
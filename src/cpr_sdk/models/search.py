@@ -1,10 +1,12 @@
 import re
+import sys
 from pydantic_core import CoreSchema, core_schema
-from typing import Any, Callable, Generic, TypeVar
+from typing import Any, Callable, Generic, Iterable, Iterator, TypeVar
+from collections.abc import MutableSequence
 from datetime import datetime
 from enum import Enum
 from typing import Annotated, List, Literal, Optional, Sequence, TypeAlias
-from functools import total_ordering
+from functools import cache, total_ordering
 
 from cpr_sdk.result import Result, Error, Ok, Err
 from typing_extensions import assert_never
@@ -16,6 +18,7 @@ from pydantic import (
     ConfigDict,
     Field,
     computed_field,
+    field_serializer,
     field_validator,
     model_validator,
 )
@@ -48,6 +51,8 @@ ID_PATTERN = re.compile(rf"{_ID_ELEMENT}\.{_ID_ELEMENT}\.{_ID_ELEMENT}\.{_ID_ELE
 
 SCHEMA_NAME_FIELD_NAME = "sddocname"
 
+SUMMARY_CLASS_PATTERN = re.compile(r"[a-zA-Z_][a-zA-Z0-9_]*")
+
 JsonDict: TypeAlias = dict[str, Any]
 
 
@@ -432,6 +437,20 @@ class SearchParameters(BaseModel):
     Whether to search by document title rather than family title.
     """
 
+    summary_class: str = "search_summary"
+    """
+    The document summary, as defined in the schemas, that vespa returns for each
+    hit. A leaner summary class means fewer bytes to send and parse.
+    """
+
+    summary_fields: Optional[Sequence[str]] = None
+    """
+    Optionally limit hits to these fields, e.g. ["family_name", "text_block"].
+
+    Vespa is asked for only these, and hits are built with only these, leaving their
+    other fields unset. Passages always keep the text block fields they need.
+    """
+
     @model_validator(mode="after")
     def validate(self):
         """Validate against mutually exclusive fields"""
@@ -496,6 +515,28 @@ class SearchParameters(BaseModel):
                     )
         return year_range
 
+    @field_validator("summary_class")
+    def summary_class_must_be_a_name(cls, summary_class):
+        """Validate that the summary class is a name that's safe to put in YQL"""
+        if not re.fullmatch(SUMMARY_CLASS_PATTERN, summary_class):
+            raise ValueError(f"Invalid summary class: {summary_class}")
+        return summary_class
+
+    @field_validator("summary_fields")
+    def summary_fields_must_be_hit_fields(cls, summary_fields):
+        """Validate that the summary fields are fields of documents or passages"""
+        if summary_fields is not None:
+            hit_fields = (
+                Document.model_fields.keys() | Passage.model_fields.keys()
+            ) - {"relevance", "rank_features"}
+            unknown_fields = set(summary_fields) - hit_fields
+            if unknown_fields:
+                raise ValueError(
+                    f"Invalid summary fields: {sorted(unknown_fields)}. "
+                    f"summary_fields must be from: {sorted(hit_fields)}"
+                )
+        return summary_fields
+
     @field_validator("sort_by")
     def sort_by_must_be_valid(cls, sort_by):
         """Validate that the sort field is valid."""
@@ -559,11 +600,17 @@ class Hit(BaseModel):
     concept_counts: Optional[dict[str, int]] = None
 
     @classmethod
-    def from_vespa_response(cls, response_hit: JsonDict) -> "Hit":
+    def from_vespa_response(
+        cls,
+        response_hit: JsonDict,
+        family_fields: Optional["SharedFamilyFields"] = None,
+    ) -> "Hit":
         """
         Create a Hit from a Vespa response hit.
 
         :param dict response_hit: part of a json response from Vespa
+        :param Optional[SharedFamilyFields] family_fields: family-level fields shared
+            with the other hits in the same family, if there are any
         :raises ValueError: if the response type is unknown
         :return Hit: an individual document or passage hit
         """
@@ -573,9 +620,13 @@ class Hit(BaseModel):
             case Ok(schema_name):
                 match schema_name:
                     case "family_document":
-                        return Document.from_vespa_response(response_hit=response_hit)
+                        return Document.from_vespa_response(
+                            response_hit=response_hit, family_fields=family_fields
+                        )
                     case "document_passage":
-                        return Passage.from_vespa_response(response_hit=response_hit)
+                        return Passage.from_vespa_response(
+                            response_hit=response_hit, family_fields=family_fields
+                        )
                     case _:
                         raise ValueError(
                             f"response hit wasn't a concept, it had schema name `{schema_name}`"
@@ -585,6 +636,33 @@ class Hit(BaseModel):
             case _ as unreachable:
                 assert_never(unreachable)
 
+    @classmethod
+    def from_trusted_vespa_response(
+        cls,
+        response_hit: JsonDict,
+        family_fields: Optional["SharedFamilyFields"] = None,
+    ) -> "Hit":
+        """
+        Create a Hit from a Vespa search response hit, without validating it.
+
+        Much faster than `from_vespa_response`, and gives an equal hit for any
+        response that matches the schemas, but a malformed response can give a
+        malformed hit rather than raising. Hits without a schema name field, e.g.
+        from `get_by_id`, are validated as usual.
+
+        :param dict response_hit: part of a json response from Vespa
+        :param Optional[SharedFamilyFields] family_fields: family-level fields shared
+            with the other hits in the same family, if there are any
+        :return Hit: an individual document or passage hit
+        """
+        match dig(response_hit, "fields", SCHEMA_NAME_FIELD_NAME):
+            case "family_document":
+                return Document.from_trusted_vespa_response(response_hit, family_fields)
+            case "document_passage":
+                return Passage.from_trusted_vespa_response(response_hit, family_fields)
+            case _:
+                return Hit.from_vespa_response(response_hit, family_fields)
+
     def __eq__(self, other):
         """
         Check if two hits are equal.
@@ -640,59 +718,452 @@ class Document(Hit):
     ]
 
     @classmethod
-    def from_vespa_response(cls, response_hit: dict) -> "Document":
+    def from_vespa_response(
+        cls,
+        response_hit: dict,
+        family_fields: Optional["SharedFamilyFields"] = None,
+    ) -> "Document":
         """
         Create a Document from a Vespa response hit.
 
         :param dict response_hit: part of a json response from Vespa
+        :param Optional[SharedFamilyFields] family_fields: family-level fields shared
+            with the other hits in the same family, if there are any
         :return Document: a populated document
         """
         fields = response_hit["fields"]
-        family_publication_ts = fields.get("family_publication_ts", None)
-        family_publication_ts = (
-            datetime.fromisoformat(family_publication_ts)
-            if family_publication_ts
-            else None
+        family_publication_ts = _family_publication_ts(fields, family_fields)
+        values = {
+            "family_name": fields.get("family_name"),
+            "family_description": fields.get("family_description"),
+            "family_source": fields.get("family_source"),
+            "family_import_id": fields.get("family_import_id"),
+            "family_slug": fields.get("family_slug"),
+            "family_category": fields.get("family_category"),
+            "family_publication_ts": family_publication_ts,
+            "family_geography": fields.get("family_geography"),
+            "family_geographies": fields.get("family_geographies", []),
+            "document_import_id": fields.get("document_import_id"),
+            "document_slug": fields.get("document_slug"),
+            "document_languages": fields.get("document_languages", []),
+            "document_content_type": fields.get("document_content_type"),
+            "document_cdn_object": fields.get("document_cdn_object"),
+            "document_source_url": fields.get("document_source_url"),
+            "document_title": fields.get("document_title"),
+            "corpus_type_name": fields.get("corpus_type_name"),
+            "corpus_import_id": fields.get("corpus_import_id"),
+            "metadata": fields.get("metadata"),
+            "concepts": fields.get("concepts"),
+            "relevance": response_hit.get("relevance"),
+            "rank_features": fields.get("summaryfeatures"),
+            "concept_counts": fields.get("concept_counts"),
+            "concepts_v2": fields.get("concepts_v2", []),
+        }
+        return _build_hit(cls, fields, values, family_fields)
+
+    @classmethod
+    def from_trusted_vespa_response(
+        cls,
+        response_hit: dict,
+        family_fields: Optional["SharedFamilyFields"] = None,
+    ) -> "Document":
+        """
+        Create a Document from a Vespa response hit, without validating it.
+
+        :param dict response_hit: part of a json response from Vespa
+        :param Optional[SharedFamilyFields] family_fields: family-level fields shared
+            with the other hits in the same family, if there are any
+        :return Document: a populated document, equal to `from_vespa_response`'s
+        """
+        fields = response_hit["fields"]
+        values = _trusted_hit_base_fields(
+            response_hit, _TRUSTED_DOCUMENT_FIELDS, family_fields
         )
-        return cls(
-            family_name=fields.get("family_name"),
-            family_description=fields.get("family_description"),
-            family_source=fields.get("family_source"),
-            family_import_id=fields.get("family_import_id"),
-            family_slug=fields.get("family_slug"),
-            family_category=fields.get("family_category"),
-            family_publication_ts=family_publication_ts,
-            family_geography=fields.get("family_geography"),
-            family_geographies=fields.get("family_geographies", []),
-            document_import_id=fields.get("document_import_id"),
-            document_slug=fields.get("document_slug"),
-            document_languages=fields.get("document_languages", []),
-            document_content_type=fields.get("document_content_type"),
-            document_cdn_object=fields.get("document_cdn_object"),
-            document_source_url=fields.get("document_source_url"),
-            document_title=fields.get("document_title"),
-            corpus_type_name=fields.get("corpus_type_name"),
-            corpus_import_id=fields.get("corpus_import_id"),
-            metadata=fields.get("metadata"),
-            concepts=fields.get("concepts"),
-            relevance=response_hit.get("relevance"),
-            rank_features=fields.get("summaryfeatures"),
-            concept_counts=fields.get("concept_counts"),
-            concepts_v2=fields.get("concepts_v2", []),
+        concepts_v2 = fields.get("concepts_v2", [])
+        values["concepts_v2"] = (
+            None
+            if concepts_v2 is None
+            else [_construct_from(cls.ConceptV2, c) for c in concepts_v2]
         )
+        return _build_hit(cls, fields, values, family_fields, trusted=True)
+
+
+_M = TypeVar("_M", bound=BaseModel)
+
+
+@cache
+def _field_defaults(model: type[BaseModel]) -> dict[str, Any]:
+    """Each of a model's fields with its default, for building it without validation"""
+    return {name: field.default for name, field in model.model_fields.items()}
+
+
+def construct_without_validation(model: type[_M], values: dict[str, Any]) -> _M:
+    """
+    Build a model from values that are already valid, without validating them
+
+    Like `model_construct`, but several times faster, as the defaults are worked out
+    once per model rather than on every call. Only suitable for models without
+    private attributes or default factories.
+
+    :param type model: the model to build
+    :param dict values: field values, exactly as validation would leave them
+    :return: the model
+    """
+    instance = model.__new__(model)
+    object.__setattr__(instance, "__dict__", _field_defaults(model) | values)
+    object.__setattr__(instance, "__pydantic_fields_set__", set(values))
+    object.__setattr__(instance, "__pydantic_extra__", None)
+    object.__setattr__(instance, "__pydantic_private__", None)
+    return instance
+
+
+def _known_fields(model: type[BaseModel], source: dict[str, Any]) -> dict[str, Any]:
+    """The values in a dict for a model's fields, ignoring keys it doesn't have"""
+    return {name: source[name] for name in _field_defaults(model) if name in source}
+
+
+def _construct_from(model: type[_M], source: dict[str, Any]) -> _M:
+    """Build a model without validation from a dict, ignoring keys it doesn't have"""
+    return construct_without_validation(model, _known_fields(model, source))
+
+
+class LazyList(MutableSequence):
+    """
+    A list of results built from raw vespa JSON the first time each one is read
+
+    Holds the decoded JSON objects until then, replacing each with the result built
+    from it as it's indexed or iterated over, so only the results that are read
+    are ever built. Otherwise it behaves like the list of built results, and
+    pickles and copies as one.
+
+    It's a sequence rather than a `list` subclass, since code that reads a list's
+    items directly, like `json.dumps`, would otherwise see the raw JSON. Use
+    `list(...)` where an actual list is needed.
+    """
+
+    def __init__(self, raw: Iterable[dict], build: Callable[[dict], Any]) -> None:
+        """
+        Create a lazy list
+
+        :param Iterable[dict] raw: the JSON objects to build results from
+        :param Callable build: builds a result from one of them
+        """
+        self._items: list[Any] = list(raw)
+        self._build = build
+
+    def _item(self, index: int) -> Any:
+        """The result at an index, built and kept if it hasn't been already"""
+        item = self._items[index]
+        if type(item) is dict:
+            item = self._build(item)
+            self._items[index] = item
+        return item
+
+    def materialise(self) -> "LazyList":
+        """Build every result that hasn't been already, returning the list"""
+        for index in range(len(self)):
+            self._item(index)
+        return self
+
+    def __len__(self) -> int:
+        """The number of results, built or not"""
+        return len(self._items)
+
+    def __getitem__(self, index):
+        """The result at an index, or a list of the results in a slice"""
+        if isinstance(index, slice):
+            return [self._item(i) for i in range(*index.indices(len(self)))]
+        return self._item(index)
+
+    def __setitem__(self, index, value) -> None:
+        """Replace the result at an index, or the results in a slice"""
+        self._items[index] = value
+
+    def __delitem__(self, index) -> None:
+        """Remove the result at an index, or the results in a slice"""
+        del self._items[index]
+
+    def insert(self, index: int, value: Any) -> None:
+        """Insert a result before an index"""
+        self._items.insert(index, value)
+
+    def __iter__(self) -> Iterator[Any]:
+        """Iterate over the results, building each as it's reached"""
+        for index in range(len(self)):
+            yield self._item(index)
+
+    def __reversed__(self) -> Iterator[Any]:
+        """Iterate over the results backwards, building each as it's reached"""
+        for index in reversed(range(len(self))):
+            yield self._item(index)
+
+    def __eq__(self, other: Any) -> bool:
+        """Compare the built results to a list or another lazy list"""
+        if isinstance(other, LazyList):
+            other = list(other)
+        return list(self) == other
+
+    def __ne__(self, other: Any) -> bool:
+        """Whether the built results differ from a list or another lazy list"""
+        return not self == other
+
+    def __add__(self, other: Any) -> list:
+        """A plain list of the built results followed by another list's items"""
+        return list(self) + list(other)
+
+    def __radd__(self, other: Any) -> list:
+        """A plain list of another list's items followed by the built results"""
+        return list(other) + list(self)
+
+    def __repr__(self) -> str:
+        """The repr of the list of built results"""
+        return repr(list(self))
+
+    def __reduce__(self):
+        """Pickle and copy as the plain list of built results"""
+        return list, (list(self),)
+
+    def copy(self) -> list:
+        """A plain list of the results, built"""
+        return list(self)
+
+    def sort(self, *args, **kwargs) -> None:
+        """Sort the results in place, building them all first"""
+        self.materialise()._items.sort(*args, **kwargs)
+
+    __hash__ = None  # type: ignore[assignment]
+
+
+def _materialised(values: Sequence[Any]) -> Sequence[Any]:
+    """Results ready to serialise, as a list of built results for a `LazyList`"""
+    return list(values) if isinstance(values, LazyList) else values
+
+
+_H = TypeVar("_H", bound="Hit")
+
+# Fields that every hit in a family has the same value for
+_FAMILY_LEVEL_FIELDS = (
+    "family_name",
+    "family_description",
+    "family_source",
+    "family_import_id",
+    "family_slug",
+    "family_category",
+    "family_publication_ts",
+    "family_geography",
+    "family_geographies",
+    "corpus_type_name",
+    "corpus_import_id",
+    "metadata",
+)
 
 
-def _extract_passage_base_fields(response_hit: dict) -> dict[str, Any]:
+class SharedFamilyFields:
+    """
+    One copy of the family-level fields shared by all the hits in a family
+
+    Every hit in a family repeats its family's name, description, slug, metadata
+    and so on. Hits built with the same `SharedFamilyFields` reference a single
+    copy instead, parsed and validated once, for the first hit, with strings
+    interned so that values like categories are shared across families too. Values
+    are only shared between hits whose family-level fields are identical in the
+    response, so hits are equal either way. Lists and dicts, like geographies and
+    metadata, are copied for each hit, so changing one hit's doesn't change its
+    siblings'.
+    """
+
+    def __init__(self) -> None:
+        # The raw family-level values from the response, the values shared for them,
+        # and the names of those each hit needs its own copy of, swapped together as
+        # hits can be built lazily from several threads
+        self._shared: Optional[tuple[tuple, dict[str, Any], tuple[str, ...]]] = None
+
+    def build(
+        self,
+        model: type[_H],
+        fields: dict[str, Any],
+        values: dict[str, Any],
+        trusted: bool = False,
+    ) -> _H:
+        """
+        Build a hit, referencing the shared family-level values if they're its own
+
+        :param type model: the hit's model
+        :param dict fields: the hit's fields from a Vespa response
+        :param dict values: the hit's values, as the model would be given them
+        :param bool trusted: whether to build the hit without validation
+        :return: the hit
+        """
+        raw = tuple(map(fields.get, _FAMILY_LEVEL_FIELDS))
+        shared = self._shared
+        if shared is None or raw != shared[0]:
+            hit = _construct_hit(model, values, trusted)
+            shared_values = {
+                name: _interned(getattr(hit, name)) for name in _FAMILY_LEVEL_FIELDS
+            }
+            mutable_names = tuple(
+                name
+                for name, value in shared_values.items()
+                if type(value) in (list, dict)
+            )
+            self._shared = (raw, shared_values, mutable_names)
+        else:
+            _, shared_values, mutable_names = shared
+            hit = None
+        hit_values = shared_values | {
+            name: _copied(shared_values[name]) for name in mutable_names
+        }
+        if hit is None:
+            if trusted:
+                return construct_without_validation(model, values | hit_values)
+            hit = model(**{k: v for k, v in values.items() if k not in shared_values})
+        object.__setattr__(hit, "__dict__", hit.__dict__ | hit_values)
+        hit.__pydantic_fields_set__.update(hit_values)
+        return hit
+
+    def publication_ts(self, raw: Optional[str]) -> Optional[datetime]:
+        """
+        Parse a hit's family publication time, reusing the shared one if it's equal
+
+        :param Optional[str] raw: the hit's `family_publication_ts` from the response
+        :return Optional[datetime]: the parsed time
+        """
+        shared = self._shared
+        if shared is not None and raw == shared[0][_PUBLICATION_TS_INDEX]:
+            return shared[1]["family_publication_ts"]
+        return _parse_publication_ts(raw)
+
+
+_PUBLICATION_TS_INDEX = _FAMILY_LEVEL_FIELDS.index("family_publication_ts")
+
+
+def _parse_publication_ts(raw: Optional[str]) -> Optional[datetime]:
+    """Parse a family publication time from a Vespa response, if it has one"""
+    return datetime.fromisoformat(raw) if raw else None
+
+
+def _family_publication_ts(
+    fields: dict[str, Any], family_fields: Optional[SharedFamilyFields]
+) -> Optional[datetime]:
+    """A hit's family publication time, parsed once per family if it's shared"""
+    raw = fields.get("family_publication_ts")
+    if family_fields is None:
+        return _parse_publication_ts(raw)
+    return family_fields.publication_ts(raw)
+
+
+def _interned(value: Any) -> Any:
+    """A value, interned if it's a string"""
+    return sys.intern(value) if type(value) is str else value
+
+
+def _copied(value: Any) -> Any:
+    """A copy of a value's lists and dicts, sharing the immutable values in them"""
+    if type(value) is list:
+        return [_copied(item) for item in value]
+    if type(value) is dict:
+        return {key: _copied(item) for key, item in value.items()}
+    return value
+
+
+def _construct_hit(model: type[_H], values: dict[str, Any], trusted: bool) -> _H:
+    """Build a hit, validating it unless it's trusted"""
+    return construct_without_validation(model, values) if trusted else model(**values)
+
+
+def _build_hit(
+    model: type[_H],
+    fields: dict[str, Any],
+    values: dict[str, Any],
+    family_fields: Optional[SharedFamilyFields],
+    trusted: bool = False,
+) -> _H:
+    """Build a hit, sharing family-level values with the others in its family if any"""
+    if family_fields is None:
+        return _construct_hit(model, values, trusted)
+    return family_fields.build(model, fields, values, trusted)
+
+
+# Fields copied as they are from vespa's summary fields when building hits without
+# validation, mirroring `from_vespa_response`. Lists that default to empty, and
+# fields needing conversion, are handled separately
+_TRUSTED_HIT_FIELDS = (
+    "family_name",
+    "family_description",
+    "family_source",
+    "family_import_id",
+    "family_slug",
+    "family_category",
+    "family_geography",
+    "document_import_id",
+    "document_slug",
+    "document_content_type",
+    "document_cdn_object",
+    "document_source_url",
+    "corpus_type_name",
+    "corpus_import_id",
+    "metadata",
+)
+_TRUSTED_DOCUMENT_FIELDS = _TRUSTED_HIT_FIELDS + ("document_title", "concept_counts")
+_TRUSTED_PASSAGE_FIELDS = _TRUSTED_HIT_FIELDS + ("text_block_page",)
+
+
+def _trusted_hit_base_fields(
+    response_hit: dict,
+    copied_fields: tuple[str, ...],
+    family_fields: Optional[SharedFamilyFields] = None,
+) -> dict[str, Any]:
+    """
+    Extract the fields common to every hit from a Vespa response, without validation
+
+    Values are converted only where validation would change them, so the hit built
+    from them is equal to a validated one.
+    """
+    fields = response_hit["fields"]
+    base_fields = {name: fields.get(name) for name in copied_fields}
+    base_fields["family_publication_ts"] = _family_publication_ts(fields, family_fields)
+    base_fields["family_geographies"] = fields.get("family_geographies", [])
+    base_fields["document_languages"] = fields.get("document_languages", [])
+    concepts = fields.get("concepts")
+    base_fields["concepts"] = (
+        None if concepts is None else [_trusted_concept(c) for c in concepts]
+    )
+    base_fields["relevance"] = response_hit.get("relevance")
+    base_fields["rank_features"] = fields.get("summaryfeatures")
+    return base_fields
+
+
+def _trusted_concept(concept: dict) -> "Passage.Concept":
+    """Build a passage's concept from a Vespa response, without validation"""
+    values = _known_fields(Passage.Concept, concept)
+    values["timestamp"] = datetime.fromisoformat(concept["timestamp"])
+    return construct_without_validation(Passage.Concept, values)
+
+
+def _trusted_span(span: dict) -> "Passage.Span":
+    """Build a passage's span from a Vespa response, without validation"""
+    return construct_without_validation(
+        Passage.Span,
+        {
+            "start": span["start"],
+            "end": span["end"],
+            "concepts_v2": [
+                _construct_from(Passage.Span.ConceptV2, c) for c in span["concepts_v2"]
+            ],
+        },
+    )
+
+
+def _extract_passage_base_fields(
+    response_hit: dict, family_fields: Optional[SharedFamilyFields] = None
+) -> dict[str, Any]:
     """
     Extract common passage fields from Vespa response.
 
     Shared logic for Passage and PassageV2 from_vespa_response methods.
     """
     fields = response_hit["fields"]
-    family_publication_ts = fields.get("family_publication_ts")
-    family_publication_ts = (
-        datetime.fromisoformat(family_publication_ts) if family_publication_ts else None
-    )
+    family_publication_ts = _family_publication_ts(fields, family_fields)
 
     return {
         "family_name": fields.get("family_name"),
@@ -837,21 +1308,53 @@ class Passage(Hit):
     text_block_coords: Optional[Sequence[tuple[float, float]]] = None
 
     @classmethod
-    def from_vespa_response(cls, response_hit: dict) -> "Passage":
+    def from_vespa_response(
+        cls,
+        response_hit: dict,
+        family_fields: Optional["SharedFamilyFields"] = None,
+    ) -> "Passage":
         """
         Create a Passage from a Vespa response hit.
 
         :param dict response_hit: part of a json response from Vespa
+        :param Optional[SharedFamilyFields] family_fields: family-level fields shared
+            with the other hits in the same family, if there are any
         :return Passage: a populated passage
         """
         fields = response_hit["fields"]
-        base_fields = _extract_passage_base_fields(response_hit)
+        values = _extract_passage_base_fields(response_hit, family_fields)
+        values["text_block_page"] = fields.get("text_block_page")
+        values["text_block_coords"] = fields.get("text_block_coords")
+        return _build_hit(cls, fields, values, family_fields)
 
-        return cls(
-            **base_fields,
-            text_block_page=fields.get("text_block_page"),
-            text_block_coords=fields.get("text_block_coords"),
+    @classmethod
+    def from_trusted_vespa_response(
+        cls,
+        response_hit: dict,
+        family_fields: Optional["SharedFamilyFields"] = None,
+    ) -> "Passage":
+        """
+        Create a Passage from a Vespa response hit, without validating it.
+
+        :param dict response_hit: part of a json response from Vespa
+        :param Optional[SharedFamilyFields] family_fields: family-level fields shared
+            with the other hits in the same family, if there are any
+        :return Passage: a populated passage, equal to `from_vespa_response`'s
+        """
+        fields = response_hit["fields"]
+        values = _trusted_hit_base_fields(
+            response_hit, _TRUSTED_PASSAGE_FIELDS, family_fields
+        )
+        values["text_block"] = fields["text_block"]
+        values["text_block_id"] = fields["text_block_id"]
+        values["text_block_type"] = fields["text_block_type"]
+        spans = fields.get("spans", [])
+        values["spans"] = None if spans is None else [_trusted_span(s) for s in spans]
+        coords = fields.get("text_block_coords")
+        values["text_block_coords"] = (
+            None if coords is None else [(float(x), float(y)) for x, y in coords]
         )
+        return _build_hit(cls, fields, values, family_fields, trusted=True)
 
 
 class Page(BaseModel):
@@ -924,24 +1427,27 @@ class PassageV2(Hit):
     serialised_text: Optional[str] = None
 
     @classmethod
-    def from_vespa_response(cls, response_hit: dict) -> "PassageV2":
+    def from_vespa_response(
+        cls,
+        response_hit: dict,
+        family_fields: Optional["SharedFamilyFields"] = None,
+    ) -> "PassageV2":
         """
         Create a PassageV2 from a Vespa response hit.
 
         :param dict response_hit: part of a json response from Vespa
+        :param Optional[SharedFamilyFields] family_fields: family-level fields shared
+            with the other hits in the same family, if there are any
         :return PassageV2: a populated passage
         """
         fields = response_hit["fields"]
-        base_fields = _extract_passage_base_fields(response_hit)
-
-        return cls(
-            **base_fields,
-            idx=fields.get("idx", 0),
-            heading_id=fields.get("heading_id"),
-            pages=fields.get("pages"),
-            tokens=fields.get("tokens"),
-            serialised_text=fields.get("serialised_text"),
-        )
+        values = _extract_passage_base_fields(response_hit, family_fields)
+        values["idx"] = fields.get("idx", 0)
+        values["heading_id"] = fields.get("heading_id")
+        values["pages"] = fields.get("pages")
+        values["tokens"] = fields.get("tokens")
+        values["serialised_text"] = fields.get("serialised_text")
+        return _build_hit(cls, fields, values, family_fields)
 
 
 class Family(BaseModel):
@@ -954,6 +1460,11 @@ class Family(BaseModel):
     prev_continuation_token: Optional[str] = None
     relevance: Optional[float] = None
 
+    @field_serializer("hits", mode="wrap")
+    def _serialise_hits(self, hits: Sequence[Hit], handler):
+        """Build any lazily built hits before serialising them"""
+        return handler(_materialised(hits))
+
     def __eq__(self, other):
         """
         Check if two Families are equal.
@@ -972,8 +1483,39 @@ class Family(BaseModel):
 R = TypeVar("R")  # Result
 
 
+class SearchTimings(BaseModel):
+    """
+    How long each phase of a search took
+
+    Durations are in nanoseconds, and are None for phases that didn't run, e.g. the
+    network round trip for a response served from the cache. `queue_wait_ns` is
+    the time spent waiting for a request governor, across every attempt. The
+    `vespa_*` fields are vespa's own reported timings in seconds, which are present
+    when the request sets `presentation.timing`.
+    """
+
+    yql_ns: Optional[int] = None
+    serialise_ns: Optional[int] = None
+    queue_wait_ns: Optional[int] = None
+    network_ns: Optional[int] = None
+    decode_ns: Optional[int] = None
+    parse_ns: Optional[int] = None
+    total_ns: Optional[int] = None
+    cache_hit: bool = False
+    coalesced: bool = False
+    hedged: bool = False
+    vespa_query_time_s: Optional[float] = None
+    vespa_summary_fetch_time_s: Optional[float] = None
+    vespa_search_time_s: Optional[float] = None
+
+
 class SearchResponse(BaseModel, Generic[R]):
-    """Relevant results, and search response metadata"""
+    """
+    Relevant results, and search response metadata
+
+    `degraded` is True when vespa stopped searching early, e.g. on reaching its
+    soft timeout, so the results may not be complete.
+    """
 
     total_hits: int
     total_result_hits: int = 0
@@ -983,12 +1525,19 @@ class SearchResponse(BaseModel, Generic[R]):
     continuation_token: Optional[str] = None
     this_continuation_token: Optional[str] = None
     prev_continuation_token: Optional[str] = None
+    timings: Optional[SearchTimings] = None
+    degraded: bool = False
+
+    @field_serializer("results", mode="wrap")
+    def _serialise_results(self, results: Sequence[R], handler):
+        """Build any lazily built results before serialising them"""
+        return handler(_materialised(results))
 
     def __eq__(self, other):
         """
         Check if two hits are equal.
 
-        Ignores query time fields as they are non-deterministic.
+        Ignores query time and timing fields as they are non-deterministic.
         """
 
         if not isinstance(other, self.__class__):
@@ -997,7 +1546,7 @@ class SearchResponse(BaseModel, Generic[R]):
         fields_to_compare = [
             f
             for f in self.__dict__.keys()
-            if f not in ("query_time_ms", "total_time_ms")
+            if f not in ("query_time_ms", "total_time_ms", "timings")
         ]
 
         return all(getattr(self, f) == getattr(other, f) for f in fields_to_compare)
@@ -1,40 +1,163 @@
 """Adaptors for searching CPR data"""
 
-from cpr_sdk.exceptions import DocumentNotFoundError, FetchError, QueryError
+from cpr_sdk.exceptions import (
+    CircuitOpenError,
+    DeadlineExceededError,
+    DocumentNotFoundError,
+    FetchError,
+    QueryError,
+)
+from cpr_sdk.result import Err, Error, Ok, Result
+from cpr_sdk.search_cache import SearchCache, request_cache_key
+from cpr_sdk.search_governor import Priority, RequestGovernor, get_default_governor
+from cpr_sdk.search_hedging import HedgePolicy
+from cpr_sdk.search_middleware import SearchContext, SearchMiddleware
+from cpr_sdk.search_resilience import CircuitBreaker, CircuitPermit, RetryPolicy
+from cpr_sdk.search_routing import EndpointRouter, RoutingPolicy
+from cpr_sdk.search_streaming import SearchResponseStream
 from cpr_sdk.models.search import (
     Family,
     Hit,
     SearchParameters,
     SearchResponse,
+    SearchTimings,
 )
+from cpr_sdk.utils import dig
 from cpr_sdk.vespa import (
+    VESPA_CERT_CACHE,
     VespaErrorDetails,
     build_vespa_request_body,
+    decode_vespa_response,
+    encode_vespa_request_body,
     find_vespa_cert_paths,
     parse_vespa_response,
     split_document_id,
+    summary_field_projection,
+    validate_result_format,
+    with_vespa_timeout,
 )
 
 
+import asyncio
 import logging
+import queue
+import threading
 import time
 from abc import ABC, abstractmethod
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from contextlib import ExitStack, aclosing, asynccontextmanager, suppress
 from pathlib import Path
+from typing import (
+    Any,
+    AsyncGenerator,
+    AsyncIterator,
+    Awaitable,
+    Callable,
+    Iterator,
+    Optional,
+    Sequence,
+    TypeVar,
+)
 
 
+import httpr
 from typing_extensions import override
 
 from requests.exceptions import HTTPError
-from vespa.application import Vespa
+from vespa.application import Vespa, VespaAsync, VespaSync
 from vespa.exceptions import VespaError
+from vespa.io import VespaQueryResponse, VespaResponse
 
 
 LOGGER = logging.getLogger(__name__)
 
+_QUERY_HEADERS = {"Content-Type": "application/json", "Accept": "application/json"}
+
+# Time set aside for sending, receiving and parsing a query until it's been measured
+_DEFAULT_CLIENT_OVERHEAD_S = 0.01
+_CLIENT_OVERHEAD_EWMA_ALPHA = 0.2
+
+T = TypeVar("T")
+R = TypeVar("R")
+
 
 class SearchAdapter(ABC):
     """Base class for all search adapters."""
 
+    middlewares: Sequence[SearchMiddleware] = ()
+
+    def add_middleware(self, middleware: SearchMiddleware) -> None:
+        """
+        Add a middleware to run around every search made through the adapter
+
+        :param SearchMiddleware middleware: the middleware, which runs after any
+            already added
+        """
+        self.middlewares = [*self.middlewares, middleware]
+
+    def _search_with_middleware(
+        self,
+        context: SearchContext,
+        send: Callable[[SearchContext], SearchResponse[Family]],
+    ) -> SearchResponse[Family]:
+        """Run a search through the middleware hooks, sending it with `send`"""
+        # Only the middlewares whose before_request ran are unwound after it
+        entered: list[SearchMiddleware] = []
+        response = None
+        for middleware in self.middlewares:
+            entered.append(middleware)
+            response = middleware.before_request(context)
+            if response is not None:
+                context.short_circuited = True
+                break
+
+        if response is None:
+            try:
+                response = send(context)
+            except Exception as e:
+                for middleware in reversed(entered):
+                    response = middleware.on_error(context, e)
+                    if response is not None:
+                        break
+                else:
+                    raise
+
+        for middleware in reversed(entered):
+            response = middleware.after_response(context, response)
+        return response
+
+    async def _async_search_with_middleware(
+        self,
+        context: SearchContext,
+        send: Callable[[SearchContext], Awaitable[SearchResponse[Family]]],
+    ) -> SearchResponse[Family]:
+        """Run an async search through the middleware hooks, sending it with `send`"""
+        # Only the middlewares whose before_request ran are unwound after it
+        entered: list[SearchMiddleware] = []
+        response = None
+        for middleware in self.middlewares:
+            entered.append(middleware)
+            response = await middleware.abefore_request(context)
+            if response is not None:
+                context.short_circuited = True
+                break
+
+        if response is None:
+            try:
+                response = await send(context)
+            except Exception as e:
+                for middleware in reversed(entered):
+                    response = await middleware.aon_error(context, e)
+                    if response is not None:
+                        break
+                else:
+                    raise
+
+        for middleware in reversed(entered):
+            response = await middleware.aafter_response(context, response)
+        return response
+
     @abstractmethod
     def search(self, parameters: SearchParameters) -> SearchResponse[Family]:
         """
@@ -69,108 +192,1570 @@ class SearchAdapter(ABC):
         """
         raise NotImplementedError
 
+    async def async_get_by_id(self, document_id: str) -> Hit:
+        """
+        Get a single document by its ID asynchronously
+
+        Runs `get_by_id` in a thread unless overridden by the adapter.
+
+        :param str document_id: document ID
+        :return Hit: a single document or passage
+        """
+        return await asyncio.to_thread(self.get_by_id, document_id)
+
+    def get_by_ids(
+        self, document_ids: Sequence[str], max_concurrency: int = 8
+    ) -> list[Result[Hit, Error]]:
+        """
+        Get many documents by their IDs concurrently, on a pool of threads
+
+        :param Sequence[str] document_ids: document IDs
+        :param int max_concurrency: the maximum number of fetches in flight at once
+        :return list[Result[Hit, Error]]: one result per ID, in the same order as
+            `document_ids`. A document that can't be found or fetched is returned as
+            an `Err`, with the `DocumentNotFoundError` or other exception in its
+            metadata
+        """
+        return _map_with_threads(self.get_by_id, document_ids, max_concurrency)
+
+    async def async_get_by_ids(
+        self, document_ids: Sequence[str], max_concurrency: int = 8
+    ) -> list[Result[Hit, Error]]:
+        """
+        Get many documents by their IDs concurrently, asynchronously
+
+        :param Sequence[str] document_ids: document IDs
+        :param int max_concurrency: the maximum number of fetches in flight at once
+        :return list[Result[Hit, Error]]: one result per ID, in the same order as
+            `document_ids`. A document that can't be found or fetched is returned as
+            an `Err`, with the `DocumentNotFoundError` or other exception in its
+            metadata
+        """
+        return await _async_map(self.async_get_by_id, document_ids, max_concurrency)
+
+    def search_many(
+        self, parameters: Sequence[SearchParameters], max_concurrency: int = 8
+    ) -> list[Result[SearchResponse[Family], Error]]:
+        """
+        Run many searches concurrently, on a pool of threads
+
+        :param Sequence[SearchParameters] parameters: the search request objects
+        :param int max_concurrency: the maximum number of searches in flight at once
+        :return list[Result[SearchResponse[Family], Error]]: one result per search, in
+            the same order as `parameters`. A failed search is returned as an `Err`
+            rather than raised, so it doesn't affect the rest of the batch
+        """
+        return _map_with_threads(self.search, parameters, max_concurrency)
+
+    async def async_search_many(
+        self, parameters: Sequence[SearchParameters], max_concurrency: int = 8
+    ) -> list[Result[SearchResponse[Family], Error]]:
+        """
+        Run many searches concurrently, asynchronously
+
+        :param Sequence[SearchParameters] parameters: the search request objects
+        :param int max_concurrency: the maximum number of searches in flight at once
+        :return list[Result[SearchResponse[Family], Error]]: one result per search, in
+            the same order as `parameters`. A failed search is returned as an `Err`
+            rather than raised, so it doesn't affect the rest of the batch
+        """
+        return await _async_map(self.async_search, parameters, max_concurrency)
+
+    def iter_pages(
+        self, parameters: SearchParameters, prefetch_pages: int = 1
+    ) -> Iterator[SearchResponse[Family]]:
+        """
+        Iterate over every page of results for a search, following continuations
+
+        :param SearchParameters parameters: a search request object. If it has
+            continuation tokens, iteration starts from that page
+        :param int prefetch_pages: how many pages may be fetched, in a background
+            thread, ahead of the one being consumed. 0 fetches each page only when
+            it's asked for
+        :return Iterator[SearchResponse[Family]]: each page's response, in order
+        """
+        _validate_prefetch_pages(prefetch_pages)
+        pages = _follow_continuations(self.search, parameters)
+        if prefetch_pages == 0:
+            return pages
+        return _prefetch(pages, prefetch_pages)
+
+    async def aiter_pages(
+        self, parameters: SearchParameters, prefetch_pages: int = 1
+    ) -> AsyncGenerator[SearchResponse[Family], None]:
+        """
+        Iterate asynchronously over every page of results for a search
+
+        :param SearchParameters parameters: a search request object. If it has
+            continuation tokens, iteration starts from that page
+        :param int prefetch_pages: how many pages may be fetched, in a background
+            task, ahead of the one being consumed. 0 fetches each page only when
+            it's asked for
+        :return AsyncGenerator[SearchResponse[Family], None]: each page's response,
+            in order
+        """
+        _validate_prefetch_pages(prefetch_pages)
+        pages = _afollow_continuations(self.async_search, parameters)
+        if prefetch_pages > 0:
+            pages = _aprefetch(pages, prefetch_pages)
+        async with aclosing(pages):
+            async for page in pages:
+                yield page
+
+    def iter_families(
+        self, parameters: SearchParameters, prefetch_pages: int = 1
+    ) -> Iterator[Family]:
+        """
+        Iterate over every family matching a search, across all pages of results
+
+        The next page is fetched in the background while the current one is
+        consumed, so pages are only waited for if they're consumed faster than
+        they're fetched.
+
+        :param SearchParameters parameters: a search request object
+        :param int prefetch_pages: how many pages may be fetched ahead of the one
+            being consumed
+        :return Iterator[Family]: every matching family, in result order
+        """
+        for page in self.iter_pages(parameters, prefetch_pages):
+            yield from page.results
+
+    async def aiter_families(
+        self, parameters: SearchParameters, prefetch_pages: int = 1
+    ) -> AsyncIterator[Family]:
+        """
+        Iterate asynchronously over every family matching a search
+
+        :param SearchParameters parameters: a search request object
+        :param int prefetch_pages: how many pages may be fetched ahead of the one
+            being consumed
+        :return AsyncIterator[Family]: every matching family, in result order
+        """
+        async with aclosing(self.aiter_pages(parameters, prefetch_pages)) as pages:
+            async for page in pages:
+                for family in page.results:
+                    yield family
+
+    def iter_family_hits(
+        self,
+        parameters: SearchParameters,
+        response: SearchResponse[Family],
+        family_id: str,
+    ) -> Iterator[Hit]:
+        """
+        Iterate over every matching hit in a family, following passage continuations
+
+        Starts with the hits already in `response`, then fetches the family's
+        following pages of hits until there are none left.
+
+        :param SearchParameters parameters: the search request that produced
+            `response`
+        :param SearchResponse[Family] response: a page of results containing the
+            family
+        :param str family_id: the ID of the family to get hits for
+        :raises ValueError: if the family isn't in `response`
+        :return Iterator[Hit]: every matching hit in the family, in result order
+        """
+        family: Optional[Family] = _find_family(response, family_id)
+        this_token = response.this_continuation_token
+        while family is not None:
+            yield from family.hits
+            family = _next_family_hits_page(self.search, parameters, this_token, family)
+
+    async def aiter_family_hits(
+        self,
+        parameters: SearchParameters,
+        response: SearchResponse[Family],
+        family_id: str,
+    ) -> AsyncIterator[Hit]:
+        """
+        Iterate asynchronously over every matching hit in a family
+
+        :param SearchParameters parameters: the search request that produced
+            `response`
+        :param SearchResponse[Family] response: a page of results containing the
+            family
+        :param str family_id: the ID of the family to get hits for
+        :raises ValueError: if the family isn't in `response`
+        :return AsyncIterator[Hit]: every matching hit in the family, in result order
+        """
+        family: Optional[Family] = _find_family(response, family_id)
+        this_token = response.this_continuation_token
+        while family is not None:
+            for hit in family.hits:
+                yield hit
+            family = await _anext_family_hits_page(
+                self.async_search, parameters, this_token, family
+            )
+
+    def get_all_family_hits(
+        self,
+        parameters: SearchParameters,
+        response: SearchResponse[Family],
+        max_concurrency: int = 8,
+    ) -> dict[str, Result[list[Hit], Error]]:
+        """
+        Get every matching hit for each family in a page of results
+
+        Families are walked concurrently, each following its own passage
+        continuations.
+
+        :param SearchParameters parameters: the search request that produced
+            `response`
+        :param SearchResponse[Family] response: a page of results
+        :param int max_concurrency: the maximum number of families fetched at once
+        :return dict[str, Result[list[Hit], Error]]: every matching hit, keyed on
+            family ID in result order. A family that fails is returned as an `Err`
+        """
+        results = _map_with_threads(
+            lambda family: list(self.iter_family_hits(parameters, response, family.id)),
+            response.results,
+            max_concurrency,
+        )
+        return {f.id: result for f, result in zip(response.results, results)}
+
+    async def async_get_all_family_hits(
+        self,
+        parameters: SearchParameters,
+        response: SearchResponse[Family],
+        max_concurrency: int = 8,
+    ) -> dict[str, Result[list[Hit], Error]]:
+        """
+        Get every matching hit for each family in a page of results, asynchronously
+
+        :param SearchParameters parameters: the search request that produced
+            `response`
+        :param SearchResponse[Family] response: a page of results
+        :param int max_concurrency: the maximum number of families fetched at once
+        :return dict[str, Result[list[Hit], Error]]: every matching hit, keyed on
+            family ID in result order. A family that fails is returned as an `Err`
+        """
+
+        async def all_hits(family: Family) -> list[Hit]:
+            hits = self.aiter_family_hits(parameters, response, family.id)
+            return [hit async for hit in hits]
+
+        results = await _async_map(all_hits, response.results, max_concurrency)
+        return {f.id: result for f, result in zip(response.results, results)}
+
+
+def _validate_max_concurrency(max_concurrency: int) -> None:
+    if max_concurrency < 1:
+        raise ValueError(f"max_concurrency must be at least 1, got {max_concurrency}")
+
+
+def _map_with_threads(
+    fn: Callable[[T], R], items: Sequence[T], max_concurrency: int
+) -> list[Result[R, Error]]:
+    """Apply a function to each item on a pool of threads, catching failures"""
+    _validate_max_concurrency(max_concurrency)
+    if not items:
+        return []
+
+    def run(item: T) -> Result[R, Error]:
+        try:
+            return Ok(fn(item))
+        except Exception as e:
+            return Err(_error_from_exception(e))
+
+    with ThreadPoolExecutor(max_workers=min(max_concurrency, len(items))) as executor:
+        return list(executor.map(run, items))
+
+
+async def _async_map(
+    fn: Callable[[T], Awaitable[R]], items: Sequence[T], max_concurrency: int
+) -> list[Result[R, Error]]:
+    """Apply an async function to each item with bounded concurrency"""
+    _validate_max_concurrency(max_concurrency)
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def run(item: T) -> Result[R, Error]:
+        async with semaphore:
+            try:
+                return Ok(await fn(item))
+            except Exception as e:
+                return Err(_error_from_exception(e))
+
+    return list(await asyncio.gather(*(run(item) for item in items)))
+
+
+def _validate_prefetch_pages(prefetch_pages: int) -> None:
+    if prefetch_pages < 0:
+        raise ValueError(f"prefetch_pages can't be negative, got {prefetch_pages}")
+
+
+def _next_page_parameters(
+    parameters: SearchParameters, response: SearchResponse[Family]
+) -> Optional[SearchParameters]:
+    """The parameters for the page after a response, or None if it was the last"""
+    if not response.results or not response.continuation_token:
+        return None
+    return parameters.model_copy(
+        update={"continuation_tokens": [response.continuation_token]}
+    )
+
+
+def _follow_continuations(
+    search: Callable[[SearchParameters], SearchResponse[Family]],
+    parameters: Optional[SearchParameters],
+) -> Iterator[SearchResponse[Family]]:
+    while parameters is not None:
+        response = search(parameters)
+        yield response
+        parameters = _next_page_parameters(parameters, response)
+
+
+async def _afollow_continuations(
+    search: Callable[[SearchParameters], Awaitable[SearchResponse[Family]]],
+    parameters: Optional[SearchParameters],
+) -> AsyncGenerator[SearchResponse[Family], None]:
+    while parameters is not None:
+        response = await search(parameters)
+        yield response
+        parameters = _next_page_parameters(parameters, response)
+
+
+def _find_family(response: SearchResponse[Family], family_id: str) -> Family:
+    for family in response.results:
+        if family.id == family_id:
+            return family
+    raise ValueError(f"Family {family_id} isn't in the search response")
+
+
+def _family_hits_page_parameters(
+    parameters: SearchParameters, this_token: Optional[str], family: Family
+) -> Optional[SearchParameters]:
+    """The parameters for a family's next page of hits, or None if there isn't one"""
+    if not family.hits or not family.continuation_token:
+        return None
+    continuation_tokens = [family.continuation_token]
+    if this_token:
+        continuation_tokens.insert(0, this_token)
+    return parameters.model_copy(update={"continuation_tokens": continuation_tokens})
+
+
+def _next_family_hits_page(
+    search: Callable[[SearchParameters], SearchResponse[Family]],
+    parameters: SearchParameters,
+    this_token: Optional[str],
+    family: Family,
+) -> Optional[Family]:
+    """Fetch the next page of a family's hits, if there is one"""
+    next_parameters = _family_hits_page_parameters(parameters, this_token, family)
+    if next_parameters is None:
+        return None
+    response = search(next_parameters)
+    return next((f for f in response.results if f.id == family.id), None)
+
+
+async def _anext_family_hits_page(
+    search: Callable[[SearchParameters], Awaitable[SearchResponse[Family]]],
+    parameters: SearchParameters,
+    this_token: Optional[str],
+    family: Family,
+) -> Optional[Family]:
+    """Fetch the next page of a family's hits asynchronously, if there is one"""
+    next_parameters = _family_hits_page_parameters(parameters, this_token, family)
+    if next_parameters is None:
+        return None
+    response = await search(next_parameters)
+    return next((f for f in response.results if f.id == family.id), None)
+
+
+def _prefetch(items: Iterator[T], max_ahead: int) -> Iterator[T]:
+    """
+    Consume an iterator in a background thread, staying at most `max_ahead` ahead
+
+    Exceptions raised by the iterator are re-raised to the consumer, and the thread
+    stops once the consumer stops iterating.
+    """
+    buffer: queue.Queue[Optional[Result[T, BaseException]]] = queue.Queue()
+    slots = threading.Semaphore(max_ahead)
+    stopped = threading.Event()
+
+    def produce() -> None:
+        try:
+            while True:
+                slots.acquire()
+                if stopped.is_set():
+                    return
+                try:
+                    item = next(items)
+                except StopIteration:
+                    buffer.put(None)
+                    return
+                buffer.put(Ok(item))
+        except BaseException as e:
+            buffer.put(Err(e))
+
+    thread = threading.Thread(target=produce, daemon=True)
+    thread.start()
+    try:
+        while (result := buffer.get()) is not None:
+            match result:
+                case Ok(item):
+                    slots.release()
+                    yield item
+                case Err(error):
+                    raise error
+    finally:
+        stopped.set()
+        slots.release()
+
+
+async def _aprefetch(
+    items: AsyncIterator[T], max_ahead: int
+) -> AsyncGenerator[T, None]:
+    """
+    Consume an async iterator in a background task, at most `max_ahead` ahead
+
+    Exceptions raised by the iterator are re-raised to the consumer, and the task
+    is cancelled once the consumer stops iterating.
+    """
+    buffer: asyncio.Queue[Optional[Result[T, BaseException]]] = asyncio.Queue()
+    slots = asyncio.Semaphore(max_ahead)
+
+    async def produce() -> None:
+        try:
+            while True:
+                await slots.acquire()
+                try:
+                    item = await anext(items)
+                except StopAsyncIteration:
+                    buffer.put_nowait(None)
+                    return
+                buffer.put_nowait(Ok(item))
+        except Exception as e:
+            buffer.put_nowait(Err(e))
+
+    task = asyncio.create_task(produce())
+    try:
+        while (result := await buffer.get()) is not None:
+            match result:
+                case Ok(item):
+                    slots.release()
+                    yield item
+                case Err(error):
+                    raise error
+    finally:
+        task.cancel()
+        with suppress(asyncio.CancelledError):
+            await task
+
+
+def _query_error(e: VespaError) -> Exception:
+    """Map invalid query errors from vespa to QueryError, leaving others as they are"""
+    err_details = VespaErrorDetails(e)
+    if err_details.is_invalid_query_parameter:
+        LOGGER.error(err_details.message)
+        return QueryError(err_details.summary)
+    return e
+
+
+def _error_from_exception(e: Exception) -> Error:
+    """Wrap an exception as an Error, keeping the exception in its metadata"""
+    return Error(msg=f"{e.__class__.__name__}: {e}", metadata={"exception": e})
+
 
 class VespaSearchAdapter(SearchAdapter):
     """Search within a Vespa instance."""
 
     instance_url: str
+    instance_urls: list[str]
     client: Vespa
+    clients: dict[str, Vespa]
+    router: EndpointRouter | None
 
     def __init__(
         self,
-        instance_url: str,
+        instance_url: str | Sequence[str],
         cert_directory: str | None = None,
         skip_cert_usage: bool = False,
         vespa_cloud_secret_token: str | None = None,
+        async_connections: int = 8,
+        async_timeout: float = 30.0,
+        async_keepalive_s: float | None = None,
+        async_session_kwargs: dict[str, Any] | None = None,
+        cache: SearchCache | None = None,
+        coalesce_requests: bool = True,
+        middlewares: Sequence[SearchMiddleware] = (),
+        hedge_policy: HedgePolicy | None = None,
+        retry_policy: RetryPolicy | None = None,
+        circuit_breaker: CircuitBreaker | None = None,
+        routing_policy: RoutingPolicy | None = None,
+        governor: RequestGovernor | None = None,
+        priority: int = Priority.INTERACTIVE,
+        trusted_responses: bool = False,
+        lazy_responses: bool = False,
+        result_format: str = "json",
     ):
         """
         Initialise the Vespa search adapter.
 
-        :param instance_url: URL of the Vespa instance to connect to
+        :param instance_url: URL of the Vespa instance to connect to, or a list of
+            URLs of endpoints serving the same instance to spread queries across
         :param cert_directory: Optional directory containing cert.pem and key.pem files.
             If None, will attempt to find certs automatically.
         :param skip_cert_usage: If True, will not use certs, this is useful for
             running against local instances that aren't secured.
         :param vespa_cloud_secret_token: If present, will use to authenticate to vespa
             cloud
+        :param async_connections: Size of the connection pool held by the adapter's
+            long-lived async session
+        :param async_timeout: Timeout in seconds for requests made through the async
+            session
+        :param async_keepalive_s: If set, an async session that has been idle for
+            longer than this many seconds is closed and reopened on next use. If None,
+            the session is kept open until `aclose` is called.
+        :param async_session_kwargs: Extra keyword arguments passed through to the
+            underlying async HTTP client, e.g. to tune the transport
+        :param cache: If present, responses are cached here and repeated requests
+            are served from it rather than sent to vespa
+        :param coalesce_requests: If True, a search with the same request body as one
+            already in flight waits for that response rather than sending its own
+        :param middlewares: Middleware to run around every search, in order. More can
+            be added with `add_middleware`
+        :param hedge_policy: If present, async searches that are slow to return are
+            sent again according to this policy, and the first response used
+        :param retry_policy: If present, failed requests to vespa are retried with
+            backoff according to this policy
+        :param circuit_breaker: If present, requests fail fast with a
+            `CircuitOpenError` while this breaker is open
+        :param routing_policy: How queries are routed when there are several
+            endpoints. Defaults to a `RoutingPolicy` with default settings
+        :param governor: If present, limits the rate and concurrency of queries.
+            Defaults to the process-wide governor set with `set_default_governor`,
+            if there is one
+        :param priority: The priority of this adapter's queries when waiting for
+            the governor, e.g. `Priority.BATCH` for bulk jobs
+        :param trusted_responses: If True, responses from vespa are assumed to match
+            the schemas, and are parsed without validation. That's much faster for
+            large responses and gives equal results, but a malformed response can
+            give malformed results rather than raising
+        :param lazy_responses: If True, the families and hits in responses are only
+            built when they're first read, which is much faster when only some of a
+            wide response is read. Errors building them are raised then too
+        :param result_format: The format vespa is asked to send results in, "json"
+            or "cbor". CBOR is quicker for vespa to encode and a little smaller,
+            and needs cbor2 installed. Streamed searches always use JSON
         """
-        self.instance_url = instance_url
-        if vespa_cloud_secret_token:
-            self.client = Vespa(
-                url=instance_url, vespa_cloud_secret_token=vespa_cloud_secret_token
-            )
-        elif skip_cert_usage:
-            cert_path = None
-            key_path = None
-            self.client = Vespa(url=instance_url)
+        validate_result_format(result_format)
+        instance_urls = (
+            [instance_url] if isinstance(instance_url, str) else list(instance_url)
+        )
+        if not instance_urls:
+            raise ValueError("At least one instance_url is needed")
+        self.instance_url = instance_urls[0]
+        self.instance_urls = instance_urls
+        self.router = (
+            EndpointRouter(instance_urls, routing_policy)
+            if len(instance_urls) > 1
+            else None
+        )
+        self.async_connections = async_connections
+        self.async_timeout = async_timeout
+        self.async_keepalive_s = async_keepalive_s
+        self.async_session_kwargs = async_session_kwargs or {}
+        self.cache = cache
+        self.coalesce_requests = coalesce_requests
+        self.middlewares = list(middlewares)
+        self.hedge_policy = hedge_policy
+        self.retry_policy = retry_policy
+        self.circuit_breaker = circuit_breaker
+        self.governor = governor
+        self.priority = priority
+        self.trusted_responses = trusted_responses
+        self.lazy_responses = lazy_responses
+        self.result_format = result_format
+        self._coalesced_count = 0
+        # In-flight requests are kept alongside their deadlines, as a request can
+        # only wait for one that won't give up before it does
+        self._in_flight: dict[
+            str, tuple[Future[VespaQueryResponse], Optional[float]]
+        ] = {}
+        self._in_flight_lock = threading.Lock()
+        self._async_in_flight: dict[
+            str, tuple[asyncio.Task[VespaQueryResponse], Optional[float]]
+        ] = {}
+        self._client_overhead_s = _DEFAULT_CLIENT_OVERHEAD_S
+        # Each endpoint has its own pooled sync client and async session, keyed on
+        # its url, alongside the credentials they were opened with
+        self._sync_http_clients: dict[str, tuple[httpr.Client, tuple]] = {}
+        self._sync_http_client_lock = threading.Lock()
+        self._async_sessions: dict[str, tuple[VespaAsync, tuple]] = {}
+        self._async_session_last_used: dict[str, float] = {}
+        # How many requests are using each async session, so one that's replaced
+        # while they're in flight is only closed once they've finished
+        self._async_session_users: dict[VespaAsync, int] = {}
+        self._vespa_cloud_secret_token = vespa_cloud_secret_token
+        self._discover_certs = False
+        self._cert_paths: tuple[str | None, str | None] = (None, None)
+        if vespa_cloud_secret_token or skip_cert_usage:
+            pass
         elif cert_directory is None:
-            cert_path, key_path = find_vespa_cert_paths()
-            self.client = Vespa(url=instance_url, cert=cert_path, key=key_path)
+            self._discover_certs = True
+            self._cert_paths = find_vespa_cert_paths()
         else:
             cert_path = (Path(cert_directory) / "cert.pem").__str__()
             key_path = (Path(cert_directory) / "key.pem").__str__()
-            self.client = Vespa(url=instance_url, cert=cert_path, key=key_path)
+            self._cert_paths = (cert_path, key_path)
+        self._build_clients()
+
+    def _build_clients(self) -> None:
+        """Create a vespa client for each endpoint, with the adapter's credentials"""
+        if self._vespa_cloud_secret_token:
+            self.clients = {
+                url: Vespa(
+                    url=url, vespa_cloud_secret_token=self._vespa_cloud_secret_token
+                )
+                for url in self.instance_urls
+            }
+        else:
+            cert_path, key_path = self._cert_paths
+            self.clients = {
+                url: Vespa(url=url, cert=cert_path, key=key_path)
+                for url in self.instance_urls
+            }
+        self.client = self.clients[self.instance_url]
+
+    def _credentials(self) -> tuple:
+        """
+        The adapter's cert paths and their file stamps, to spot rotated certs
+
+        If the certs were found automatically and have since moved, e.g. to another
+        application, the vespa clients are rebuilt to use them.
+
+        :return tuple: a value that changes whenever the certs do
+        """
+        if self._discover_certs:
+            cert_paths = find_vespa_cert_paths()
+            if cert_paths != self._cert_paths:
+                LOGGER.info("Vespa certs have moved, rebuilding the clients")
+                self._cert_paths = cert_paths
+                self._build_clients()
+        elif self._cert_paths == (None, None):
+            return ()
+        return self._cert_paths + VESPA_CERT_CACHE.fingerprint(*self._cert_paths)
 
     @override
-    def search(self, parameters: SearchParameters) -> SearchResponse[Family]:
+    def search(
+        self, parameters: SearchParameters, timeout_s: Optional[float] = None
+    ) -> SearchResponse[Family]:
         """
         Search a vespa instance
 
         :param SearchParameters parameters: a search request object
+        :param Optional[float] timeout_s: if set, the seconds the search has to
+            complete in. Vespa is told to stop in time for its response to be
+            received and parsed, and the request is cancelled if it's still going
+            when time runs out
+        :raises DeadlineExceededError: if the search doesn't complete in time
         :return SearchResponse[Family]: a list of families, with response metadata
         """
-        total_time_start = time.time()
-        vespa_request_body = build_vespa_request_body(parameters)
-        query_time_start = time.time()
+        total_time_start = time.perf_counter_ns()
+        deadline = _deadline(timeout_s)
+        timings = SearchTimings()
+        vespa_request_body = build_vespa_request_body(
+            parameters, timings=timings, result_format=self.result_format
+        )
+        if not self.middlewares:
+            return self._send_search(
+                vespa_request_body, timings, total_time_start, deadline
+            )
+
+        context = SearchContext(
+            parameters=parameters,
+            vespa_request_body=vespa_request_body,
+            started_ns=total_time_start,
+        )
+        return self._search_with_middleware(
+            context,
+            lambda context: self._send_search(
+                context.vespa_request_body or vespa_request_body,
+                timings,
+                total_time_start,
+                deadline,
+            ),
+        )
+
+    def _send_search(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        total_time_start: int,
+        deadline: Optional[float] = None,
+    ) -> SearchResponse[Family]:
+        """Get a response for a request body, from the cache or vespa, and parse it"""
+        query_time_start = time.perf_counter_ns()
+        vespa_response = self._cached(vespa_request_body, timings)
+        if vespa_response is None:
+            vespa_response = self._coalesced_fetch(
+                vespa_request_body, timings, deadline
+            )
+        query_time_end = time.perf_counter_ns()
+
+        response = _timed_parse(
+            vespa_response,
+            timings,
+            total_time_start,
+            query_time_start,
+            query_time_end,
+            self.trusted_responses,
+            self.lazy_responses,
+            summary_field_projection(vespa_request_body),
+        )
+        if deadline is not None:
+            self._record_client_overhead(timings)
+        return response
+
+    def stream_search(
+        self, parameters: SearchParameters, timeout_s: Optional[float] = None
+    ) -> SearchResponseStream:
+        """
+        Search a vespa instance, parsing each family as the response is read
+
+        Only one family is held in memory at a time, rather than the whole
+        response, which suits very wide searches. The stream holds a connection
+        and the governor's permission to query until it's read to the end or
+        closed. Streamed searches aren't cached, coalesced, hedged or retried,
+        and middleware isn't run around them.
+
+        :param SearchParameters parameters: a search request object
+        :param Optional[float] timeout_s: if set, the seconds the search has to
+            complete in, including reading the response
+        :raises DeadlineExceededError: if the search doesn't start in time
+        :raises FetchError: if vespa responds with an error status code
+        :return SearchResponseStream: the families in the response, with the rest
+            of the response once they've all been read
+        """
+        deadline = _deadline(timeout_s)
+        timings = SearchTimings()
+        # Always JSON, as the response is parsed as it's read
+        vespa_request_body = build_vespa_request_body(parameters, timings=timings)
+        permit = self._check_circuit()
+        recorded = False
+
+        def settle_probe() -> None:
+            if not recorded:
+                self._release_probe(permit)
+
+        with ExitStack() as cleanup:
+            cleanup.callback(settle_probe)
+            governor = self.governor or get_default_governor()
+            if governor is not None:
+                governor.acquire(self.priority)
+                cleanup.callback(governor.release)
+            content = self._encode_query(vespa_request_body, timings, deadline)
+            instance_url = self.instance_url
+            router = self.router
+            outcome = {"failed": True}
+            if router is not None:
+                instance_url = router.acquire()
+                start = time.perf_counter()
+                cleanup.callback(
+                    lambda: router.release(
+                        instance_url, time.perf_counter() - start, outcome["failed"]
+                    )
+                )
+            search_end_point = self.clients[instance_url].search_end_point
+            try:
+                http_response = cleanup.enter_context(
+                    self.get_sync_http_client(instance_url).stream(
+                        "POST",
+                        search_end_point,
+                        content=content,
+                        headers=_QUERY_HEADERS,
+                        timeout=_remaining_s(deadline),
+                    )
+                )
+            except httpr.TimeoutException as e:
+                if deadline is None:
+                    recorded = True
+                    self._on_failed_attempt(0, e, permit)
+                    raise
+                raise DeadlineExceededError() from e
+            except Exception as e:
+                recorded = True
+                self._on_failed_attempt(0, e, permit)
+                raise
+
+            outcome["failed"] = _is_failure_status(http_response.status_code)
+            if http_response.status_code != 200:
+                vespa_response = decode_vespa_response(
+                    http_response.read(), http_response.status_code, search_end_point
+                )
+                recorded = True
+                self._on_attempt_response(0, vespa_response, permit)
+                parse_vespa_response(_raise_for_query_errors(vespa_response))
+            recorded = True
+            if self.circuit_breaker is not None:
+                self.circuit_breaker.record_success(permit)
+            return SearchResponseStream(
+                http_response.iter_bytes(),
+                trusted=self.trusted_responses,
+                url=search_end_point,
+                summary_fields=summary_field_projection(vespa_request_body),
+                on_close=cleanup.pop_all().close,
+            )
+
+    def _query(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> VespaQueryResponse:
+        """
+        Send a request body to vespa over the adapter's pooled sync client
+
+        Failed attempts are retried according to the retry policy, unless the
+        backoff would run past the deadline, and attempts are refused while the
+        circuit breaker is open. Running out of time isn't counted as a failure,
+        as it's the caller's deadline rather than vespa that set the limit, but an
+        attempt that ends without an outcome still settles the breaker's probe.
+        """
+        attempt = 0
+        while True:
+            permit = self._check_circuit()
+            recorded = False
+            try:
+                try:
+                    http_response = self._send_query(
+                        vespa_request_body, timings, deadline
+                    )
+                except DeadlineExceededError:
+                    raise
+                except Exception as e:
+                    recorded = True
+                    delay = _within_deadline(
+                        self._on_failed_attempt(attempt, e, permit), deadline
+                    )
+                    if delay is None:
+                        raise
+                else:
+                    vespa_response = _decode_query_response(http_response, timings)
+                    recorded = True
+                    delay = _within_deadline(
+                        self._on_attempt_response(attempt, vespa_response, permit),
+                        deadline,
+                    )
+                    if delay is None:
+                        return _raise_for_query_errors(vespa_response)
+            finally:
+                if not recorded:
+                    self._release_probe(permit)
+            time.sleep(delay)
+            attempt += 1
+
+    async def _async_query(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> VespaQueryResponse:
+        """
+        Send a request body to vespa through the async session
+
+        Failed attempts are retried according to the retry policy, unless the
+        backoff would run past the deadline, and attempts are refused while the
+        circuit breaker is open. Running out of time isn't counted as a failure,
+        as it's the caller's deadline rather than vespa that set the limit, but an
+        attempt that ends without an outcome still settles the breaker's probe.
+        """
+        attempt = 0
+        while True:
+            permit = self._check_circuit()
+            recorded = False
+            try:
+                try:
+                    http_response = await self._async_send_query(
+                        vespa_request_body, timings, deadline
+                    )
+                except DeadlineExceededError:
+                    raise
+                except Exception as e:
+                    recorded = True
+                    delay = _within_deadline(
+                        self._on_failed_attempt(attempt, e, permit), deadline
+                    )
+                    if delay is None:
+                        raise
+                else:
+                    vespa_response = _decode_query_response(http_response, timings)
+                    recorded = True
+                    delay = _within_deadline(
+                        self._on_attempt_response(attempt, vespa_response, permit),
+                        deadline,
+                    )
+                    if delay is None:
+                        return _raise_for_query_errors(vespa_response)
+            finally:
+                # e.g. out of time, or a hedge that lost and was cancelled
+                if not recorded:
+                    self._release_probe(permit)
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    def _send_query(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> httpr.Response:
+        """
+        Send a query once the governor allows, timing the round trip
+
+        The query is encoded once it's allowed, so that any time spent waiting is
+        taken out of the timeout vespa is given.
+        """
+        governor = self.governor or get_default_governor()
+        if governor is not None:
+            wait_ns = governor.acquire(self.priority)
+            timings.queue_wait_ns = (timings.queue_wait_ns or 0) + wait_ns
+        try:
+            content = self._encode_query(vespa_request_body, timings, deadline)
+            network_start = time.perf_counter_ns()
+            try:
+                http_response = self._post(content, _remaining_s(deadline))
+            except httpr.TimeoutException as e:
+                if deadline is None:
+                    raise
+                raise DeadlineExceededError() from e
+            timings.network_ns = time.perf_counter_ns() - network_start
+            return http_response
+        finally:
+            if governor is not None:
+                governor.release()
+
+    async def _async_send_query(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> httpr.Response:
+        """Send a query asynchronously once the governor allows"""
+        governor = self.governor or get_default_governor()
+        if governor is not None:
+            try:
+                wait_ns = await asyncio.wait_for(
+                    governor.aacquire(self.priority), _remaining_s(deadline)
+                )
+            except asyncio.TimeoutError as e:
+                raise DeadlineExceededError() from e
+            timings.queue_wait_ns = (timings.queue_wait_ns or 0) + wait_ns
         try:
-            vespa_response = self.client.query(body=vespa_request_body)
-        except VespaError as e:
-            err_details = VespaErrorDetails(e)
-            if err_details.is_invalid_query_parameter:
-                LOGGER.error(err_details.message)
-                raise QueryError(err_details.summary)
+            content = self._encode_query(vespa_request_body, timings, deadline)
+            network_start = time.perf_counter_ns()
+            try:
+                http_response = await self._async_post(content, _remaining_s(deadline))
+            except httpr.TimeoutException as e:
+                if deadline is None:
+                    raise
+                raise DeadlineExceededError() from e
+            timings.network_ns = time.perf_counter_ns() - network_start
+            return http_response
+        finally:
+            if governor is not None:
+                governor.release()
+
+    def _encode_query(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> bytes:
+        """
+        Serialise a request body, recording how long it took
+
+        If there's a deadline, vespa is given whatever time is left, less the time
+        queries are expected to spend outside vespa.
+
+        :raises DeadlineExceededError: if there isn't enough time left to query
+        """
+        start = time.perf_counter_ns()
+        if deadline is not None:
+            vespa_timeout_s = deadline - time.monotonic() - self._client_overhead_s
+            if vespa_timeout_s <= 0:
+                raise DeadlineExceededError()
+            vespa_request_body = with_vespa_timeout(vespa_request_body, vespa_timeout_s)
+        content = encode_vespa_request_body(vespa_request_body)
+        timings.serialise_ns = time.perf_counter_ns() - start
+        return content
+
+    def _record_client_overhead(self, timings: SearchTimings) -> None:
+        """
+        Update the estimate of how long queries spend outside vespa
+
+        That's the time spent encoding, decoding and parsing, and the round trip's
+        time on the network rather than in vespa if vespa reported its timings.
+        Only searches that went to vespa themselves are counted.
+        """
+        if timings.network_ns is None or timings.coalesced or timings.cache_hit:
+            return
+        overhead_ns = (
+            (timings.serialise_ns or 0)
+            + (timings.decode_ns or 0)
+            + (timings.parse_ns or 0)
+        )
+        if timings.vespa_search_time_s is not None:
+            overhead_ns += max(
+                0, timings.network_ns - int(timings.vespa_search_time_s * 1e9)
+            )
+        self._client_overhead_s += _CLIENT_OVERHEAD_EWMA_ALPHA * (
+            overhead_ns / 1e9 - self._client_overhead_s
+        )
+
+    def _post(
+        self, content: bytes, timeout_s: Optional[float] = None
+    ) -> httpr.Response:
+        """
+        Send an encoded query to an endpoint, routing it if there are several
+
+        A request that times out isn't counted as a failure of the endpoint, as the
+        timeout comes from the search's deadline, but its latency is recorded.
+        """
+        if self.router is None:
+            return self.get_sync_http_client().post(
+                self.client.search_end_point,
+                content=content,
+                headers=_QUERY_HEADERS,
+                timeout=timeout_s,
+            )
+
+        instance_url = self.router.acquire()
+        start = time.perf_counter()
+        failed = True
+        try:
+            http_response = self.get_sync_http_client(instance_url).post(
+                self.clients[instance_url].search_end_point,
+                content=content,
+                headers=_QUERY_HEADERS,
+                timeout=timeout_s,
+            )
+            failed = _is_failure_status(http_response.status_code)
+            return http_response
+        except httpr.TimeoutException:
+            failed = timeout_s is None
+            raise
+        finally:
+            self.router.release(instance_url, time.perf_counter() - start, failed)
+
+    async def _async_post(
+        self, content: bytes, timeout_s: Optional[float] = None
+    ) -> httpr.Response:
+        """Send an encoded query to an endpoint asynchronously, routing it if needed"""
+        if self.router is None:
+            async with self._async_http_client(self.instance_url) as http_client:
+                return await http_client.post(
+                    self.client.search_end_point,
+                    content=content,
+                    headers=_QUERY_HEADERS,
+                    timeout=timeout_s,
+                )
+
+        instance_url = self.router.acquire()
+        start = time.perf_counter()
+        failed = True
+        cancelled = False
+        try:
+            async with self._async_http_client(instance_url) as http_client:
+                http_response = await http_client.post(
+                    self.clients[instance_url].search_end_point,
+                    content=content,
+                    headers=_QUERY_HEADERS,
+                    timeout=timeout_s,
+                )
+            failed = _is_failure_status(http_response.status_code)
+            return http_response
+        except httpr.TimeoutException:
+            failed = timeout_s is None
+            raise
+        except asyncio.CancelledError:
+            # e.g. a hedge that lost, which says nothing about the endpoint's health,
+            # and whose latency was cut short
+            cancelled = True
+            raise
+        finally:
+            self.router.release(
+                instance_url,
+                None if cancelled else time.perf_counter() - start,
+                failed,
+            )
+
+    def _check_circuit(self) -> Optional[CircuitPermit]:
+        """
+        Raise if the circuit breaker is refusing requests
+
+        :return Optional[CircuitPermit]: the breaker's permit for the attempt, to
+            record its outcome with, or None if there's no breaker
+        """
+        if self.circuit_breaker is None:
+            return None
+        permit = self.circuit_breaker.allow_request()
+        if permit is None:
+            raise CircuitOpenError()
+        return permit
+
+    def _release_probe(self, permit: Optional[CircuitPermit]) -> None:
+        """Settle an attempt that ended without recording a success or failure"""
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.release_probe(permit)
+
+    def _on_failed_attempt(
+        self, attempt: int, error: Exception, permit: Optional[CircuitPermit]
+    ) -> Optional[float]:
+        """Record an attempt that raised, returning the backoff if it should retry"""
+        if self.circuit_breaker is not None:
+            self.circuit_breaker.record_failure(permit)
+        if self.retry_policy is None:
+            return None
+        return self.retry_policy.next_delay(
+            attempt, self.retry_policy.is_retryable_error(error)
+        )
+
+    def _on_attempt_response(
+        self,
+        attempt: int,
+        vespa_response: VespaQueryResponse,
+        permit: Optional[CircuitPermit],
+    ) -> Optional[float]:
+        """Record an attempt's response, returning the backoff if it should retry"""
+        if self.circuit_breaker is not None:
+            if _is_failure_status(vespa_response.status_code):
+                self.circuit_breaker.record_failure(permit)
             else:
-                raise e
-        query_time_end = time.time()
+                self.circuit_breaker.record_success(permit)
+        if self.retry_policy is None:
+            return None
+        return self.retry_policy.next_delay(
+            attempt, self.retry_policy.is_retryable_response(vespa_response)
+        )
 
-        response = parse_vespa_response(vespa_response=vespa_response)  # type: ignore[arg-type]
+    async def _async_hedged_query(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> VespaQueryResponse:
+        """
+        Send a request body to vespa asynchronously, hedging it if it's slow
 
-        response.query_time_ms = int((query_time_end - query_time_start) * 1000)
-        response.total_time_ms = int((time.time() - total_time_start) * 1000)
+        If the request hasn't returned within the hedge policy's delay, a duplicate
+        is sent, the first to succeed is used, and the other is cancelled.
+        """
+        policy = self.hedge_policy
+        if policy is None:
+            return await self._async_query(vespa_request_body, timings, deadline)
 
-        return response
+        policy.start_request()
+        start = time.perf_counter()
+        primary = asyncio.ensure_future(
+            self._async_query(vespa_request_body, timings, deadline)
+        )
+        attempts = {primary: timings}
+        try:
+            done, pending = await asyncio.wait(attempts, timeout=policy.hedge_delay())
+            if not done and policy.try_hedge():
+                hedge_timings = SearchTimings()
+                hedge = asyncio.ensure_future(
+                    self._async_query(vespa_request_body, hedge_timings, deadline)
+                )
+                attempts[hedge] = hedge_timings
+                pending.add(hedge)
+                timings.hedged = True
+
+            while True:
+                if pending:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                winner = next((t for t in done if t.exception() is None), None)
+                if winner is not None or not pending:
+                    break
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+        if winner is None:
+            # Every attempt failed, so raise the original request's error
+            return primary.result()
+
+        policy.record(time.perf_counter() - start, hedge_won=winner is not primary)
+        if winner is not primary:
+            winner_timings = attempts[winner]
+            timings.serialise_ns = winner_timings.serialise_ns
+            timings.network_ns = winner_timings.network_ns
+            timings.decode_ns = winner_timings.decode_ns
+        return winner.result()
+
+    def _fetch(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> VespaQueryResponse:
+        """Query vespa, caching the response if caching is enabled"""
+        vespa_response = self._query(vespa_request_body, timings, deadline)
+        if self.cache is not None:
+            self.cache.set(vespa_request_body, vespa_response)
+        return vespa_response
+
+    async def _async_fetch(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> VespaQueryResponse:
+        """Query vespa asynchronously, caching the response if caching is enabled"""
+        vespa_response = await self._async_hedged_query(
+            vespa_request_body, timings, deadline
+        )
+        if self.cache is not None:
+            self.cache.set(vespa_request_body, vespa_response)
+        return vespa_response
+
+    def _coalesced_fetch(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> VespaQueryResponse:
+        """
+        Query vespa, sharing the response with identical requests already in flight
+
+        The first caller for a request body sends it, and any thread asking for the
+        same body while it's in flight waits for that response instead of sending
+        its own, as long as the request in flight won't give up sooner than it.
+        """
+        if not self.coalesce_requests:
+            return self._fetch(vespa_request_body, timings, deadline)
+
+        key = request_cache_key(vespa_request_body)
+        with self._in_flight_lock:
+            in_flight = self._in_flight.get(key)
+            future: Future[VespaQueryResponse] = in_flight[0] if in_flight else Future()
+            if in_flight is None:
+                self._in_flight[key] = (future, deadline)
+            elif _outlasts(in_flight[1], deadline):
+                self._coalesced_count += 1
+
+        if in_flight is not None:
+            if not _outlasts(in_flight[1], deadline):
+                # The request in flight would give up too soon, so send another
+                return self._fetch(vespa_request_body, timings, deadline)
+            timings.coalesced = True
+            try:
+                return future.result(_remaining_s(deadline))
+            except FutureTimeoutError as e:
+                raise DeadlineExceededError() from e
+
+        try:
+            vespa_response = self._fetch(vespa_request_body, timings, deadline)
+        except BaseException as e:
+            with self._in_flight_lock:
+                del self._in_flight[key]
+            future.set_exception(e)
+            raise
+        with self._in_flight_lock:
+            del self._in_flight[key]
+        future.set_result(vespa_response)
+        return vespa_response
+
+    async def _async_coalesced_fetch(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> VespaQueryResponse:
+        """
+        Query vespa asynchronously, sharing the response with identical requests
+
+        The request runs as a task shared by every caller asking for the same body
+        while it's in flight, so a caller being cancelled, or running out of time,
+        doesn't cancel the request for the others. Callers only share a request
+        that won't give up sooner than they would.
+        """
+        if not self.coalesce_requests:
+            return await self._async_fetch(vespa_request_body, timings, deadline)
+
+        key = request_cache_key(vespa_request_body)
+        loop = asyncio.get_running_loop()
+        in_flight = self._async_in_flight.get(key)
+        if in_flight is not None and in_flight[0].get_loop() is loop:
+            task, leader_deadline = in_flight
+            if not _outlasts(leader_deadline, deadline):
+                # The request in flight would give up too soon, so send another
+                return await self._async_fetch(vespa_request_body, timings, deadline)
+            self._coalesced_count += 1
+            timings.coalesced = True
+        else:
+            task = loop.create_task(
+                self._async_fetch(vespa_request_body, timings, deadline)
+            )
+            self._async_in_flight[key] = (task, deadline)
+
+            def forget(done: asyncio.Task) -> None:
+                in_flight = self._async_in_flight.get(key)
+                if in_flight is not None and in_flight[0] is done:
+                    del self._async_in_flight[key]
+                if not done.cancelled():
+                    # Mark the exception as retrieved, in case every caller has gone
+                    done.exception()
+
+            task.add_done_callback(forget)
+
+        try:
+            return await asyncio.wait_for(asyncio.shield(task), _remaining_s(deadline))
+        except asyncio.TimeoutError as e:
+            raise DeadlineExceededError() from e
+
+    @property
+    def coalesced_count(self) -> int:
+        """The number of requests answered by sharing an identical in-flight request"""
+        return self._coalesced_count
+
+    def _cached(
+        self, vespa_request_body: dict[str, Any], timings: SearchTimings
+    ) -> Optional[VespaQueryResponse]:
+        """Get a response from the cache, if caching is enabled and there is one"""
+        if self.cache is None:
+            return None
+        response_json = self.cache.get(vespa_request_body)
+        if response_json is None:
+            return None
+        timings.cache_hit = True
+        return VespaQueryResponse(
+            json=response_json, status_code=200, url=self.instance_url
+        )
+
+    def get_sync_http_client(self, instance_url: str | None = None) -> httpr.Client:
+        """
+        Get the adapter's long-lived sync HTTP client, opening it if needed
+
+        Like the async session, the client and its connections are shared by every
+        sync search made through the adapter, and it's reopened if the certs are
+        rotated. Each endpoint has its own client. Close them with `close`, or use
+        the adapter as a context manager.
+
+        :param str | None instance_url: the endpoint to get the client for,
+            defaulting to the first
+        :return httpr.Client: an open HTTP client, configured with the adapter's
+            authentication
+        """
+        instance_url = instance_url or self.instance_url
+        credentials = self._credentials()
+        pooled = self._sync_http_clients.get(instance_url)
+        if pooled is None or pooled[1] != credentials:
+            with self._sync_http_client_lock:
+                pooled = self._sync_http_clients.get(instance_url)
+                if pooled is None or pooled[1] != credentials:
+                    if pooled is not None:
+                        # The old client isn't closed, as other threads may still
+                        # be using it, and is released once they're done
+                        LOGGER.info("Vespa certs have changed, reopening the client")
+                    pooled = (
+                        self.clients[instance_url].get_sync_session(),
+                        credentials,
+                    )
+                    self._sync_http_clients[instance_url] = pooled
+        return pooled[0]
+
+    def close(self) -> None:
+        """Close the adapter's sync HTTP clients, if any are open"""
+        with self._sync_http_client_lock:
+            pooled_clients = list(self._sync_http_clients.values())
+            self._sync_http_clients.clear()
+        for http_client, _ in pooled_clients:
+            http_client.close()
+
+    def __enter__(self) -> "VespaSearchAdapter":
+        """Use the adapter as a context manager, closing its sync client on exit"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Close the sync HTTP client when leaving a context"""
+        self.close()
+
+    async def get_async_session(self, instance_url: str | None = None) -> VespaAsync:
+        """
+        Get the adapter's long-lived async session, opening it if needed
+
+        The session, and the connections it holds, are shared by every async call
+        made through the adapter, so connection setup and TLS handshakes are only
+        paid once rather than per query. It's reopened if the certs are rotated,
+        and the old session closed once requests still using it have finished.
+        Each endpoint has its own session. Close them with `aclose`, or use the
+        adapter as an async context manager.
+
+        :param str | None instance_url: the endpoint to get the session for,
+            defaulting to the first
+        :return VespaAsync: an open async session
+        """
+        instance_url = instance_url or self.instance_url
+        now = time.monotonic()
+        credentials = self._credentials()
+        pooled = self._async_sessions.get(instance_url)
+        if (
+            pooled is not None
+            and self.async_keepalive_s is not None
+            and not self._async_session_users.get(pooled[0])
+            and now - self._async_session_last_used[instance_url]
+            > self.async_keepalive_s
+        ):
+            LOGGER.debug("Async session idle for too long, reopening")
+            await self._retire_session(instance_url)
+            pooled = None
+        elif pooled is not None and pooled[1] != credentials:
+            LOGGER.info("Vespa certs have changed, reopening the async session")
+            await self._retire_session(instance_url)
+            pooled = None
+
+        if pooled is None:
+            session = self.clients[instance_url].asyncio(
+                connections=self.async_connections,
+                timeout=self.async_timeout,
+                **self.async_session_kwargs,
+            )
+            pooled = self._async_sessions[instance_url] = (session, credentials)
+            await session.__aenter__()
+
+        self._async_session_last_used[instance_url] = now
+        return pooled[0]
+
+    @asynccontextmanager
+    async def _using_async_session(
+        self, instance_url: str
+    ) -> AsyncIterator[VespaAsync]:
+        """
+        Use an endpoint's async session for a request
+
+        The session isn't closed while it's in use, even if it's replaced, and
+        counts as used when the request finishes rather than when it starts.
+
+        :param str instance_url: the endpoint to get the session for
+        :return AsyncIterator[VespaAsync]: the session, until the request finishes
+        """
+        session = await self.get_async_session(instance_url)
+        self._async_session_users[session] = (
+            self._async_session_users.get(session, 0) + 1
+        )
+        try:
+            yield session
+        finally:
+            self._async_session_users[session] -= 1
+            pooled = self._async_sessions.get(instance_url)
+            if pooled is not None and pooled[0] is session:
+                self._async_session_last_used[instance_url] = time.monotonic()
+            elif not self._async_session_users[session]:
+                # It was replaced while in use, and this was its last request
+                del self._async_session_users[session]
+                await session.__aexit__(None, None, None)
+
+    @asynccontextmanager
+    async def _async_http_client(
+        self, instance_url: str
+    ) -> AsyncIterator[httpr.AsyncClient]:
+        """The HTTP client of an endpoint's async session, for sending raw queries"""
+        async with self._using_async_session(instance_url) as session:
+            http_client = session.httpr_client
+            assert isinstance(http_client, httpr.AsyncClient), "the session isn't open"
+            yield http_client
+
+    async def _retire_session(self, instance_url: str) -> None:
+        """Stop using an endpoint's async session, closing it once it's unused"""
+        pooled = self._async_sessions.pop(instance_url, None)
+        if pooled is not None and not self._async_session_users.get(pooled[0]):
+            self._async_session_users.pop(pooled[0], None)
+            await pooled[0].__aexit__(None, None, None)
+
+    async def _aclose_session(self, instance_url: str) -> None:
+        """Close an endpoint's async session, if it's open"""
+        pooled = self._async_sessions.pop(instance_url, None)
+        if pooled is not None:
+            self._async_session_users.pop(pooled[0], None)
+            await pooled[0].__aexit__(None, None, None)
+
+    async def aclose(self) -> None:
+        """Close the adapter's async sessions, if any are open"""
+        for instance_url in list(self._async_sessions):
+            await self._aclose_session(instance_url)
+
+    async def __aenter__(self) -> "VespaSearchAdapter":
+        """Open the async sessions when entering an async context"""
+        for instance_url in self.instance_urls:
+            await self.get_async_session(instance_url)
+        return self
+
+    async def __aexit__(self, exc_type, exc_value, traceback) -> None:
+        """Close the async sessions when leaving an async context"""
+        await self.aclose()
 
     @override
     async def async_search(
-        self, parameters: SearchParameters
+        self, parameters: SearchParameters, timeout_s: Optional[float] = None
     ) -> SearchResponse[Family]:
         """
         Search a vespa instance asynchronously
 
         :param SearchParameters parameters: a search request object
+        :param Optional[float] timeout_s: if set, the seconds the search has to
+            complete in, as for `search`
+        :raises DeadlineExceededError: if the search doesn't complete in time
         :return SearchResponse[Family]: a list of families, with response metadata
         """
-        total_time_start = time.time()
-        vespa_request_body = build_vespa_request_body(parameters)
-        query_time_start = time.time()
-
-        try:
-            async with self.client.asyncio() as session:
-                vespa_response = await session.query(body=vespa_request_body)
-        except VespaError as e:
-            err_details = VespaErrorDetails(e)
-            if err_details.is_invalid_query_parameter:
-                LOGGER.error(err_details.message)
-                raise QueryError(err_details.summary)
-            else:
-                raise e
-        query_time_end = time.time()
+        total_time_start = time.perf_counter_ns()
+        deadline = _deadline(timeout_s)
+        timings = SearchTimings()
+        vespa_request_body = build_vespa_request_body(
+            parameters, timings=timings, result_format=self.result_format
+        )
+        if not self.middlewares:
+            return await self._async_send_search(
+                vespa_request_body, timings, total_time_start, deadline
+            )
 
-        response = parse_vespa_response(vespa_response=vespa_response)  # type: ignore[arg-type]
+        context = SearchContext(
+            parameters=parameters,
+            vespa_request_body=vespa_request_body,
+            started_ns=total_time_start,
+        )
+        return await self._async_search_with_middleware(
+            context,
+            lambda context: self._async_send_search(
+                context.vespa_request_body or vespa_request_body,
+                timings,
+                total_time_start,
+                deadline,
+            ),
+        )
 
-        response.query_time_ms = int((query_time_end - query_time_start) * 1000)
-        response.total_time_ms = int((time.time() - total_time_start) * 1000)
+    async def _async_send_search(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        total_time_start: int,
+        deadline: Optional[float] = None,
+    ) -> SearchResponse[Family]:
+        """Get a response for a request body asynchronously, and parse it"""
+        query_time_start = time.perf_counter_ns()
+        vespa_response = self._cached(vespa_request_body, timings)
+        if vespa_response is None:
+            vespa_response = await self._async_coalesced_fetch(
+                vespa_request_body, timings, deadline
+            )
+        query_time_end = time.perf_counter_ns()
 
+        response = _timed_parse(
+            vespa_response,
+            timings,
+            total_time_start,
+            query_time_start,
+            query_time_end,
+            self.trusted_responses,
+            self.lazy_responses,
+            summary_field_projection(vespa_request_body),
+        )
+        if deadline is not None:
+            self._record_client_overhead(timings)
         return response
 
     @override
@@ -184,25 +1769,196 @@ class VespaSearchAdapter(SearchAdapter):
             "id:doc_search:document_passage::UNFCCC.party.1060.0.3743"
         :return Hit: a single document or passage
         """
+        self._credentials()
+        return _get_hit(self.client, document_id)
+
+    @override
+    async def async_get_by_id(self, document_id: str) -> Hit:
+        """
+        Get a single document by its ID, through the async session
+
+        :param str document_id: IDs should look something like
+            "id:doc_search:family_document::CCLW.family.11171.0"
+        :return Hit: a single document or passage
+        """
         document_id_parts = split_document_id(document_id)
-        try:
-            vespa_response = self.client.get_data(
+        async with self._using_async_session(self.instance_url) as session:
+            vespa_response = await session.get_data(
                 namespace=document_id_parts.namespace,
                 schema=document_id_parts.schema,
                 data_id=document_id_parts.data_id,
             )
-        except HTTPError as e:
-            if e.response is not None:
-                status_code = e.response.status_code
-            else:
-                status_code = "Unknown"
-            if status_code == 404:
-                raise DocumentNotFoundError(document_id) from e
-            else:
-                raise FetchError(
-                    f"Received status code {status_code} when fetching "
-                    f"document {document_id}",
-                    status_code=status_code,
-                ) from e
+        return _hit_from_response(document_id, vespa_response)
+
+    @override
+    def get_by_ids(
+        self, document_ids: Sequence[str], max_concurrency: int = 8
+    ) -> list[Result[Hit, Error]]:
+        """
+        Get many documents by their IDs concurrently, over the adapter's sync client
+
+        Fetches share the connections of the client from `get_sync_http_client`,
+        rather than opening their own.
+
+        :param Sequence[str] document_ids: document IDs
+        :param int max_concurrency: the maximum number of fetches in flight at once
+        :return list[Result[Hit, Error]]: one result per ID, in the same order as
+            `document_ids`. A document that can't be found or fetched is returned as
+            an `Err`, with the `DocumentNotFoundError` or other exception in its
+            metadata
+        """
+        _validate_max_concurrency(max_concurrency)
+        return _map_with_threads(self._get_pooled_hit, document_ids, max_concurrency)
+
+    def _get_pooled_hit(self, document_id: str) -> Hit:
+        """Get a document over the adapter's pooled sync client"""
+        document_id_parts = split_document_id(document_id)
+        path = self.client.get_document_v1_path(
+            id=document_id_parts.data_id,
+            schema=document_id_parts.schema,
+            namespace=document_id_parts.namespace,
+        )
+        http_response = self.get_sync_http_client().get(self.client.end_point + path)
+        vespa_response = VespaResponse(
+            # Error bodies aren't read, so needn't be JSON
+            json=http_response.json() if http_response.status_code == 200 else {},
+            status_code=http_response.status_code,
+            url=str(http_response.url),
+            operation_type="get",
+        )
+        return _hit_from_response(document_id, vespa_response)
+
+
+def _deadline(timeout_s: Optional[float]) -> Optional[float]:
+    """The monotonic time a search must complete by, if it has a timeout"""
+    if timeout_s is None:
+        return None
+    if timeout_s <= 0:
+        raise ValueError(f"timeout_s must be positive, got {timeout_s}")
+    return time.monotonic() + timeout_s
+
+
+def _remaining_s(deadline: Optional[float]) -> Optional[float]:
+    """Seconds left before a deadline, or None if there isn't one"""
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+
+def _within_deadline(
+    delay: Optional[float], deadline: Optional[float]
+) -> Optional[float]:
+    """A retry's backoff, or None if retrying would run past the deadline"""
+    if delay is None or deadline is None:
+        return delay
+    return delay if time.monotonic() + delay < deadline else None
+
+
+def _outlasts(leader_deadline: Optional[float], deadline: Optional[float]) -> bool:
+    """Whether a request in flight won't give up before one waiting for it would"""
+    return leader_deadline is None or (
+        deadline is not None and deadline <= leader_deadline
+    )
+
+
+def _decode_query_response(
+    http_response: httpr.Response, timings: SearchTimings
+) -> VespaQueryResponse:
+    """Decode a raw query response, recording how long it took"""
+    start = time.perf_counter_ns()
+    vespa_response = decode_vespa_response(
+        http_response.content, http_response.status_code, str(http_response.url)
+    )
+    timings.decode_ns = time.perf_counter_ns() - start
+    return vespa_response
+
+
+def _raise_for_query_errors(vespa_response: VespaQueryResponse) -> VespaQueryResponse:
+    """
+    Raise errors vespa reports in a failed response
+
+    They're raised as a `VespaError`, as pyvespa's own query methods do, or as a
+    `QueryError` if the query was invalid.
+    """
+    if vespa_response.status_code >= 400:
+        errors = dig(vespa_response.json, "root", "errors")
+        if errors:
+            raise _query_error(VespaError(errors))
+    return vespa_response
+
+
+def _is_failure_status(status_code: int) -> bool:
+    """Whether a status code means vespa is failing, rather than the request"""
+    return status_code >= 500 or status_code == 429
+
+
+def _timed_parse(
+    vespa_response: VespaQueryResponse,
+    timings: SearchTimings,
+    total_time_start: int,
+    query_time_start: int,
+    query_time_end: int,
+    trusted: bool = False,
+    lazy: bool = False,
+    summary_fields: Optional[frozenset[str]] = None,
+) -> SearchResponse[Family]:
+    """Parse a vespa response, completing its timings with the parse and totals"""
+    parse_start = time.perf_counter_ns()
+    response = parse_vespa_response(
+        vespa_response=vespa_response,
+        trusted=trusted,
+        lazy=lazy,
+        summary_fields=summary_fields,
+    )
+    total_time_end = time.perf_counter_ns()
+
+    timings.parse_ns = total_time_end - parse_start
+    timings.total_ns = total_time_end - total_time_start
+    vespa_timing = dig(vespa_response.json, "timing", default={})
+    timings.vespa_query_time_s = vespa_timing.get("querytime")
+    timings.vespa_summary_fetch_time_s = vespa_timing.get("summaryfetchtime")
+    timings.vespa_search_time_s = vespa_timing.get("searchtime")
+
+    response.timings = timings
+    response.query_time_ms = (query_time_end - query_time_start) // 1_000_000
+    response.total_time_ms = timings.total_ns // 1_000_000
+    return response
+
+
+def _get_hit(client: Vespa | VespaSync, document_id: str) -> Hit:
+    """Get a document from vespa with a sync client, mapping failures to our errors"""
+    document_id_parts = split_document_id(document_id)
+    try:
+        vespa_response = client.get_data(
+            namespace=document_id_parts.namespace,
+            schema=document_id_parts.schema,
+            data_id=document_id_parts.data_id,
+        )
+    except HTTPError as e:
+        if e.response is not None:
+            status_code = e.response.status_code
+        else:
+            status_code = "Unknown"
+        if status_code == 404:
+            raise DocumentNotFoundError(document_id) from e
+        else:
+            raise FetchError(
+                f"Received status code {status_code} when fetching "
+                f"document {document_id}",
+                status_code=status_code,
+            ) from e
+
+    return _hit_from_response(document_id, vespa_response)
+
 
-        return Hit.from_vespa_response(vespa_response.json)
+def _hit_from_response(document_id: str, vespa_response: VespaResponse) -> Hit:
+    """Create a Hit from a document/v1 response, raising if it wasn't found"""
+    if vespa_response.status_code == 404:
+        raise DocumentNotFoundError(document_id)
+    if vespa_response.status_code != 200:
+        raise FetchError(
+            f"Received status code {vespa_response.status_code} when fetching "
+            f"document {document_id}",
+            status_code=vespa_response.status_code,
+        )
+    return Hit.from_vespa_response(vespa_response.json)
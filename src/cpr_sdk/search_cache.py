@@ -0,0 +1,279 @@
+"""Caching of raw Vespa responses, keyed on the request body that produced them"""
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Optional, Protocol
+
+from vespa.io import VespaQueryResponse
+
+from cpr_sdk.models.search import JsonDict
+from cpr_sdk.vespa import is_degraded
+
+
+def request_cache_key(vespa_request_body: dict[str, Any]) -> str:
+    """
+    Create a canonical hash of a vespa request body
+
+    Keys are sorted and whitespace is stripped before hashing, so bodies that are
+    equal as dicts always produce the same key.
+
+    :param dict vespa_request_body: a body built by `build_vespa_request_body`
+    :return str: a hex digest identifying the request
+    """
+    canonical = json.dumps(
+        vespa_request_body, sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CacheBackend(Protocol):
+    """
+    A store for cached responses, e.g. in memory, on disk or in Redis
+
+    Backends are responsible for expiring entries after their TTL, and may expose
+    an `evictions` count of entries they have removed through expiry or to make
+    space.
+    """
+
+    def get(self, key: str) -> Optional[JsonDict]:
+        """Get the response stored for a key, or None if there isn't a live one"""
+        ...
+
+    def set(self, key: str, value: JsonDict, ttl_s: Optional[float]) -> None:
+        """Store a response, to expire after `ttl_s` seconds (never, if None)"""
+        ...
+
+    def clear(self) -> None:
+        """Remove every stored response"""
+        ...
+
+
+class InMemoryCacheBackend:
+    """A thread-safe, least-recently-used in-memory cache with per-entry expiry"""
+
+    def __init__(self, max_entries: int = 1024) -> None:
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries: OrderedDict[str, tuple[Optional[float], JsonDict]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[JsonDict]:
+        """Get the response stored for a key, or None if there isn't a live one"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at is not None and expires_at <= time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key: str, value: JsonDict, ttl_s: Optional[float]) -> None:
+        """Store a response, evicting the least recently used if over capacity"""
+        expires_at = time.monotonic() + ttl_s if ttl_s is not None else None
+        with self._lock:
+            self._entries[key] = (expires_at, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove every stored response"""
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        """The number of stored responses, including any not yet expired"""
+        return len(self._entries)
+
+
+class DiskCacheBackend:
+    """
+    A cache persisted to a single SQLite file, so it survives restarts
+
+    Entries are evicted least-recently-used first once `max_entries` is exceeded.
+    Expiry uses wall-clock time, as entries outlive the process.
+    """
+
+    def __init__(self, path: str | Path, max_entries: int = 100_000) -> None:
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be at least 1, got {max_entries}")
+        self.path = Path(path)
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    expires_at REAL,
+                    accessed_at REAL NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at "
+                "ON responses (accessed_at)"
+            )
+
+    def get(self, key: str) -> Optional[JsonDict]:
+        """Get the response stored for a key, or None if there isn't a live one"""
+        now = time.time()
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                "SELECT value, expires_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            value, expires_at = row
+            if expires_at is not None and expires_at <= now:
+                self._connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+                self.evictions += 1
+                return None
+            self._connection.execute(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key)
+            )
+        return json.loads(value)
+
+    def set(self, key: str, value: JsonDict, ttl_s: Optional[float]) -> None:
+        """Store a response, evicting the least recently used if over capacity"""
+        now = time.time()
+        expires_at = now + ttl_s if ttl_s is not None else None
+        encoded = json.dumps(value, separators=(",", ":")).encode("utf-8")
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (key, encoded, expires_at, now),
+            )
+            (count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()
+            if count > self.max_entries:
+                evicted = self._connection.execute(
+                    """
+                    DELETE FROM responses WHERE key IN (
+                        SELECT key FROM responses ORDER BY accessed_at LIMIT ?
+                    )
+                    """,
+                    (count - self.max_entries,),
+                ).rowcount
+                self.evictions += evicted
+
+    def clear(self) -> None:
+        """Remove every stored response"""
+        with self._lock, self._connection:
+            self._connection.execute("DELETE FROM responses")
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._connection.close()
+
+
+@dataclass
+class CacheStats:
+    """Counters describing how a cache has been used"""
+
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """The proportion of lookups that were served from the cache"""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class SearchCache:
+    """
+    A cache of raw vespa responses, keyed on the request body
+
+    Only the raw response json is stored, so cached responses are parsed by
+    `parse_vespa_response` exactly like fresh ones. Error and degraded responses
+    are never stored.
+    """
+
+    def __init__(
+        self,
+        backend: Optional[CacheBackend] = None,
+        ttl_s: Optional[float] = 300.0,
+    ) -> None:
+        """
+        Create a search cache
+
+        :param CacheBackend backend: where to store responses. Defaults to an
+            `InMemoryCacheBackend`
+        :param float ttl_s: seconds after which a stored response expires. If None,
+            responses only leave the cache when the backend evicts them
+        """
+        self.backend: CacheBackend = (
+            backend if backend is not None else InMemoryCacheBackend()
+        )
+        self.ttl_s = ttl_s
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> CacheStats:
+        """Hits and misses for this cache, and evictions from its backend"""
+        return CacheStats(
+            hits=self._hits,
+            misses=self._misses,
+            evictions=getattr(self.backend, "evictions", 0),
+        )
+
+    def get(self, vespa_request_body: dict[str, Any]) -> Optional[JsonDict]:
+        """Get the stored response json for a request body, if there is one"""
+        value = self.backend.get(request_cache_key(vespa_request_body))
+        with self._lock:
+            if value is None:
+                self._misses += 1
+            else:
+                self._hits += 1
+        return value
+
+    def set(
+        self, vespa_request_body: dict[str, Any], vespa_response: VespaQueryResponse
+    ) -> None:
+        """Store a response for a request body, if it's complete and successful"""
+        if not is_cacheable(vespa_response):
+            return
+        self.backend.set(
+            request_cache_key(vespa_request_body), vespa_response.json, self.ttl_s
+        )
+
+    def clear(self) -> None:
+        """Remove every stored response"""
+        self.backend.clear()
+
+
+def is_cacheable(vespa_response: VespaQueryResponse) -> bool:
+    """Whether a response is successful and complete, and so safe to reuse"""
+    if vespa_response.status_code != 200:
+        return False
+    root = vespa_response.json.get("root", {})
+    if root.get("errors"):
+        return False
+    if is_degraded(root):
+        return False
+    return True
@@ -0,0 +1,273 @@
+"""A process-wide limit on the rate and concurrency of requests to vespa"""
+
+import asyncio
+import heapq
+import itertools
+import math
+import threading
+import time
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Optional
+
+
+class Priority(IntEnum):
+    """How urgently a request should be sent, lowest first"""
+
+    INTERACTIVE = 0
+    BATCH = 10
+
+
+@dataclass
+class PriorityStats:
+    """How long requests of one priority have waited for the governor"""
+
+    admitted: int = 0
+    total_wait_s: float = 0.0
+    max_wait_s: float = 0.0
+
+    @property
+    def mean_wait_s(self) -> float:
+        """The mean time requests waited before being sent"""
+        return self.total_wait_s / self.admitted if self.admitted else 0.0
+
+
+@dataclass
+class GovernorStats:
+    """The requests a governor has in flight and queued, and how long they waited"""
+
+    in_flight: int
+    waiting: int
+    by_priority: dict[int, PriorityStats]
+
+
+@dataclass(order=True)
+class _Waiter:
+    """A request queued for the governor, woken when admitted or at the front"""
+
+    priority: int
+    sequence: int
+    admitted: bool = field(default=False, compare=False)
+    event: Optional[threading.Event] = field(default=None, compare=False)
+    loop: Optional[asyncio.AbstractEventLoop] = field(default=None, compare=False)
+    async_event: Optional[asyncio.Event] = field(default=None, compare=False)
+
+    def wake(self) -> None:
+        """Wake the waiting thread or task, which may be on another event loop"""
+        if self.event is not None:
+            self.event.set()
+        elif self.loop is not None and self.async_event is not None:
+            try:
+                self.loop.call_soon_threadsafe(self.async_event.set)
+            except RuntimeError:
+                # The loop has closed, so there's nobody left to wake
+                pass
+
+
+class RequestGovernor:
+    """
+    Limits the rate and concurrency of requests, across every adapter sharing it
+
+    A token bucket caps requests per second, allowing bursts of up to `burst`, and
+    no more than `max_in_flight` requests are sent at once. Requests wait in a
+    queue for both, and are admitted strictly in priority order, then first come
+    first served, so interactive requests go ahead of any batch requests waiting.
+    Works across threads and event loops.
+    """
+
+    def __init__(
+        self,
+        max_qps: Optional[float] = None,
+        max_in_flight: Optional[int] = None,
+        burst: Optional[int] = None,
+    ) -> None:
+        """
+        Create a governor
+
+        :param Optional[float] max_qps: the most requests sent per second, or
+            None for no limit
+        :param Optional[int] max_in_flight: the most requests in flight at once, or
+            None for no limit
+        :param Optional[int] burst: how many requests can be sent at once after a
+            quiet spell, defaulting to max_qps rounded up
+        """
+        if max_qps is not None and max_qps <= 0:
+            raise ValueError(f"max_qps must be positive, got {max_qps}")
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError(f"max_in_flight must be at least 1, got {max_in_flight}")
+        if burst is not None and burst < 1:
+            raise ValueError(f"burst must be at least 1, got {burst}")
+        self.max_qps = max_qps
+        self.max_in_flight = max_in_flight
+        self.burst = burst or (math.ceil(max_qps) if max_qps else 1)
+        self._tokens = float(self.burst)
+        self._refilled_at = time.monotonic()
+        self._in_flight = 0
+        self._queue: list[_Waiter] = []
+        self._sequence = itertools.count()
+        self._stats: dict[int, PriorityStats] = {}
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> GovernorStats:
+        """Requests in flight and waiting now, and queue waits so far by priority"""
+        with self._lock:
+            return GovernorStats(
+                in_flight=self._in_flight,
+                waiting=len(self._queue),
+                by_priority={
+                    priority: PriorityStats(
+                        stats.admitted, stats.total_wait_s, stats.max_wait_s
+                    )
+                    for priority, stats in sorted(self._stats.items())
+                },
+            )
+
+    def acquire(self, priority: int = Priority.INTERACTIVE) -> int:
+        """
+        Wait until a request can be sent, then count it as in flight
+
+        Every call must be followed by a `release` once the request is done.
+
+        :param int priority: lower priorities are admitted first
+        :return int: nanoseconds spent waiting
+        """
+        start = time.perf_counter_ns()
+        event = threading.Event()
+        waiter = _Waiter(priority, next(self._sequence), event=event)
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+            delay = self._dispatch(waiter)
+        try:
+            while not waiter.admitted:
+                event.wait(delay)
+                event.clear()
+                with self._lock:
+                    delay = self._dispatch(waiter)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        return self._record_wait(priority, start)
+
+    async def aacquire(self, priority: int = Priority.INTERACTIVE) -> int:
+        """
+        Wait asynchronously until a request can be sent, then count it as in flight
+
+        Every call must be followed by a `release` once the request is done.
+
+        :param int priority: lower priorities are admitted first
+        :return int: nanoseconds spent waiting
+        """
+        start = time.perf_counter_ns()
+        async_event = asyncio.Event()
+        waiter = _Waiter(
+            priority,
+            next(self._sequence),
+            loop=asyncio.get_running_loop(),
+            async_event=async_event,
+        )
+        with self._lock:
+            heapq.heappush(self._queue, waiter)
+            delay = self._dispatch(waiter)
+        try:
+            while not waiter.admitted:
+                try:
+                    await asyncio.wait_for(async_event.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                async_event.clear()
+                with self._lock:
+                    delay = self._dispatch(waiter)
+        except BaseException:
+            self._abandon(waiter)
+            raise
+        return self._record_wait(priority, start)
+
+    def release(self) -> None:
+        """Count a request as done, letting the next one in"""
+        with self._lock:
+            self._in_flight -= 1
+            self._dispatch()
+
+    def _dispatch(self, caller: Optional[_Waiter] = None) -> Optional[float]:
+        """
+        Admit waiters from the front of the queue for as long as limits allow
+
+        If the front waiter is held back by the rate limit, it's woken to wait out
+        the refill itself, so that someone is always timing the next token.
+
+        :param Optional[_Waiter] caller: the waiter dispatching, which isn't woken
+        :return Optional[float]: seconds the caller should wait before dispatching
+            again, or None to wait until woken
+        """
+        while self._queue:
+            if self.max_in_flight is not None and self._in_flight >= self.max_in_flight:
+                return None
+            refill_s = self._time_until_token()
+            head = self._queue[0]
+            if refill_s > 0:
+                if head is caller:
+                    return refill_s
+                head.wake()
+                return None
+            heapq.heappop(self._queue)
+            if self.max_qps is not None:
+                self._tokens -= 1
+            self._in_flight += 1
+            head.admitted = True
+            if head is not caller:
+                head.wake()
+        return None
+
+    def _time_until_token(self) -> float:
+        """Refill the token bucket, returning how long until a token is free"""
+        if self.max_qps is None:
+            return 0.0
+        now = time.monotonic()
+        self._tokens = min(
+            float(self.burst), self._tokens + (now - self._refilled_at) * self.max_qps
+        )
+        self._refilled_at = now
+        if self._tokens >= 1:
+            return 0.0
+        return (1 - self._tokens) / self.max_qps
+
+    def _abandon(self, waiter: _Waiter) -> None:
+        """Give up a waiter's place, or its slot if it had just been admitted"""
+        with self._lock:
+            if waiter.admitted:
+                self._in_flight -= 1
+            else:
+                self._queue.remove(waiter)
+                heapq.heapify(self._queue)
+            self._dispatch()
+
+    def _record_wait(self, priority: int, start: int) -> int:
+        """Record how long an admitted request waited"""
+        wait_ns = time.perf_counter_ns() - start
+        wait_s = wait_ns / 1e9
+        with self._lock:
+            stats = self._stats.setdefault(priority, PriorityStats())
+            stats.admitted += 1
+            stats.total_wait_s += wait_s
+            stats.max_wait_s = max(stats.max_wait_s, wait_s)
+        return wait_ns
+
+
+_default_governor: Optional[RequestGovernor] = None
+
+
+def set_default_governor(governor: Optional[RequestGovernor]) -> None:
+    """
+    Set the governor used by every adapter that isn't given its own
+
+    :param Optional[RequestGovernor] governor: the governor to share, or None to
+        stop governing requests
+    """
+    global _default_governor
+    _default_governor = governor
+
+
+def get_default_governor() -> Optional[RequestGovernor]:
+    """The governor shared by adapters that aren't given their own, if one is set"""
+    return _default_governor
@@ -0,0 +1,155 @@
+"""Hedging of slow requests, to cut tail latency"""
+
+import math
+import threading
+from collections import deque
+from typing import Optional
+
+_PERCENTILE_UPDATE_INTERVAL = 16
+
+
+class HedgePolicy:
+    """
+    Decides when to send a duplicate of a request that's taking too long
+
+    A hedge is sent once a request has been in flight for `delay_s`, or for the
+    `percentile` of recent request latencies once at least `min_samples` have been
+    recorded. Hedges are capped at `max_hedge_rate` of the last `window` requests, so
+    hedging can't more than slightly increase load even when everything is slow.
+    """
+
+    def __init__(
+        self,
+        delay_s: Optional[float] = None,
+        percentile: Optional[float] = None,
+        max_hedge_rate: float = 0.05,
+        window: int = 1000,
+        min_samples: int = 20,
+    ) -> None:
+        """
+        Create a hedge policy
+
+        :param float delay_s: seconds to wait before hedging. If `percentile` is
+            also set, this is used until enough latencies have been recorded
+        :param float percentile: hedge after this percentile of recent latencies,
+            between 0 and 100, e.g. 95
+        :param float max_hedge_rate: the largest proportion of requests that can be
+            hedged, between 0 and 1
+        :param int window: how many recent requests latencies and the hedge rate are
+            measured over
+        :param int min_samples: how many latencies must be recorded before the
+            percentile is used
+        """
+        if delay_s is None and percentile is None:
+            raise ValueError("One of delay_s or percentile must be set")
+        if delay_s is not None and delay_s < 0:
+            raise ValueError(f"delay_s must not be negative, got {delay_s}")
+        if percentile is not None and not 0 < percentile < 100:
+            raise ValueError(f"percentile must be between 0 and 100, got {percentile}")
+        if not 0 <= max_hedge_rate <= 1:
+            raise ValueError(
+                f"max_hedge_rate must be between 0 and 1, got {max_hedge_rate}"
+            )
+        if window < 1:
+            raise ValueError(f"window must be at least 1, got {window}")
+
+        self.delay_s = delay_s
+        self.percentile = percentile
+        self.max_hedge_rate = max_hedge_rate
+        self.min_samples = min_samples
+        self.requests = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+        self._latencies_s: deque[float] = deque(maxlen=window)
+        # Requests and hedges, in the order they happened
+        self._events: deque[bool] = deque(maxlen=window)
+        self._recent_requests = 0
+        self._recent_hedges = 0
+        self._percentile_delay_s: Optional[float] = None
+        self._records_since_update = 0
+        self._lock = threading.Lock()
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        How long to wait for a request before hedging it
+
+        :return Optional[float]: seconds to wait, or None if the request shouldn't be
+            hedged as there's no delay to use yet
+        """
+        if self.percentile is not None and self._percentile_delay_s is not None:
+            return self._percentile_delay_s
+        return self.delay_s
+
+    def start_request(self) -> None:
+        """Count a request towards the hedge rate"""
+        with self._lock:
+            self.requests += 1
+            self._track(is_hedge=False)
+
+    def try_hedge(self) -> bool:
+        """
+        Take a hedge from the budget, if the hedge rate allows one
+
+        :return bool: whether a hedge can be sent
+        """
+        with self._lock:
+            if self._recent_hedges + 1 > self.max_hedge_rate * self._recent_requests:
+                return False
+            self.hedges += 1
+            self._track(is_hedge=True)
+            return True
+
+    def record(self, latency_s: float, hedge_won: bool = False) -> None:
+        """
+        Record how long a request took
+
+        :param float latency_s: seconds the request took, or had been in flight for
+            when it was cancelled
+        :param bool hedge_won: whether the request was answered by its hedge
+        """
+        with self._lock:
+            self._latencies_s.append(latency_s)
+            if hedge_won:
+                self.hedge_wins += 1
+            self._records_since_update += 1
+            # Recompute occasionally rather than sorting on every request
+            if (
+                self.percentile is not None
+                and len(self._latencies_s) >= self.min_samples
+                and (
+                    self._percentile_delay_s is None
+                    or self._records_since_update >= _PERCENTILE_UPDATE_INTERVAL
+                )
+            ):
+                self._percentile_delay_s = _percentile(
+                    self._latencies_s, self.percentile
+                )
+                self._records_since_update = 0
+
+    @property
+    def hedge_rate(self) -> float:
+        """The proportion of recent requests that were hedged"""
+        with self._lock:
+            if not self._recent_requests:
+                return 0.0
+            return self._recent_hedges / self._recent_requests
+
+    def _track(self, is_hedge: bool) -> None:
+        """Add a request or hedge to the rolling window, dropping the oldest event"""
+        if len(self._events) == self._events.maxlen:
+            if self._events[0]:
+                self._recent_hedges -= 1
+            else:
+                self._recent_requests -= 1
+        self._events.append(is_hedge)
+        if is_hedge:
+            self._recent_hedges += 1
+        else:
+            self._recent_requests += 1
+
+
+def _percentile(values: deque[float], percentile: float) -> float:
+    """The nearest-rank percentile of some values"""
+    ordered = sorted(values)
+    rank = max(math.ceil(percentile / 100 * len(ordered)) - 1, 0)
+    return ordered[rank]
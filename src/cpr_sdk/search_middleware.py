@@ -0,0 +1,213 @@
+"""Middleware run around searches, for metrics, tracing and caching"""
+
+import bisect
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Optional, Sequence
+
+from cpr_sdk.models.search import Family, SearchParameters, SearchResponse
+
+LOGGER = logging.getLogger(__name__)
+
+
+@dataclass
+class SearchContext:
+    """
+    The state of a single search, passed to each middleware hook
+
+    `vespa_request_body` is set by adapters that search vespa, and can be rewritten
+    by `before_request` hooks to change what is sent. `metadata` is free for
+    middlewares to share state between their hooks.
+    """
+
+    parameters: SearchParameters
+    vespa_request_body: Optional[dict[str, Any]] = None
+    started_ns: int = field(default_factory=time.perf_counter_ns)
+    short_circuited: bool = False
+    metadata: dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def elapsed_ms(self) -> float:
+        """Milliseconds since the search started"""
+        return (time.perf_counter_ns() - self.started_ns) / 1_000_000
+
+
+class SearchMiddleware:
+    """
+    Hooks run around each search made through an adapter
+
+    Override whichever hooks are needed; the defaults do nothing. Hooks run in the
+    order middlewares were added before the request, and in reverse order after it.
+    If one returns a response before the request, the middlewares after it are
+    skipped entirely. The async hooks call the sync ones unless overridden.
+    """
+
+    def before_request(
+        self, context: SearchContext
+    ) -> Optional[SearchResponse[Family]]:
+        """
+        Called before the request is sent
+
+        :param SearchContext context: the search, whose request body can be changed
+        :return Optional[SearchResponse[Family]]: a response to return instead of
+            sending the request, e.g. from a cache, or None to carry on
+        """
+        return None
+
+    def after_response(
+        self, context: SearchContext, response: SearchResponse[Family]
+    ) -> SearchResponse[Family]:
+        """
+        Called with each response, including short-circuited ones
+
+        Only called if this middleware's `before_request` ran, so not when an
+        earlier middleware short-circuited the search.
+
+        :param SearchContext context: the search
+        :param SearchResponse[Family] response: the response so far
+        :return SearchResponse[Family]: the response to pass on
+        """
+        return response
+
+    def on_error(
+        self, context: SearchContext, error: Exception
+    ) -> Optional[SearchResponse[Family]]:
+        """
+        Called when the request fails
+
+        :param SearchContext context: the search
+        :param Exception error: the error raised
+        :return Optional[SearchResponse[Family]]: a response to recover with, or
+            None to let the error propagate
+        """
+        return None
+
+    async def abefore_request(
+        self, context: SearchContext
+    ) -> Optional[SearchResponse[Family]]:
+        """Called before an async request is sent, see `before_request`"""
+        return self.before_request(context)
+
+    async def aafter_response(
+        self, context: SearchContext, response: SearchResponse[Family]
+    ) -> SearchResponse[Family]:
+        """Called with each async response, see `after_response`"""
+        return self.after_response(context, response)
+
+    async def aon_error(
+        self, context: SearchContext, error: Exception
+    ) -> Optional[SearchResponse[Family]]:
+        """Called when an async request fails, see `on_error`"""
+        return self.on_error(context, error)
+
+
+DEFAULT_LATENCY_BUCKETS_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+class LatencyHistogramMiddleware(SearchMiddleware):
+    """
+    Records search latencies in a histogram with fixed bucket boundaries
+
+    Counts are cumulative across every search through the adapter, and failed
+    searches are counted separately in `errors`.
+    """
+
+    def __init__(self, buckets_ms: Sequence[float] = DEFAULT_LATENCY_BUCKETS_MS):
+        """
+        Create a latency histogram
+
+        :param Sequence[float] buckets_ms: the upper bounds of each bucket in
+            milliseconds, in increasing order. Latencies above the last bound are
+            counted in an overflow bucket
+        """
+        if list(buckets_ms) != sorted(buckets_ms) or not buckets_ms:
+            raise ValueError(f"buckets_ms must be increasing, got {buckets_ms}")
+        self.buckets_ms = tuple(buckets_ms)
+        self.counts = [0] * (len(self.buckets_ms) + 1)
+        self.count = 0
+        self.sum_ms = 0.0
+        self.errors = 0
+        self._lock = threading.Lock()
+
+    def observe(self, latency_ms: float) -> None:
+        """Record a latency"""
+        bucket = bisect.bisect_left(self.buckets_ms, latency_ms)
+        with self._lock:
+            self.counts[bucket] += 1
+            self.count += 1
+            self.sum_ms += latency_ms
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a latency quantile from the histogram
+
+        :param float q: the quantile, between 0 and 1
+        :return Optional[float]: the upper bound of the bucket the quantile falls
+            in, inf if it's in the overflow bucket, or None if nothing is recorded
+        """
+        if not 0 <= q <= 1:
+            raise ValueError(f"q must be between 0 and 1, got {q}")
+        with self._lock:
+            if self.count == 0:
+                return None
+            rank = q * self.count
+            seen = 0
+            for bound, bucket_count in zip(self.buckets_ms, self.counts):
+                seen += bucket_count
+                if seen >= rank:
+                    return bound
+        return float("inf")
+
+    def after_response(
+        self, context: SearchContext, response: SearchResponse[Family]
+    ) -> SearchResponse[Family]:
+        """Record the latency of a response"""
+        self.observe(context.elapsed_ms)
+        return response
+
+    def on_error(
+        self, context: SearchContext, error: Exception
+    ) -> Optional[SearchResponse[Family]]:
+        """Count a failed search"""
+        with self._lock:
+            self.errors += 1
+        return None
+
+
+class SlowQueryLogMiddleware(SearchMiddleware):
+    """Logs searches that take longer than a threshold, with their phase timings"""
+
+    def __init__(
+        self,
+        threshold_ms: float = 1000.0,
+        logger: logging.Logger = LOGGER,
+        level: int = logging.WARNING,
+    ):
+        """
+        Create a slow query logger
+
+        :param float threshold_ms: searches taking longer than this are logged
+        :param logging.Logger logger: the logger to log to
+        :param int level: the level to log at
+        """
+        self.threshold_ms = threshold_ms
+        self.logger = logger
+        self.level = level
+
+    def after_response(
+        self, context: SearchContext, response: SearchResponse[Family]
+    ) -> SearchResponse[Family]:
+        """Log the search if it was slow"""
+        elapsed_ms = context.elapsed_ms
+        if elapsed_ms > self.threshold_ms:
+            self.logger.log(
+                self.level,
+                "Slow search took %.1fms: query_string=%r timings=%s body=%s",
+                elapsed_ms,
+                context.parameters.query_string,
+                response.timings,
+                context.vespa_request_body,
+            )
+        return response
@@ -0,0 +1,371 @@
+"""Recording of vespa searches, and replaying them offline for benchmarks"""
+
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterator, Optional, Sequence
+
+from typing_extensions import override
+from vespa.io import VespaQueryResponse
+
+from cpr_sdk.exceptions import DeadlineExceededError, RecordingNotFoundError
+from cpr_sdk.models.search import Hit, SearchParameters, SearchTimings
+from cpr_sdk.result import Error, Result
+from cpr_sdk.search_adaptors import SearchAdapter, VespaSearchAdapter
+from cpr_sdk.search_cache import SearchCache, request_cache_key
+from cpr_sdk.search_hedging import HedgePolicy
+from cpr_sdk.search_middleware import SearchMiddleware
+from cpr_sdk.search_streaming import SearchResponseStream
+from cpr_sdk.vespa import (
+    build_vespa_request_body,
+    decode_vespa_response,
+    summary_field_projection,
+)
+
+_REPLAY_URL = "http://replay.invalid"
+
+
+def _compress(value: Any) -> bytes:
+    """Serialise a json value compactly, and compress it"""
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+@dataclass(frozen=True)
+class RecordedResponse:
+    """A raw response recorded from vespa"""
+
+    content: bytes
+    status_code: int
+
+
+class RecordingStore:
+    """
+    Request bodies and the raw responses vespa gave them, in a single SQLite file
+
+    Responses are keyed on `request_cache_key`, so a request recorded more than once
+    keeps its latest response. Every recorded latency is kept, to replay with.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                """
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    request BLOB NOT NULL,
+                    response BLOB NOT NULL,
+                    status_code INTEGER NOT NULL
+                )
+                """
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS latencies (latency_s REAL NOT NULL)"
+            )
+
+    def record(
+        self,
+        vespa_request_body: dict[str, Any],
+        vespa_response: VespaQueryResponse,
+        latency_s: float,
+    ) -> None:
+        """
+        Store a request body with the response it got
+
+        :param dict vespa_request_body: a body built by `build_vespa_request_body`
+        :param VespaQueryResponse vespa_response: vespa's response to it
+        :param float latency_s: seconds vespa took to respond
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?)",
+                (
+                    request_cache_key(vespa_request_body),
+                    _compress(vespa_request_body),
+                    _compress(vespa_response.json),
+                    vespa_response.status_code,
+                ),
+            )
+            self._connection.execute("INSERT INTO latencies VALUES (?)", (latency_s,))
+
+    def get(self, vespa_request_body: dict[str, Any]) -> Optional[RecordedResponse]:
+        """Get the response recorded for a request body, if there is one"""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT response, status_code FROM responses WHERE key = ?",
+                (request_cache_key(vespa_request_body),),
+            ).fetchone()
+        if row is None:
+            return None
+        response, status_code = row
+        return RecordedResponse(zlib.decompress(response), status_code)
+
+    def request_bodies(self) -> Iterator[dict[str, Any]]:
+        """Every recorded request body, e.g. to replay the same workload"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT request FROM responses ORDER BY rowid"
+            ).fetchall()
+        for (request,) in rows:
+            yield json.loads(zlib.decompress(request))
+
+    def latencies_s(self) -> list[float]:
+        """Every recorded latency, in seconds"""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT latency_s FROM latencies"
+            ).fetchall()
+        return [latency_s for (latency_s,) in rows]
+
+    def __len__(self) -> int:
+        """The number of distinct requests recorded"""
+        with self._lock:
+            (count,) = self._connection.execute(
+                "SELECT COUNT(*) FROM responses"
+            ).fetchone()
+        return count
+
+    def close(self) -> None:
+        """Close the underlying database connection"""
+        with self._lock:
+            self._connection.close()
+
+
+class RecordingSearchAdapter(VespaSearchAdapter):
+    """
+    Search vespa, recording every request and response into a `RecordingStore`
+
+    Only responses fetched from vespa are recorded, not ones served from the cache
+    or shared with an identical in-flight request.
+    """
+
+    def __init__(self, instance_url: str, recording: RecordingStore, **kwargs):
+        """
+        Initialise the recording search adapter
+
+        :param str instance_url: URL of the Vespa instance to connect to
+        :param RecordingStore recording: where to record requests and responses
+        :param kwargs: passed on to `VespaSearchAdapter`
+        """
+        super().__init__(instance_url, **kwargs)
+        self.recording = recording
+
+    @override
+    def _fetch(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> VespaQueryResponse:
+        """Query vespa, recording the response and how long it took"""
+        start = time.perf_counter()
+        vespa_response = super()._fetch(vespa_request_body, timings, deadline)
+        self.recording.record(
+            vespa_request_body, vespa_response, time.perf_counter() - start
+        )
+        return vespa_response
+
+    @override
+    async def _async_fetch(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> VespaQueryResponse:
+        """Query vespa asynchronously, recording the response and its latency"""
+        start = time.perf_counter()
+        vespa_response = await super()._async_fetch(
+            vespa_request_body, timings, deadline
+        )
+        self.recording.record(
+            vespa_request_body, vespa_response, time.perf_counter() - start
+        )
+        return vespa_response
+
+
+class ReplaySearchAdapter(VespaSearchAdapter):
+    """
+    Serve searches from a `RecordingStore`, without vespa
+
+    Recorded responses are decoded and parsed exactly like live ones, and go through
+    the same caching, coalescing, hedging and middleware, so code built on the
+    `VespaSearchAdapter` can be load tested offline. Each response is delayed by a
+    latency drawn from those recorded, unless a fixed latency is given, and a search
+    with a timeout shorter than its latency raises `DeadlineExceededError`. Only
+    searches are recorded, so getting documents by ID isn't supported.
+    """
+
+    def __init__(
+        self,
+        recording: RecordingStore,
+        fixed_latency_s: Optional[float] = None,
+        latency_scale: float = 1.0,
+        seed: Optional[int] = None,
+        cache: SearchCache | None = None,
+        coalesce_requests: bool = True,
+        middlewares: Sequence[SearchMiddleware] = (),
+        hedge_policy: HedgePolicy | None = None,
+        trusted_responses: bool = False,
+        lazy_responses: bool = False,
+        result_format: str = "json",
+    ):
+        """
+        Initialise the replay search adapter
+
+        :param RecordingStore recording: the recorded requests and responses
+        :param Optional[float] fixed_latency_s: if set, every response is delayed
+            by this many seconds rather than a recorded latency
+        :param float latency_scale: recorded latencies are multiplied by this, e.g.
+            0 to replay as fast as possible
+        :param Optional[int] seed: seeds the choice of latencies, to make replays
+            repeatable
+        :param cache: passed on to `VespaSearchAdapter`
+        :param coalesce_requests: passed on to `VespaSearchAdapter`
+        :param middlewares: passed on to `VespaSearchAdapter`
+        :param hedge_policy: passed on to `VespaSearchAdapter`
+        :param trusted_responses: passed on to `VespaSearchAdapter`
+        :param lazy_responses: passed on to `VespaSearchAdapter`
+        :param result_format: passed on to `VespaSearchAdapter`, and should match
+            the recording's, as it's part of each request
+        """
+        super().__init__(
+            _REPLAY_URL,
+            skip_cert_usage=True,
+            cache=cache,
+            coalesce_requests=coalesce_requests,
+            middlewares=middlewares,
+            hedge_policy=hedge_policy,
+            trusted_responses=trusted_responses,
+            lazy_responses=lazy_responses,
+            result_format=result_format,
+        )
+        self.recording = recording
+        self.fixed_latency_s = fixed_latency_s
+        self.latency_scale = latency_scale
+        self._latencies_s = recording.latencies_s()
+        self._random = random.Random(seed)
+
+    def _latency_s(self) -> float:
+        """How long to delay the next response by"""
+        if self.fixed_latency_s is not None:
+            return self.fixed_latency_s
+        if not self._latencies_s:
+            return 0.0
+        return self._random.choice(self._latencies_s) * self.latency_scale
+
+    def _delay_s(self, deadline: Optional[float]) -> tuple[float, bool]:
+        """
+        How long to delay the next response by, cut short at the deadline
+
+        :param Optional[float] deadline: the monotonic time the search must complete
+            by, if it has one
+        :return tuple[float, bool]: the delay, and whether the response would have
+            missed the deadline
+        """
+        latency_s = self._latency_s()
+        if deadline is None:
+            return latency_s, False
+        remaining_s = max(0.0, deadline - time.monotonic())
+        return min(latency_s, remaining_s), latency_s >= remaining_s
+
+    def _replay(
+        self, vespa_request_body: dict[str, Any], timings: SearchTimings
+    ) -> VespaQueryResponse:
+        """Decode the recorded response to a request body"""
+        recorded = self.recording.get(vespa_request_body)
+        if recorded is None:
+            raise RecordingNotFoundError(request_cache_key(vespa_request_body))
+        decode_start = time.perf_counter_ns()
+        vespa_response = decode_vespa_response(
+            recorded.content, recorded.status_code, self.client.search_end_point
+        )
+        timings.decode_ns = time.perf_counter_ns() - decode_start
+        return vespa_response
+
+    @override
+    def _query(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> VespaQueryResponse:
+        """Replay the response to a request body, after a delay"""
+        latency_s, expires = self._delay_s(deadline)
+        network_start = time.perf_counter_ns()
+        time.sleep(latency_s)
+        if expires:
+            raise DeadlineExceededError()
+        timings.network_ns = time.perf_counter_ns() - network_start
+        return self._replay(vespa_request_body, timings)
+
+    @override
+    async def _async_query(
+        self,
+        vespa_request_body: dict[str, Any],
+        timings: SearchTimings,
+        deadline: Optional[float] = None,
+    ) -> VespaQueryResponse:
+        """Replay the response to a request body, after a non-blocking delay"""
+        latency_s, expires = self._delay_s(deadline)
+        network_start = time.perf_counter_ns()
+        await asyncio.sleep(latency_s)
+        if expires:
+            raise DeadlineExceededError()
+        timings.network_ns = time.perf_counter_ns() - network_start
+        return self._replay(vespa_request_body, timings)
+
+    @override
+    def stream_search(
+        self, parameters: SearchParameters, timeout_s: Optional[float] = None
+    ) -> SearchResponseStream:
+        """Stream the recorded response to a search, after a delay"""
+        deadline = None if timeout_s is None else time.monotonic() + timeout_s
+        latency_s, expires = self._delay_s(deadline)
+        time.sleep(latency_s)
+        if expires:
+            raise DeadlineExceededError()
+        vespa_request_body = build_vespa_request_body(parameters)
+        recorded = self.recording.get(vespa_request_body)
+        if recorded is None:
+            raise RecordingNotFoundError(request_cache_key(vespa_request_body))
+        return SearchResponseStream(
+            [recorded.content],
+            trusted=self.trusted_responses,
+            status_code=recorded.status_code,
+            url=self.client.search_end_point,
+            summary_fields=summary_field_projection(vespa_request_body),
+        )
+
+    @override
+    def get_by_id(self, document_id: str) -> Hit:
+        """
+        Unsupported, as only searches are recorded
+
+        :raises RecordingNotFoundError: always, as no document fetch is recorded
+        """
+        raise RecordingNotFoundError(document_id)
+
+    @override
+    async def async_get_by_id(self, document_id: str) -> Hit:
+        """
+        Unsupported, as only searches are recorded
+
+        :raises RecordingNotFoundError: always, as no document fetch is recorded
+        """
+        raise RecordingNotFoundError(document_id)
+
+    @override
+    def get_by_ids(
+        self, document_ids: Sequence[str], max_concurrency: int = 8
+    ) -> list[Result[Hit, Error]]:
+        """Unsupported, so every ID is returned as an `Err`"""
+        return SearchAdapter.get_by_ids(self, document_ids, max_concurrency)
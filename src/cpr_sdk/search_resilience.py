@@ -0,0 +1,299 @@
+"""Retries and circuit breaking around requests to vespa"""
+
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from enum import Enum
+from typing import Collection, Optional
+
+import httpr
+from vespa.exceptions import VespaError
+from vespa.io import VespaQueryResponse
+
+from cpr_sdk.utils import dig
+from cpr_sdk.vespa import VespaErrorDetails
+
+DEFAULT_RETRYABLE_STATUS_CODES = frozenset({429, 502, 503, 504})
+
+
+@dataclass
+class RetryStats:
+    """Counters describing how a retry policy has been used"""
+
+    retries: int = 0
+    exhausted: int = 0
+
+
+class RetryPolicy:
+    """
+    Retries failed requests with capped exponential backoff and full jitter
+
+    Requests are retried when vespa responds with a retryable status code, or the
+    request fails in transport, e.g. on a timeout or a refused connection. Invalid
+    queries are never retried.
+    """
+
+    def __init__(
+        self,
+        max_attempts: int = 3,
+        base_delay_s: float = 0.1,
+        max_delay_s: float = 2.0,
+        retryable_status_codes: Collection[int] = DEFAULT_RETRYABLE_STATUS_CODES,
+    ) -> None:
+        """
+        Create a retry policy
+
+        :param int max_attempts: the most times a request is sent, including the
+            first
+        :param float base_delay_s: the backoff before the first retry, which doubles
+            with each retry after it
+        :param float max_delay_s: the longest backoff between retries
+        :param Collection[int] retryable_status_codes: response status codes that
+            are worth retrying
+        """
+        if max_attempts < 1:
+            raise ValueError(f"max_attempts must be at least 1, got {max_attempts}")
+        if base_delay_s < 0 or max_delay_s < base_delay_s:
+            raise ValueError(
+                "Delays must satisfy 0 <= base_delay_s <= max_delay_s, got "
+                f"{base_delay_s} and {max_delay_s}"
+            )
+        self.max_attempts = max_attempts
+        self.base_delay_s = base_delay_s
+        self.max_delay_s = max_delay_s
+        self.retryable_status_codes = frozenset(retryable_status_codes)
+        self._retries = 0
+        self._exhausted = 0
+        self._lock = threading.Lock()
+
+    @property
+    def stats(self) -> RetryStats:
+        """How many retries have been made, and requests have run out of attempts"""
+        return RetryStats(retries=self._retries, exhausted=self._exhausted)
+
+    def is_retryable_error(self, error: Exception) -> bool:
+        """Whether a request that raised an error is worth retrying"""
+        return isinstance(error, httpr.TransportError)
+
+    def is_retryable_response(self, vespa_response: VespaQueryResponse) -> bool:
+        """Whether a response is worth retrying, which invalid queries never are"""
+        if vespa_response.status_code not in self.retryable_status_codes:
+            return False
+        errors = dig(vespa_response.json, "root", "errors")
+        if errors and VespaErrorDetails(VespaError(errors)).is_invalid_query_parameter:
+            return False
+        return True
+
+    def next_delay(self, attempt: int, retryable: bool) -> Optional[float]:
+        """
+        How long to back off before retrying a failed attempt
+
+        :param int attempt: the number of the attempt that failed, from 0
+        :param bool retryable: whether the failure is worth retrying
+        :return Optional[float]: seconds to wait before retrying, or None if the
+            request shouldn't be retried
+        """
+        if not retryable:
+            return None
+        with self._lock:
+            if attempt + 1 >= self.max_attempts:
+                self._exhausted += 1
+                return None
+            self._retries += 1
+        return random.uniform(0, min(self.max_delay_s, self.base_delay_s * 2**attempt))
+
+
+class CircuitState(str, Enum):
+    """The states of a circuit breaker"""
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+
+@dataclass
+class CircuitBreakerStats:
+    """The state of a circuit breaker, and counters describing how it's been used"""
+
+    state: CircuitState
+    failure_rate: float
+    opened: int = 0
+    rejected: int = 0
+
+
+@dataclass(frozen=True, eq=False)
+class CircuitPermit:
+    """
+    A circuit breaker's permission to send a request
+
+    Pass it back when recording how the request went, so the breaker can tell its
+    probe apart from requests sent before it opened.
+    """
+
+    probe: bool
+
+
+# Shared by every request let through while the breaker is closed, as only probes
+# need telling apart
+_CLOSED_PERMIT = CircuitPermit(probe=False)
+
+
+class CircuitBreaker:
+    """
+    Fails requests fast while vespa is failing, rather than adding to its load
+
+    The breaker opens once the proportion of failures in the last `window` requests
+    reaches `failure_rate_threshold`, and refuses every request while open. After
+    `reset_timeout_s` it lets a single probe request through, closing again if the
+    probe succeeds and reopening if it fails. Outcomes of requests sent before the
+    breaker opened are ignored until it closes, so only the probe can change its
+    state.
+    """
+
+    def __init__(
+        self,
+        failure_rate_threshold: float = 0.5,
+        window: int = 20,
+        min_requests: int = 10,
+        reset_timeout_s: float = 30.0,
+    ) -> None:
+        """
+        Create a circuit breaker
+
+        :param float failure_rate_threshold: the proportion of failed requests, from
+            0 to 1, at which the breaker opens
+        :param int window: how many recent requests the failure rate is measured
+            over
+        :param int min_requests: the fewest requests in the window before the breaker
+            can open
+        :param float reset_timeout_s: seconds the breaker stays open before probing
+        """
+        if not 0 < failure_rate_threshold <= 1:
+            raise ValueError(
+                "failure_rate_threshold must be between 0 and 1, got "
+                f"{failure_rate_threshold}"
+            )
+        if not 1 <= min_requests <= window:
+            raise ValueError(
+                "min_requests must be between 1 and window, got "
+                f"{min_requests} and {window}"
+            )
+        self.failure_rate_threshold = failure_rate_threshold
+        self.min_requests = min_requests
+        self.reset_timeout_s = reset_timeout_s
+        self._outcomes: deque[bool] = deque(maxlen=window)
+        self._state = CircuitState.CLOSED
+        self._opened_at = 0.0
+        self._probe: Optional[CircuitPermit] = None
+        self._opened = 0
+        self._rejected = 0
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> CircuitState:
+        """The breaker's current state"""
+        with self._lock:
+            return self._current_state()
+
+    @property
+    def stats(self) -> CircuitBreakerStats:
+        """The breaker's state, failure rate, and how often it's opened and refused"""
+        with self._lock:
+            return CircuitBreakerStats(
+                state=self._current_state(),
+                failure_rate=self._failure_rate(),
+                opened=self._opened,
+                rejected=self._rejected,
+            )
+
+    def allow_request(self) -> Optional[CircuitPermit]:
+        """
+        Whether a request can be sent now, counting it as rejected if not
+
+        :return Optional[CircuitPermit]: a permit if the breaker is closed, or it's
+            time for a probe, to pass back with the request's outcome. None if the
+            request is refused
+        """
+        with self._lock:
+            state = self._current_state()
+            if state == CircuitState.CLOSED:
+                return _CLOSED_PERMIT
+            if state == CircuitState.HALF_OPEN and self._probe is None:
+                self._probe = CircuitPermit(probe=True)
+                return self._probe
+            self._rejected += 1
+            return None
+
+    def record_success(self, permit: Optional[CircuitPermit] = None) -> None:
+        """
+        Record a request that succeeded, closing the breaker if it was the probe
+
+        :param Optional[CircuitPermit] permit: the permit the request was sent with
+        """
+        with self._lock:
+            if permit is not None and permit is self._probe:
+                self._state = CircuitState.CLOSED
+                self._probe = None
+                self._outcomes.clear()
+            elif self._state != CircuitState.CLOSED:
+                return
+            self._outcomes.append(False)
+
+    def release_probe(self, permit: Optional[CircuitPermit] = None) -> None:
+        """
+        Settle a request that ended without a success or failure being recorded
+
+        e.g. one that ran out of time, or was cancelled. If it was the probe, the
+        next request is let through as the probe instead, rather than the breaker
+        staying half open with a probe that never reports back.
+
+        :param Optional[CircuitPermit] permit: the permit the request was sent with
+        """
+        with self._lock:
+            if permit is not None and permit is self._probe:
+                self._probe = None
+
+    def record_failure(self, permit: Optional[CircuitPermit] = None) -> None:
+        """
+        Record a request that failed, opening the breaker if too many have
+
+        A failed probe reopens the breaker straight away.
+
+        :param Optional[CircuitPermit] permit: the permit the request was sent with
+        """
+        with self._lock:
+            if permit is not None and permit is self._probe:
+                self._open()
+                return
+            if self._state != CircuitState.CLOSED:
+                return
+            self._outcomes.append(True)
+            if (
+                len(self._outcomes) >= self.min_requests
+                and self._failure_rate() >= self.failure_rate_threshold
+            ):
+                self._open()
+
+    def _current_state(self) -> CircuitState:
+        """The state, moving from open to half open once the timeout has passed"""
+        if (
+            self._state == CircuitState.OPEN
+            and time.monotonic() - self._opened_at >= self.reset_timeout_s
+        ):
+            self._state = CircuitState.HALF_OPEN
+        return self._state
+
+    def _failure_rate(self) -> float:
+        """The proportion of recent requests that failed"""
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def _open(self) -> None:
+        """Open the breaker, refusing requests until the reset timeout has passed"""
+        self._state = CircuitState.OPEN
+        self._opened_at = time.monotonic()
+        self._probe = None
+        self._opened += 1
@@ -0,0 +1,210 @@
+"""Routing of queries across several vespa endpoints"""
+
+import logging
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+LOGGER = logging.getLogger(__name__)
+
+
+class RoutingPolicy:
+    """
+    How queries are spread across endpoints, and when unhealthy ones are ejected
+
+    Each query goes to the better of two endpoints picked at random, scoring them on
+    their exponentially weighted moving average (EWMA) latency multiplied by the
+    number of queries they already have in flight. Endpoints without a latency yet
+    are scored on the average of the others'. An endpoint that fails
+    `failures_to_eject` times in a row is ejected for `ejection_s`, after which it's
+    sent queries again, and ejected again straight away if the next one fails.
+    """
+
+    def __init__(
+        self,
+        ewma_alpha: float = 0.3,
+        failures_to_eject: int = 3,
+        ejection_s: float = 30.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Create a routing policy
+
+        :param float ewma_alpha: the weight given to each new latency in the moving
+            average, between 0 and 1. Higher values react faster
+        :param int failures_to_eject: how many consecutive failures eject an endpoint
+        :param float ejection_s: seconds an ejected endpoint is left out for
+        :param Optional[int] seed: seeds the choice of endpoints, to make routing
+            repeatable
+        """
+        if not 0 < ewma_alpha <= 1:
+            raise ValueError(f"ewma_alpha must be between 0 and 1, got {ewma_alpha}")
+        if failures_to_eject < 1:
+            raise ValueError(
+                f"failures_to_eject must be at least 1, got {failures_to_eject}"
+            )
+        if ejection_s < 0:
+            raise ValueError(f"ejection_s must not be negative, got {ejection_s}")
+        self.ewma_alpha = ewma_alpha
+        self.failures_to_eject = failures_to_eject
+        self.ejection_s = ejection_s
+        self.seed = seed
+
+
+@dataclass
+class EndpointStats:
+    """The state of an endpoint, and counters describing how it's been used"""
+
+    url: str
+    ewma_latency_s: Optional[float]
+    in_flight: int
+    requests: int
+    failures: int
+    ejections: int
+    ejected: bool
+
+
+@dataclass
+class _Endpoint:
+    """The routing state of a single endpoint"""
+
+    url: str
+    ewma_latency_s: Optional[float] = None
+    in_flight: int = 0
+    requests: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+
+    def cost(self, prior_latency_s: float) -> tuple[float, int]:
+        """
+        How expensive sending another query here looks, lowest first
+
+        :param float prior_latency_s: the latency assumed if none is recorded yet
+        """
+        latency_s = (
+            prior_latency_s if self.ewma_latency_s is None else self.ewma_latency_s
+        )
+        return latency_s * (self.in_flight + 1), self.in_flight
+
+
+class EndpointRouter:
+    """
+    Picks which endpoint each query is sent to, with the power of two choices
+
+    Endpoints without a latency recorded yet, including ones back from ejection,
+    are assumed to be as fast as the average healthy endpoint, so they're tried
+    soon without being sent every query until their first response. If every
+    endpoint is ejected, queries go to the one due back soonest rather than failing
+    outright.
+    """
+
+    def __init__(self, urls: Sequence[str], policy: Optional[RoutingPolicy] = None):
+        """
+        Create a router
+
+        :param Sequence[str] urls: the endpoints to route between
+        :param Optional[RoutingPolicy] policy: how to route, defaulting to a
+            `RoutingPolicy` with default settings
+        """
+        if not urls:
+            raise ValueError("At least one endpoint is needed")
+        if len(set(urls)) != len(urls):
+            raise ValueError(f"Endpoints must be unique, got {urls}")
+        self.policy = policy or RoutingPolicy()
+        self._endpoints = [_Endpoint(url) for url in urls]
+        self._by_url = {endpoint.url: endpoint for endpoint in self._endpoints}
+        self._random = random.Random(self.policy.seed)
+        self._lock = threading.Lock()
+
+    @property
+    def urls(self) -> list[str]:
+        """The endpoints routed between"""
+        return [endpoint.url for endpoint in self._endpoints]
+
+    @property
+    def stats(self) -> list[EndpointStats]:
+        """The state of each endpoint"""
+        with self._lock:
+            now = time.monotonic()
+            return [
+                EndpointStats(
+                    url=endpoint.url,
+                    ewma_latency_s=endpoint.ewma_latency_s,
+                    in_flight=endpoint.in_flight,
+                    requests=endpoint.requests,
+                    failures=endpoint.failures,
+                    ejections=endpoint.ejections,
+                    ejected=endpoint.ejected_until > now,
+                )
+                for endpoint in self._endpoints
+            ]
+
+    def acquire(self) -> str:
+        """
+        Choose an endpoint for a query, counting the query as in flight there
+
+        Every call must be followed by a `release` once the query is done.
+
+        :return str: the endpoint's url
+        """
+        with self._lock:
+            now = time.monotonic()
+            healthy = [e for e in self._endpoints if e.ejected_until <= now]
+            if not healthy:
+                healthy = [min(self._endpoints, key=lambda e: e.ejected_until)]
+            candidates = (
+                self._random.sample(healthy, 2) if len(healthy) > 2 else healthy
+            )
+            sampled = [
+                e.ewma_latency_s for e in healthy if e.ewma_latency_s is not None
+            ]
+            # With nothing sampled, endpoints are compared on their queries in flight
+            prior_latency_s = sum(sampled) / len(sampled) if sampled else 0.0
+            endpoint = min(candidates, key=lambda e: e.cost(prior_latency_s))
+            endpoint.in_flight += 1
+            endpoint.requests += 1
+            return endpoint.url
+
+    def release(
+        self, url: str, latency_s: Optional[float], failed: bool = False
+    ) -> None:
+        """
+        Record how a query sent to an endpoint went
+
+        :param str url: the endpoint the query was sent to
+        :param Optional[float] latency_s: seconds the query took, or None if it was
+            cancelled before the endpoint answered, which says nothing about it
+        :param bool failed: whether the endpoint failed to answer the query
+        """
+        with self._lock:
+            endpoint = self._by_url[url]
+            endpoint.in_flight -= 1
+            if latency_s is None:
+                return
+            if not failed:
+                endpoint.consecutive_failures = 0
+                alpha = self.policy.ewma_alpha
+                endpoint.ewma_latency_s = (
+                    latency_s
+                    if endpoint.ewma_latency_s is None
+                    else alpha * latency_s + (1 - alpha) * endpoint.ewma_latency_s
+                )
+                return
+
+            endpoint.failures += 1
+            endpoint.consecutive_failures += 1
+            if endpoint.consecutive_failures >= self.policy.failures_to_eject:
+                LOGGER.warning(
+                    "Ejecting %s for %ss after %s consecutive failures",
+                    url,
+                    self.policy.ejection_s,
+                    endpoint.consecutive_failures,
+                )
+                endpoint.ejected_until = time.monotonic() + self.policy.ejection_s
+                endpoint.ejections += 1
+                # Forget the latency, so the endpoint is tried once it's back
+                endpoint.ewma_latency_s = None
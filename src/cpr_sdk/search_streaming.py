@@ -0,0 +1,255 @@
+"""Parsing of vespa search responses as they're read, a family at a time"""
+
+import codecs
+import json
+import re
+from typing import Any, Callable, Collection, Iterable, Iterator, Optional
+
+from vespa.io import VespaQueryResponse
+
+from cpr_sdk.exceptions import FetchError
+from cpr_sdk.models.search import Family, SearchResponse
+from cpr_sdk.vespa import parse_vespa_family, parse_vespa_response
+
+# Where the families are in a response, as in `parse_vespa_response`
+_FAMILIES_PATH = ("root", "children", 0, "children", 0, "children")
+
+# A JSON string, a structural character, or a bare literal such as a number
+_TOKEN = re.compile(r'\s*(?:("(?:[^"\\]|\\.)*")|([\[\]{}:,])|([^\s\[\]{}:,"]+))')
+_WHITESPACE = re.compile(r"\s*")
+
+
+class _FamilySplitter:
+    """
+    Splits the families out of a vespa response's JSON as its text arrives
+
+    Everything before and after the list of families is kept as the response's
+    skeleton, with an empty list of families in their place, and parsed once the
+    response is complete. Only the family being read is held in memory.
+    """
+
+    def __init__(self) -> None:
+        self._decoder = json.JSONDecoder()
+        self._text_decoder = codecs.getincrementaldecoder("utf-8")()
+        self._buffer = ""
+        self._pending: list[str] = []
+        self._pending_length = 0
+        # A family that didn't decode isn't tried again until the buffer has
+        # doubled, so a large family is decoded a bounded number of times
+        self._wanted_length = 0
+        self._skeleton: list[str] = []
+        self._in_families = False
+        self._after_families = False
+        # Each open container is an `[is_object, key or index, expecting_key]`
+        self._stack: list[list[Any]] = []
+        self._position = 0
+
+    def feed(self, chunk: bytes, final: bool = False) -> Iterator[dict[str, Any]]:
+        """
+        Read the next chunk of the response
+
+        :param bytes chunk: the next bytes of the response body
+        :param bool final: whether this is the last chunk
+        :raises ValueError: if the response ends part way through a family
+        :return Iterator[dict]: the families completed by the chunk
+        """
+        text = self._text_decoder.decode(chunk, final)
+        if self._after_families:
+            self._skeleton.append(text)
+            return
+        self._pending.append(text)
+        self._pending_length += len(text)
+        if not final and len(self._buffer) + self._pending_length < self._wanted_length:
+            return
+        self._buffer += "".join(self._pending)
+        self._pending.clear()
+        self._pending_length = 0
+
+        self._position = 0
+        if not self._in_families:
+            self._find_families(final)
+        if self._in_families:
+            yield from self._split_families(final)
+        if self._in_families:
+            self._buffer = self._buffer[self._position :]
+        elif self._after_families:
+            self._skeleton.append(self._buffer[self._position :])
+            self._buffer = ""
+        elif final:
+            self._skeleton.append(self._buffer)
+            self._buffer = ""
+        else:
+            # Keep any token cut short by the end of the chunk for the next one
+            self._skeleton.append(self._buffer[: self._position])
+            self._buffer = self._buffer[self._position :]
+
+    def skeleton(self) -> str:
+        """The response without its families, once it's all been read"""
+        return "".join(self._skeleton)
+
+    def _find_families(self, final: bool) -> None:
+        """Scan the start of the response for the list of families"""
+        buffer = self._buffer
+        while True:
+            match = _TOKEN.match(buffer, self._position)
+            if match is None:
+                return
+            string, punctuation, literal = match.groups()
+            if literal is not None and match.end() == len(buffer) and not final:
+                # The literal may carry on in the next chunk
+                return
+            self._position = match.end()
+            top = self._stack[-1] if self._stack else None
+            if string is not None:
+                if top is not None and top[0] and top[2]:
+                    top[1] = json.loads(string)
+                    top[2] = False
+            elif punctuation in ("[", "{"):
+                path = tuple(container[1] for container in self._stack)
+                if punctuation == "[" and path == _FAMILIES_PATH:
+                    self._skeleton.append(buffer[: self._position])
+                    self._buffer = buffer = buffer[self._position :]
+                    self._position = 0
+                    self._in_families = True
+                    return
+                is_object = punctuation == "{"
+                self._stack.append([is_object, None if is_object else 0, is_object])
+            elif punctuation in ("]", "}"):
+                self._stack.pop()
+            elif punctuation == "," and top is not None:
+                if top[0]:
+                    top[2] = True
+                else:
+                    top[1] += 1
+
+    def _split_families(self, final: bool) -> Iterator[dict[str, Any]]:
+        """Decode the families in the buffer, up to the end of their list"""
+        buffer = self._buffer
+        while True:
+            whitespace = _WHITESPACE.match(buffer, self._position)
+            assert whitespace is not None, "matches the empty string, so always matches"
+            self._position = whitespace.end()
+            if self._position == len(buffer):
+                break
+            if buffer[self._position] == "]":
+                self._in_families = False
+                self._after_families = True
+                return
+            if buffer[self._position] == ",":
+                self._position += 1
+                continue
+            try:
+                family, self._position = self._decoder.raw_decode(
+                    buffer, self._position
+                )
+            except json.JSONDecodeError:
+                if final:
+                    raise
+                self._wanted_length = 2 * (len(buffer) - self._position)
+                return
+            self._wanted_length = 0
+            yield family
+        if final:
+            raise ValueError("The response ended part way through its families")
+
+
+class SearchResponseStream:
+    """
+    The families in a vespa search response, parsed as the response is read
+
+    Iterating yields each family as soon as it's been read, so only one family is
+    held in memory at a time rather than the whole response. Once every family has
+    been read, `response` has the rest of the response, e.g. its total hits and
+    continuation tokens. Use it as a context manager, or call `close`, to stop
+    reading early.
+    """
+
+    def __init__(
+        self,
+        chunks: Iterable[bytes],
+        trusted: bool = False,
+        status_code: int = 200,
+        url: str = "",
+        on_close: Optional[Callable[[], None]] = None,
+        summary_fields: Optional[Collection[str]] = None,
+    ) -> None:
+        """
+        Create a stream over the body of a vespa search response
+
+        :param Iterable[bytes] chunks: the response body, in chunks of any size
+        :param bool trusted: If True, the families are assumed to match the schemas,
+            and built without validation, as for `parse_vespa_response`
+        :param int status_code: the response status code
+        :param str url: the URL the request was sent to
+        :param Optional[Callable[[], None]] on_close: called once the stream is
+            closed, e.g. to release the connection it's read from
+        :param Optional[Collection[str]] summary_fields: If set, hits are built with
+            only these fields, as for `parse_vespa_response`
+        """
+        self.trusted = trusted
+        self.status_code = status_code
+        self.url = url
+        self.summary_fields = summary_fields
+        self._chunks = chunks
+        self._on_close = on_close
+        self._splitter = _FamilySplitter()
+        self._response: Optional[SearchResponse[Family]] = None
+        self._started = False
+        self._closed = False
+
+    def __iter__(self) -> Iterator[Family]:
+        """Parse the families as they're read, then the rest of the response"""
+        if self._started:
+            raise RuntimeError("A response stream can only be read once")
+        self._started = True
+        if self.status_code != 200:
+            self.close()
+            raise FetchError(
+                f"Received status code {self.status_code}",
+                status_code=self.status_code,
+            )
+        try:
+            for chunk in self._chunks:
+                for family in self._splitter.feed(chunk):
+                    yield parse_vespa_family(family, self.trusted, self.summary_fields)
+            for family in self._splitter.feed(b"", final=True):
+                yield parse_vespa_family(family, self.trusted, self.summary_fields)
+            self._response = parse_vespa_response(
+                VespaQueryResponse(
+                    json=json.loads(self._splitter.skeleton()),
+                    status_code=self.status_code,
+                    url=self.url,
+                ),
+                trusted=self.trusted,
+            )
+        finally:
+            self.close()
+
+    @property
+    def response(self) -> SearchResponse[Family]:
+        """
+        The response's metadata, once every family has been read
+
+        Its results are empty, as the families are only yielded by the stream.
+
+        :raises RuntimeError: if the stream hasn't been read to the end
+        """
+        if self._response is None:
+            raise RuntimeError("The response stream hasn't been read to the end")
+        return self._response
+
+    def close(self) -> None:
+        """Stop reading the response, releasing whatever it's read from"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._on_close is not None:
+            self._on_close()
+
+    def __enter__(self) -> "SearchResponseStream":
+        """Use the stream as a context manager, closing it on exit"""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        """Close the stream when leaving a context, whether or not it's been read"""
+        self.close()
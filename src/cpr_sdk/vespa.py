@@ -1,18 +1,51 @@
+import json
 import logging
+import threading
+import time
+from functools import partial
 from pathlib import Path
-from typing import Any, List, NamedTuple, Optional
+from typing import Any, Collection, List, NamedTuple, Optional
 
 import yaml
 from vespa.exceptions import VespaError
 from vespa.io import VespaQueryResponse
 
 from cpr_sdk.exceptions import FetchError
-from cpr_sdk.models.search import Family, Hit, SearchParameters, SearchResponse
+from cpr_sdk.models.search import (
+    SCHEMA_NAME_FIELD_NAME,
+    Family,
+    Hit,
+    LazyList,
+    SearchParameters,
+    SearchResponse,
+    SearchTimings,
+    SharedFamilyFields,
+    construct_without_validation,
+)
 from cpr_sdk.utils import dig
 from cpr_sdk.yql_builder import YQLBuilder
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import cbor2
+except ImportError:
+    cbor2 = None
+
 _LOGGER = logging.getLogger(__name__)
 
+# Fields that hits are always built with when their fields are projected, to tell
+# documents from passages and to build valid passages
+_SUMMARY_FIELDS_PARAMETER = "presentation.summaryFields"
+_PASSAGE_REQUIRED_FIELDS = ("text_block", "text_block_id", "text_block_type")
+_PROJECTED_HIT_FIELDS = (SCHEMA_NAME_FIELD_NAME, "summaryfeatures")
+
+# The formats vespa can be asked to send results in
+RESULT_FORMATS = ("json", "cbor")
+
 
 class DocumentIdComponents(NamedTuple):
     """Components within a Document ID."""
@@ -42,58 +75,178 @@ def split_document_id(document_id: str) -> DocumentIdComponents:
     return DocumentIdComponents(namespace, schema, data_id)
 
 
-def find_vespa_cert_paths() -> tuple[Optional[str], Optional[str]]:
+_FileStamp = Optional[tuple[int, int]]
+
+
+def _stamp(path: Path) -> _FileStamp:
+    """A file's modification time and size, or None if it doesn't exist"""
+    try:
+        stat = path.stat()
+    except OSError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+
+def _scan_vespa_cert_paths() -> tuple[tuple[Optional[str], Optional[str]], list[Path]]:
     """
-    Automatically find the certificate and key files for the vespa instance
+    Find the certificate and key files in the .vespa directory
 
-    :raises FileNotFoundError: if the .vespa directory is not found in the home
-        directory, or if the application name is not found in the config.yaml file
-    :return tuple[Path, Path]: The paths to the certificate and key files, respectively
+    :return: the paths to the certificate and key files, and the paths whose
+        changes could change them
     """
     vespa_directory = Path.home() / ".vespa/"
+    vespa_config = vespa_directory / "config.yaml"
+    watched = [vespa_directory, vespa_config]
     if not vespa_directory.exists():
         _LOGGER.warning(
             "Could not find .vespa directory in home directory when looking for certs."
         )
-        return None, None
+        return (None, None), watched
 
-    vespa_config = vespa_directory / "config.yaml"
     if not vespa_config.exists():
         _LOGGER.warning(
             "Could not find config.yaml file in .vespa directory when looking for certs."
         )
-        return None, None
+        return (None, None), watched
 
     # read the config.yaml file to find the application name
-    with open(vespa_directory / "config.yaml", "r", encoding="utf-8") as yaml_file:
+    with open(vespa_config, "r", encoding="utf-8") as yaml_file:
         data = yaml.safe_load(yaml_file)
         if not data or "application" not in data:
-            return None, None
+            return (None, None), watched
         application_name = data["application"]
 
     cert_directory = vespa_directory / application_name
+    watched.append(cert_directory)
 
-    cert_directory_certs = list(cert_directory.glob("*cert.pem"))
-    cert_path = (
-        str(list(cert_directory.glob("*cert.pem"))[0]) if cert_directory_certs else None
-    )
-    cert_directory_keys = list(cert_directory.glob("*key.pem"))
-    key_path = (
-        str(list(cert_directory.glob("*key.pem"))[0]) if cert_directory_keys else None
-    )
+    cert_paths = list(cert_directory.glob("*cert.pem"))
+    cert_path = str(cert_paths[0]) if cert_paths else None
+    key_paths = list(cert_directory.glob("*key.pem"))
+    key_path = str(key_paths[0]) if key_paths else None
+
+    return (cert_path, key_path), watched
+
+
+class VespaCertCache:
+    """
+    A thread-safe cache of the vespa cert and key paths, and their file stamps
+
+    Files are checked for changes by their modification times and sizes, at most
+    once every `check_interval_s`, so rotated certs or a newly selected application
+    are picked up without rebuilding adapters, while looking them up stays cheap.
+    """
+
+    def __init__(self, check_interval_s: float = 1.0) -> None:
+        """
+        Create a cert cache
+
+        :param float check_interval_s: the longest cached values are used for
+            before the files are checked for changes
+        """
+        self.check_interval_s = check_interval_s
+        self.scans = 0
+        self._paths: Optional[tuple[Optional[str], Optional[str]]] = None
+        self._watched: list[Path] = []
+        self._watched_stamps: list[_FileStamp] = []
+        self._paths_checked_at = 0.0
+        self._fingerprints: dict[tuple[str, ...], tuple[float, tuple]] = {}
+        self._lock = threading.Lock()
+
+    def cert_paths(self) -> tuple[Optional[str], Optional[str]]:
+        """
+        The paths to the certificate and key files for the vespa instance
+
+        :return tuple[Optional[str], Optional[str]]: the certificate and key paths,
+            respectively, or None if they can't be found
+        """
+        with self._lock:
+            now = time.monotonic()
+            if (
+                self._paths is not None
+                and now - self._paths_checked_at < self.check_interval_s
+            ):
+                return self._paths
+            if self._paths is None or self._watched_stamps != [
+                _stamp(path) for path in self._watched
+            ]:
+                self._paths, self._watched = _scan_vespa_cert_paths()
+                self._watched_stamps = [_stamp(path) for path in self._watched]
+                self.scans += 1
+            self._paths_checked_at = now
+            return self._paths
+
+    def fingerprint(self, *paths: Optional[str]) -> tuple:
+        """
+        A value that changes whenever any of some files change
 
-    return cert_path, key_path
+        :param Optional[str] paths: the files to watch, e.g. a cert and key
+        :return tuple: the files' modification times and sizes
+        """
+        key = tuple(path for path in paths if path is not None)
+        with self._lock:
+            now = time.monotonic()
+            cached = self._fingerprints.get(key)
+            if cached is not None and now - cached[0] < self.check_interval_s:
+                return cached[1]
+            fingerprint = tuple(_stamp(Path(path)) for path in key)
+            self._fingerprints[key] = (now, fingerprint)
+            return fingerprint
+
+    def clear(self) -> None:
+        """
+        Forget everything cached, so the next lookup reads the files again
+
+        The count of scans starts again from zero too.
+        """
+        with self._lock:
+            self._paths = None
+            self._fingerprints.clear()
+            self.scans = 0
+
+
+VESPA_CERT_CACHE = VespaCertCache()
+
+
+def find_vespa_cert_paths() -> tuple[Optional[str], Optional[str]]:
+    """
+    Automatically find the certificate and key files for the vespa instance
+
+    Results are cached for the whole process in `VESPA_CERT_CACHE`, and found
+    again when the files in the .vespa directory change.
+
+    :return tuple[Path, Path]: The paths to the certificate and key files, respectively
+    """
+    return VESPA_CERT_CACHE.cert_paths()
 
 
-def build_vespa_request_body(parameters: SearchParameters) -> dict[str, str]:
-    """Constructs the payload for a vespa query"""
+def build_vespa_request_body(
+    parameters: SearchParameters,
+    timings: Optional[SearchTimings] = None,
+    result_format: str = "json",
+) -> dict[str, str]:
+    """
+    Constructs the payload for a vespa query
+
+    :param SearchParameters parameters: a search request object
+    :param SearchTimings timings: if present, the time taken to build the YQL is
+        recorded here
+    :param str result_format: "json", or "cbor" to ask for vespa's binary result
+        format, which is quicker for vespa to encode and a little smaller. Needs
+        cbor2 installed
+    :raises ValueError: if the result format isn't one of `RESULT_FORMATS`
+    :return dict[str, str]: the request body
+    """
+    validate_result_format(result_format)
     if parameters.by_document_title and not parameters.documents_only:
         _LOGGER.warning(
             "Searching by document title is not supported when documents_only is False. Setting documents_only to True."
         )
         parameters.documents_only = True
 
+    yql_start = time.perf_counter_ns()
     yql = YQLBuilder(params=parameters).to_str()
+    if timings is not None:
+        timings.yql_ns = time.perf_counter_ns() - yql_start
     vespa_request_body: dict[str, Any] = {
         "yql": yql,
         "timeout": "20",
@@ -108,6 +261,14 @@ def build_vespa_request_body(parameters: SearchParameters) -> dict[str, str]:
     elif parameters.by_document_title:
         vespa_request_body["ranking.profile"] = "bm25_document_title"
 
+    if parameters.summary_fields is not None:
+        vespa_request_body[_SUMMARY_FIELDS_PARAMETER] = ",".join(
+            sorted({*parameters.summary_fields, *_PASSAGE_REQUIRED_FIELDS})
+        )
+
+    if result_format != "json":
+        vespa_request_body["presentation.format"] = result_format
+
     if parameters.custom_vespa_request_body is not None:
         overlapping_keys = set(vespa_request_body.keys()) & set(
             parameters.custom_vespa_request_body.keys()
@@ -131,12 +292,155 @@ def build_vespa_request_body(parameters: SearchParameters) -> dict[str, str]:
     return vespa_request_body
 
 
-def parse_vespa_response(vespa_response: VespaQueryResponse) -> SearchResponse[Family]:
+def summary_field_projection(
+    vespa_request_body: dict[str, Any],
+) -> Optional[frozenset[str]]:
+    """
+    The fields a request body limits hits to, if it limits them
+
+    :param dict vespa_request_body: a body built by `build_vespa_request_body`
+    :return Optional[frozenset[str]]: the fields to build hits with, including those
+        every hit needs, or None to build hits with every field
+    """
+    summary_fields = vespa_request_body.get(_SUMMARY_FIELDS_PARAMETER)
+    if not summary_fields:
+        return None
+    return frozenset(summary_fields.split(",")).union(_PROJECTED_HIT_FIELDS)
+
+
+def _projected(hit: dict[str, Any], summary_fields: Collection[str]) -> dict[str, Any]:
+    """A hit from a vespa response, with only the given fields"""
+    fields = hit.get("fields", {})
+    return hit | {
+        "fields": {name: fields[name] for name in summary_fields if name in fields}
+    }
+
+
+def validate_result_format(result_format: str) -> None:
+    """
+    Check that vespa can be asked for results in a format, and they can be decoded
+
+    :param str result_format: the format
+    :raises ValueError: if the result format isn't one of `RESULT_FORMATS`
+    :raises ImportError: if the format needs a package that isn't installed
+    """
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(
+            f"result_format must be one of {RESULT_FORMATS}, got {result_format}"
+        )
+    if result_format == "cbor" and cbor2 is None:
+        raise ImportError(
+            "cbor2 must be installed to get results as CBOR, "
+            "e.g. with `pip install cpr_sdk[cbor]`"
+        )
+
+
+def with_vespa_timeout(
+    vespa_request_body: dict[str, Any], timeout_s: float
+) -> dict[str, Any]:
+    """
+    Set how long vespa has to answer a request, replacing the default timeout
+
+    Soft timeouts are enabled, so vespa returns what it's found so far rather than
+    failing if ranking runs long, and vespa's timings are asked for, to show how
+    much of the round trip was spent outside it.
+
+    :param dict vespa_request_body: a body built by `build_vespa_request_body`
+    :param float timeout_s: seconds vespa has to answer
+    :return dict[str, Any]: a copy of the body with the timeout set
+    """
+    return vespa_request_body | {
+        "timeout": f"{max(1, int(timeout_s * 1000))}ms",
+        "ranking.softtimeout.enable": "true",
+        "presentation.timing": "true",
+    }
+
+
+def encode_vespa_request_body(vespa_request_body: dict[str, Any]) -> bytes:
+    """Serialise a request body to the JSON bytes sent to vespa"""
+    return json.dumps(vespa_request_body, separators=(",", ":")).encode("utf-8")
+
+
+def decode_vespa_response(
+    content: bytes, status_code: int, url: str
+) -> VespaQueryResponse:
+    """
+    Decode the raw bytes of a vespa query response, in JSON or CBOR
+
+    JSON is decoded with orjson if it's installed, which is several times faster
+    than the standard library and gives the same result. CBOR, if it was asked for,
+    is decoded with cbor2, to the same result as JSON. A body that's neither, e.g.
+    an error page from a proxy, is kept as the response's `message`.
+
+    :param bytes content: the response body
+    :param int status_code: the response status code
+    :param str url: the URL the request was sent to
+    :return VespaQueryResponse: the decoded response
+    """
+    try:
+        response_json = _cbor_loads(content) if _is_cbor(content) else _loads(content)
+    except ValueError:
+        response_json = {"message": content.decode("utf-8", errors="replace")}
+    return VespaQueryResponse(json=response_json, status_code=status_code, url=url)
+
+
+def _is_cbor(content: bytes) -> bool:
+    """
+    Whether a response body is CBOR rather than JSON, going by its first byte
+
+    Vespa's results are a CBOR map, which starts with a byte from 0xa0 to 0xbf.
+    Neither JSON nor any other text starts with one of those in UTF-8.
+    """
+    return bool(content) and 0xA0 <= content[0] <= 0xBF
+
+
+def _cbor_loads(content: bytes) -> Any:
+    """Decode CBOR, raising a ValueError if it's malformed, as for JSON"""
+    if cbor2 is None:
+        raise ImportError(
+            "cbor2 must be installed to decode results in CBOR, "
+            "e.g. with `pip install cpr_sdk[cbor]`"
+        )
+    try:
+        return cbor2.loads(content)
+    except cbor2.CBORDecodeError as e:
+        raise ValueError(f"Invalid CBOR: {e}") from e
+
+
+def _loads(content: bytes) -> Any:
+    """Decode JSON, with orjson if it's installed"""
+    if orjson is not None:
+        try:
+            return orjson.loads(content)
+        except orjson.JSONDecodeError:
+            # e.g. NaN, which orjson rejects but the standard library accepts
+            pass
+    return json.loads(content)
+
+
+def parse_vespa_response(
+    vespa_response: VespaQueryResponse,
+    trusted: bool = False,
+    lazy: bool = False,
+    summary_fields: Optional[Collection[str]] = None,
+) -> SearchResponse[Family]:
     """
     Parse a vespa response into a SearchResponse object
 
+    The hits in each family share one copy of each of the family's fields, rather
+    than each holding their own.
+
     :param SearchParameters request: The user's original search request
     :param VespaResponse vespa_response: The response from the vespa instance
+    :param bool trusted: If True, the response is assumed to match the schemas, and
+        the results are built without validation. That's much faster for large
+        responses, and gives equal results, but a malformed response can give
+        malformed results rather than raising
+    :param bool lazy: If True, families and hits are only built from the response
+        when they're first read, and any errors building them are raised then. Much
+        faster for wide responses when only some of the results are read
+    :param Optional[Collection[str]] summary_fields: If set, hits are built with
+        only these fields, e.g. from `summary_field_projection`
     :raises FetchError: if the vespa response status code is not 200, indicating an
         error in the query, or the vespa instance
     :return SearchResponse[Family]: a list of families, with response metadata
@@ -146,28 +450,17 @@ def parse_vespa_response(vespa_response: VespaQueryResponse) -> SearchResponse[F
             f"Received status code {vespa_response.status_code}",
             status_code=vespa_response.status_code,
         )
-    families: List[Family] = []
+    if trusted or lazy:
+        return _construct_search_response(
+            vespa_response.json["root"], trusted, lazy, summary_fields
+        )
     root = vespa_response.json["root"]
 
     response_families = dig(root, "children", 0, "children", 0, "children", default=[])
-    for family in response_families:
-        total_passage_hits = dig(family, "fields", "count()")
-        family_hits: List[Hit] = []
-        passages_continuation = dig(family, "children", 0, "continuation", "next")
-        prev_passages_continuation = dig(family, "children", 0, "continuation", "prev")
-        family_relevance = family.get("relevance")
-        for hit in dig(family, "children", 0, "children", default=[]):
-            family_hits.append(Hit.from_vespa_response(response_hit=hit))
-        families.append(
-            Family(
-                id=family["value"],
-                hits=family_hits,
-                total_passage_hits=total_passage_hits,
-                continuation_token=passages_continuation,
-                prev_continuation_token=prev_passages_continuation,
-                relevance=family_relevance,
-            )
-        )
+    families = [
+        parse_vespa_family(family, summary_fields=summary_fields)
+        for family in response_families
+    ]
 
     next_family_continuation = dig(
         root, "children", 0, "children", 0, "continuation", "next"
@@ -187,6 +480,143 @@ def parse_vespa_response(vespa_response: VespaQueryResponse) -> SearchResponse[F
         prev_continuation_token=prev_family_continuation,
         query_time_ms=None,
         total_time_ms=None,
+        degraded=is_degraded(root),
+    )
+
+
+def is_degraded(root: dict[str, Any]) -> bool:
+    """
+    Whether vespa stopped a search early, e.g. on reaching its timeout
+
+    :param dict root: the `root` of a vespa search response
+    :return bool: whether any of the reasons in the response's coverage is set
+    """
+    degraded = dig(root, "coverage", "degraded", default={})
+    return any(degraded.values())
+
+
+def parse_vespa_family(
+    family: dict[str, Any],
+    trusted: bool = False,
+    summary_fields: Optional[Collection[str]] = None,
+) -> Family:
+    """
+    Parse a single family, one of the grouping nodes of a vespa search response
+
+    :param dict family: the family's node in the response
+    :param bool trusted: If True, the family is assumed to match the schemas, and is
+        built without validation, as for `parse_vespa_response`
+    :param Optional[Collection[str]] summary_fields: If set, hits are built with
+        only these fields
+    :return Family: the family, with its hits
+    """
+    if trusted:
+        return _construct_family(family, True, False, summary_fields)
+    family_hits: List[Hit] = []
+    family_fields = SharedFamilyFields()
+    for hit in dig(family, "children", 0, "children", default=[]):
+        if summary_fields is not None:
+            hit = _projected(hit, summary_fields)
+        family_hits.append(
+            Hit.from_vespa_response(response_hit=hit, family_fields=family_fields)
+        )
+    return Family(
+        id=family["value"],
+        hits=family_hits,
+        total_passage_hits=dig(family, "fields", "count()"),
+        continuation_token=dig(family, "children", 0, "continuation", "next"),
+        prev_continuation_token=dig(family, "children", 0, "continuation", "prev"),
+        relevance=family.get("relevance"),
+    )
+
+
+def _construct_family(
+    family: dict[str, Any],
+    trusted: bool,
+    lazy: bool,
+    summary_fields: Optional[Collection[str]] = None,
+) -> Family:
+    """
+    Build a family from its node in a vespa response, without validating it
+
+    :param dict family: the family's node in the response
+    :param bool trusted: whether to build its hits without validation too
+    :param bool lazy: whether to build its hits on first access
+    :param Optional[Collection[str]] summary_fields: the fields to build hits with,
+        if not all of them
+    :return Family: the same family the validated path gives
+    """
+    from_response = (
+        Hit.from_trusted_vespa_response if trusted else Hit.from_vespa_response
+    )
+    hits_group = dig(family, "children", 0, default={})
+    continuation = hits_group.get("continuation", {})
+    response_hits = hits_group.get("children", [])
+    family_fields = SharedFamilyFields()
+
+    def build_hit(hit: dict[str, Any]) -> Hit:
+        if summary_fields is not None:
+            hit = _projected(hit, summary_fields)
+        return from_response(hit, family_fields)
+
+    return construct_without_validation(
+        Family,
+        {
+            "id": family["value"],
+            "hits": (
+                LazyList(response_hits, build_hit)
+                if lazy
+                else [build_hit(hit) for hit in response_hits]
+            ),
+            "total_passage_hits": dig(family, "fields", "count()"),
+            "continuation_token": continuation.get("next"),
+            "prev_continuation_token": continuation.get("prev"),
+            "relevance": family.get("relevance"),
+        },
+    )
+
+
+def _construct_search_response(
+    root: dict[str, Any],
+    trusted: bool,
+    lazy: bool,
+    summary_fields: Optional[Collection[str]] = None,
+) -> SearchResponse[Family]:
+    """
+    Build a response from the root of a vespa response, without validating families
+
+    :param dict root: the root of the vespa response
+    :param bool trusted: whether to build hits without validation too
+    :param bool lazy: whether to build families and hits on first access
+    :param Optional[Collection[str]] summary_fields: the fields to build hits with,
+        if not all of them
+    :return SearchResponse[Family]: the same response the validated path gives
+    """
+    build_family = partial(
+        _construct_family, trusted=trusted, lazy=lazy, summary_fields=summary_fields
+    )
+    response_families = dig(root, "children", 0, "children", 0, "children", default=[])
+    families = (
+        LazyList(response_families, build_family)
+        if lazy
+        else [build_family(family) for family in response_families]
+    )
+
+    families_group = dig(root, "children", 0, default={})
+    continuation = dig(families_group, "children", 0, "continuation", default={})
+    return construct_without_validation(
+        SearchResponse,
+        {
+            "total_hits": dig(root, "fields", "totalCount", default=0),
+            "total_result_hits": dig(families_group, "fields", "count()", default=0),
+            "results": families,
+            "continuation_token": continuation.get("next"),
+            "this_continuation_token": dig(families_group, "continuation", "this"),
+            "prev_continuation_token": continuation.get("prev"),
+            "query_time_ms": None,
+            "total_time_ms": None,
+            "degraded": is_degraded(root),
+        },
     )
 
 
@@ -1,39 +1,308 @@
-from string import Template
-from typing import Optional
-
+from functools import lru_cache
+from typing import Callable, Hashable, Optional
 
 from cpr_sdk.models.search import (
     Filters,
     SearchParameters,
 )
 
+# How many distinct filter values `YQLBuilder.to_str` keeps the YQL of. Each clause
+# is cached on its own, so a new combination of familiar filters is still cheap.
+FRAGMENT_CACHE_SIZE = 256
+
+
+def _escape_apostrophes(value: Optional[str]) -> str:
+    """Escape a apostrophes for safe inclusion in a single-quoted YQL literal."""
+    if value is None:
+        return ""
+    return value.replace("'", "\\'")
+
+
+def _search_term(key: tuple[bool, bool, bool]) -> str:
+    """The search term, for whether it matches all results, exactly, or by title"""
+    all_results, exact_match, by_document_title = key
+    if all_results:
+        return "( true )"
+    elif exact_match:
+        return """
+            (
+                (family_name_not_stemmed contains({stem: false}@query_string)) or
+                (family_description_not_stemmed contains({stem: false}@query_string)) or
+                (text_block_not_stemmed contains ({stem: false}@query_string))
+            )
+        """
+    elif by_document_title:
+        return """
+            (
+                (document_title_index contains(@query_string))
+            )
+        """
+    else:
+        return """
+            (
+                (userInput(@query_string))
+            )
+        """
 
-class YQLBuilder:
-    """Used to assemble YQL queries"""
 
-    yql_base = Template(
-        """
-        select * from sources $SOURCES
-            where $WHERE_CLAUSE
-        limit 0
-        |
-            $CONTINUATION
-        all(
-            group(family_import_id)
-            output(count())
-            max($LIMIT)
-            $SORT
-            each(
-                output(count())
-                max($MAX_HITS_PER_FAMILY)
-                each(
-                    output(
-                        summary(search_summary)
-                    )
+def _metadata_filter(metadata: tuple[tuple[str, str], ...]) -> Optional[str]:
+    """The metadata filter, for each metadata name and value"""
+    if not metadata:
+        return None
+    metadata_filters = []
+    for name, value in metadata:
+        name_escaped = _escape_apostrophes(name)
+        value_escaped = _escape_apostrophes(value)
+        metadata_filters.append(
+            f"""
+            (
+                metadata contains sameElement(
+                    name contains '{name_escaped}',
+                    value contains '{value_escaped}'
+                )
+            )
+            """
+        )
+    return f"({' and '.join(metadata_filters)})"
+
+
+def _concepts_filter(concepts: tuple[tuple[str, str], ...]) -> Optional[str]:
+    """The concepts filter, for each concept field name and value"""
+    if not concepts:
+        return None
+    concepts_query = []
+    for name, value in concepts:
+        if name == "parent_concept_ids_flat":
+            concepts_query.append(f"concepts.{name} matches '{value}'")
+        else:
+            concepts_query.append(f"concepts.{name} contains '{value}'")
+    return f"({' and '.join(concepts_query)})"
+
+
+def _in_filter(key: tuple[str, tuple[str, ...]]) -> Optional[str]:
+    """A filter limiting a field to any of a list of values"""
+    field_name, values = key
+    if not values:
+        return None
+    quoted = ", ".join([f"'{value}'" for value in values])
+    return f"({field_name} in({quoted}))"
+
+
+def _inclusive_filter(key: tuple[str, tuple[str, ...]]) -> Optional[str]:
+    """A filter limiting a field to containing any of a list of values"""
+    field_name, values = key
+    query_filters = []
+    for value in values:
+        query_filters.append(f'({field_name} contains "{value}")')
+    if query_filters:
+        return f"({' or '.join(query_filters)})"
+    return None
+
+
+def _year_start_filter(start: Optional[int]) -> Optional[str]:
+    """The filter on the earliest publication year"""
+    if start:
+        return f"(family_publication_year >= {start})"
+    return None
+
+
+def _year_end_filter(end: Optional[int]) -> Optional[str]:
+    """The filter on the latest publication year"""
+    if end:
+        return f"(family_publication_year <= {end})"
+    return None
+
+
+def _concept_count_filter(
+    concept_counts: tuple[tuple[Optional[str], str, int, bool], ...],
+) -> Optional[str]:
+    """The concept count filter, for each concept ID, operand, count and negation"""
+    if not concept_counts:
+        return None
+    concept_count_filters_subqueries = []
+    for concept_id, operand, count, negate in concept_counts:
+        concept_count_filters_subqueries.append(
+            f"""
+            {"!" if negate else ""}
+            (
+                concept_counts contains sameElement(
+                    {
+                (
+                    f'key contains "{concept_id}", '
+                    if concept_id is not None
+                    else ""
+                )
+            }
+                    value {operand} {
+                count
+            }
                 )
             )
+            """
         )
+    return f"({' and '.join(concept_count_filters_subqueries)})"
+
+
+def _concept_v2_passage_filter(
+    passage_filters: tuple[
+        tuple[Optional[str], Optional[str], Optional[str], bool], ...
+    ],
+) -> Optional[str]:
+    """
+    The v2 concepts passage filter
+
+    Matches passages on each concept ID, Wikibase ID, classifier ID and negation.
+    """
+    passage_clauses: list[str] = []
+
+    for concept_id, concept_wikibase_id, classifier_id, negate in passage_filters:
+        match_patterns: list[str] = []
+
+        # > Having a prefix using the ^ will be faster than not having one.
+        match (concept_id, concept_wikibase_id, classifier_id):
+            case (None, None, None):
+                raise ValueError("At least one constraint must be provided")
+            case (None, None, classifier_id):
+                match_patterns.append(f"concepts_v2_flat matches '{classifier_id}'")
+            case (None, concept_wikibase_id, None):
+                match_patterns.append(
+                    f"concepts_v2_flat matches '{concept_wikibase_id}'"
+                )
+            case (concept_id, None, None):
+                match_patterns.append(f"concepts_v2_flat matches '^{concept_id}'")
+
+            case (concept_id, concept_wikibase_id, None):
+                match_patterns.append(
+                    f"concepts_v2_flat matches '^{concept_id}:{concept_wikibase_id}'"
+                )
+            case (concept_id, None, classifier_id):
+                match_patterns.append(
+                    f"concepts_v2_flat matches '^{concept_id}:.*:{classifier_id}'"
+                )
+            case (None, concept_wikibase_id, classifier_id):
+                match_patterns.append(
+                    f"concepts_v2_flat matches '.*:{concept_wikibase_id}:{classifier_id}'"
+                )
+
+            case (concept_id, concept_wikibase_id, classifier_id):
+                match_patterns.append(
+                    f"concepts_v2_flat matches '^{concept_id}:{concept_wikibase_id}:{classifier_id}'"
+                )
+
+        for pattern in match_patterns:
+            passage_clause = f"spans contains sameElement({pattern})"
+            if negate:
+                passage_clause = f"!({passage_clause})"
+            passage_clauses.append(passage_clause)
+
+    if not passage_clauses:
+        return None
+
+    return f"({' and '.join(passage_clauses)})"
+
+
+def _concept_v2_document_filter(
+    document_filters: tuple[
+        tuple[
+            Optional[str],
+            Optional[str],
+            Optional[str],
+            Optional[int],
+            Optional[str],
+            bool,
+        ],
+        ...,
+    ],
+) -> Optional[str]:
+    """
+    The v2 concepts document filter
+
+    Matches documents on each concept ID, Wikibase ID, classifier ID, count,
+    operand and negation.
+    """
+    document_clauses: list[str] = []
+
+    for (
+        concept_id,
+        concept_wikibase_id,
+        classifier_id,
+        count,
+        operand,
+        negate,
+    ) in document_filters:
+        concept_conditions: list[str] = []
+
+        if concept_id:
+            concept_conditions.append(f"concept_id contains '{concept_id}'")
+        if concept_wikibase_id:
+            concept_conditions.append(
+                f"concept_wikibase_id contains '{concept_wikibase_id}'"
+            )
+        if classifier_id:
+            concept_conditions.append(f"classifier_id contains '{classifier_id}'")
+
+        if count is not None and operand is not None:
+            concept_conditions.append(f"count {operand} {count}")
+
+        if concept_conditions:
+            conditions_str = ", ".join(concept_conditions)
+            document_clause = f"concepts_v2 contains sameElement({conditions_str})"
+            if negate:
+                document_clause = f"!({document_clause})"
+            document_clauses.append(document_clause)
+
+    if not document_clauses:
+        return None
+
+    return f"({' and '.join(document_clauses)})"
+
+
+def _continuation(continuation_tokens: tuple[str, ...]) -> str:
+    """The continuation, for each continuation token"""
+    if continuation_tokens:
+        continuations = ", ".join(f"'{c}'" for c in continuation_tokens)
+        return f"{{ 'continuations': [{continuations}] }}"
+    else:
+        return ""
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _compiled(
+    build: Callable[[Hashable], Optional[str]], key: Hashable
+) -> Optional[str]:
+    """
+    Build a part of the query, with its whitespace normalised as in the YQL
+
+    Memoised, so each distinct filter is only built and normalised once.
+
+    :param Callable build: one of the functions building a part of the query
+    :param Hashable key: the filter values it builds from
+    :return Optional[str]: the part of the query, if the filter has any values
     """
+    fragment = build(key)
+    if fragment is None:
+        return None
+    return " ".join(fragment.split())
+
+
+@lru_cache(maxsize=FRAGMENT_CACHE_SIZE)
+def _compiled_where_clause(parts: tuple[tuple[Callable, Hashable], ...]) -> str:
+    """The where clause, joined from its memoised parts"""
+    filters = [_compiled(build, key) for build, key in parts]
+    return " and ".join([f for f in filters if f])  # Remove empty
+
+
+class YQLBuilder:
+    """Used to assemble YQL queries"""
+
+    # Laid out with its whitespace already normalised, so queries don't need
+    # normalising once formatted. The optional continuation and sort each carry
+    # their own trailing space.
+    yql_base = (
+        "select * from sources {SOURCES} where {WHERE_CLAUSE} limit 0 | "
+        "{CONTINUATION}all( group(family_import_id) output(count()) max({LIMIT}) "
+        "{SORT}each( output(count()) max({MAX_HITS_PER_FAMILY}) each( output( "
+        "summary({SUMMARY_CLASS}) ) ) ) )"
     )
 
     def __init__(self, params: SearchParameters) -> None:
@@ -41,9 +310,7 @@ class YQLBuilder:
 
     def _escape_apostrophes(self, value: Optional[str]) -> str:
         """Escape a apostrophes for safe inclusion in a single-quoted YQL literal."""
-        if value is None:
-            return ""
-        return value.replace("'", "\\'")
+        return _escape_apostrophes(value)
 
     def build_sources(self) -> str:
         """Creates the part of the query that determines which sources to search"""
@@ -52,50 +319,26 @@ class YQLBuilder:
         else:
             return "family_document, document_passage"
 
+    def _search_term_key(self) -> tuple[bool, bool, bool]:
+        return (
+            bool(self.params.all_results or not self.params.query_string),
+            self.params.exact_match,
+            self.params.by_document_title,
+        )
+
     def build_search_term(self) -> str:
         """Create the part of the query that matches a users search text"""
-        if self.params.all_results or not self.params.query_string:
-            return "( true )"
-        elif self.params.exact_match:
-            return """
-                (
-                    (family_name_not_stemmed contains({stem: false}@query_string)) or
-                    (family_description_not_stemmed contains({stem: false}@query_string)) or
-                    (text_block_not_stemmed contains ({stem: false}@query_string))
-                )
-            """
-        elif self.params.by_document_title:
-            return """
-                (
-                    (document_title_index contains(@query_string))
-                )
-            """
-        else:
-            return """
-                (
-                    (userInput(@query_string))
-                )
-            """
+        return _search_term(self._search_term_key())
+
+    def _metadata_key(self) -> tuple[tuple[str, str], ...]:
+        return tuple((m.name, m.value) for m in self.params.metadata or ())
 
     def build_metadata_filter(self) -> Optional[str]:
         """Create the part of the query that limits to specific metadata"""
-        metadata_filters = []
-        if self.params.metadata:
-            for metadata in self.params.metadata:
-                name_escaped = self._escape_apostrophes(metadata.name)
-                value_escaped = self._escape_apostrophes(metadata.value)
-                metadata_filters.append(
-                    f"""
-                    (
-                        metadata contains sameElement(
-                            name contains '{name_escaped}',
-                            value contains '{value_escaped}'
-                        )
-                    )
-                    """
-                )
-            return f"({' and '.join(metadata_filters)})"
-        return None
+        return _metadata_filter(self._metadata_key())
+
+    def _concepts_key(self) -> tuple[tuple[str, str], ...]:
+        return tuple((c.name, c.value) for c in self.params.concept_filters or ())
 
     def build_concepts_filter(self) -> Optional[str]:
         """
@@ -105,97 +348,58 @@ class YQLBuilder:
         - `concepts.name contains 'floods' and concepts.name contains 'environment'`
         - `concepts.parent_concept_ids_flat matches 'Q123' and concepts.name contains 'environment'`
         """
-        if self.params.concept_filters:
-            concepts_query = []
-            for concept in self.params.concept_filters:
-                if concept.name == "parent_concept_ids_flat":
-                    concepts_query.append(
-                        f"concepts.{concept.name} matches '{concept.value}'"
-                    )
-                else:
-                    concepts_query.append(
-                        f"concepts.{concept.name} contains '{concept.value}'"
-                    )
-            return f"({' and '.join(concepts_query)})"
-        return None
+        return _concepts_filter(self._concepts_key())
 
     def build_corpus_type_name_filter(self) -> Optional[str]:
         """Create the part of the query that limits to specific corpora"""
-        if self.params.corpus_type_names:
-            corpora = ", ".join([f"'{c}'" for c in self.params.corpus_type_names])
-            return f"(corpus_type_name in({corpora}))"
+        return _in_filter(
+            ("corpus_type_name", tuple(self.params.corpus_type_names or ()))
+        )
 
     def build_corpus_import_ids_filter(self) -> Optional[str]:
         """Create the part of the query that limits to specific corpora import id"""
-        if self.params.corpus_import_ids:
-            corpora = ", ".join([f"'{c}'" for c in self.params.corpus_import_ids])
-            return f"(corpus_import_id in({corpora}))"
+        return _in_filter(
+            ("corpus_import_id", tuple(self.params.corpus_import_ids or ()))
+        )
 
     def build_family_filter(self) -> Optional[str]:
         """Create the part of the query that limits to specific families"""
-        if self.params.family_ids:
-            families = ", ".join([f"'{f}'" for f in self.params.family_ids])
-            return f"(family_import_id in({families}))"
-        return None
+        return _in_filter(("family_import_id", tuple(self.params.family_ids or ())))
 
     def build_document_filter(self) -> Optional[str]:
         """Create the part of the query that limits to specific documents"""
-        if self.params.document_ids:
-            documents = ", ".join([f"'{d}'" for d in self.params.document_ids])
-            return f"(document_import_id in({documents}))"
-        return None
+        return _in_filter(("document_import_id", tuple(self.params.document_ids or ())))
 
     def _inclusive_filters(self, filters: Filters, field_name: str) -> Optional[str]:
-        values = getattr(filters, field_name)
-        query_filters = []
-        for value in values:
-            query_filters.append(f'({field_name} contains "{value}")')
-        if query_filters:
-            return f"({' or '.join(query_filters)})"
+        return _inclusive_filter((field_name, tuple(getattr(filters, field_name))))
 
     def build_year_start_filter(self) -> Optional[str]:
         """Create the part of the query that filters on a year range"""
-        if self.params.year_range:
-            start, _ = self.params.year_range
-            if start:
-                return f"(family_publication_year >= {start})"
-        return None
+        start, _ = self.params.year_range or (None, None)
+        return _year_start_filter(start)
 
     def build_year_end_filter(self) -> Optional[str]:
         """Create the part of the query that filters on a year range"""
-        if self.params.year_range:
-            _, end = self.params.year_range
-            if end:
-                return f"(family_publication_year <= {end})"
-        return None
+        _, end = self.params.year_range or (None, None)
+        return _year_end_filter(end)
+
+    def _concept_count_key(self) -> tuple[tuple[Optional[str], str, int, bool], ...]:
+        return tuple(
+            (f.concept_id, f.operand.value, f.count, f.negate)
+            for f in self.params.concept_count_filters or ()
+        )
 
     def build_concept_count_filter(self) -> Optional[str]:
         """Create the part of the query that filters on concept counts"""
-        concept_count_filters_subqueries = []
-        if self.params.concept_count_filters:
-            for concept_count_filter in self.params.concept_count_filters:
-                concept_count_filters_subqueries.append(
-                    f"""
-                    {"!" if concept_count_filter.negate else ""}
-                    (
-                        concept_counts contains sameElement(
-                            {
-                        (
-                            f'key contains "{concept_count_filter.concept_id}", '
-                            if concept_count_filter.concept_id is not None
-                            else ""
-                        )
-                    }
-                            value {concept_count_filter.operand.value} {
-                        concept_count_filter.count
-                    }
-                        )
-                    )
-                    """
-                )
-
-            return f"({' and '.join(concept_count_filters_subqueries)})"
-        return None
+        return _concept_count_filter(self._concept_count_key())
+
+    def _concept_v2_passage_key(
+        self,
+    ) -> tuple[tuple[Optional[str], Optional[str], Optional[str], bool], ...]:
+        return tuple(
+            (f.concept_id, f.concept_wikibase_id, f.classifier_id, f.negate)
+            for f in self.params.concept_v2_passage_filters or ()
+        )
 
     def build_concept_v2_passage_filter(self) -> str | None:
         """
@@ -205,59 +409,20 @@ class YQLBuilder:
         - `spans contains sameElement(concepts_v2_flat matches 'y28e4s6n:kx7m3p9w')`
         - `spans contains sameElement(concepts_v2_flat matches 'y28e4s6n')`  # concept only
         """
-        if not self.params.concept_v2_passage_filters:
-            return None
-
-        passage_filters: list[str] = []
-
-        for filter_obj in self.params.concept_v2_passage_filters:
-            match_patterns: list[str] = []
-
-            # > Having a prefix using the ^ will be faster than not having one.
-            match (
-                filter_obj.concept_id,
-                filter_obj.concept_wikibase_id,
-                filter_obj.classifier_id,
-            ):
-                case (None, None, None):
-                    raise ValueError("At least one constraint must be provided")
-                case (None, None, classifier_id):
-                    match_patterns.append(f"concepts_v2_flat matches '{classifier_id}'")
-                case (None, concept_wikibase_id, None):
-                    match_patterns.append(
-                        f"concepts_v2_flat matches '{concept_wikibase_id}'"
-                    )
-                case (concept_id, None, None):
-                    match_patterns.append(f"concepts_v2_flat matches '^{concept_id}'")
-
-                case (concept_id, concept_wikibase_id, None):
-                    match_patterns.append(
-                        f"concepts_v2_flat matches '^{concept_id}:{concept_wikibase_id}'"
-                    )
-                case (concept_id, None, classifier_id):
-                    match_patterns.append(
-                        f"concepts_v2_flat matches '^{concept_id}:.*:{classifier_id}'"
-                    )
-                case (None, concept_wikibase_id, classifier_id):
-                    match_patterns.append(
-                        f"concepts_v2_flat matches '.*:{concept_wikibase_id}:{classifier_id}'"
-                    )
-
-                case (concept_id, concept_wikibase_id, classifier_id):
-                    match_patterns.append(
-                        f"concepts_v2_flat matches '^{concept_id}:{concept_wikibase_id}:{classifier_id}'"
-                    )
-
-            for pattern in match_patterns:
-                document_filter = f"spans contains sameElement({pattern})"
-                if filter_obj.negate:
-                    document_filter = f"!({document_filter})"
-                passage_filters.append(document_filter)
-
-        if not passage_filters:
-            return None
-
-        return f"({' and '.join(passage_filters)})"
+        return _concept_v2_passage_filter(self._concept_v2_passage_key())
+
+    def _concept_v2_document_key(self) -> tuple[tuple, ...]:
+        return tuple(
+            (
+                f.concept_id,
+                f.concept_wikibase_id,
+                f.classifier_id,
+                f.count,
+                None if f.operand is None else f.operand.value,
+                f.negate,
+            )
+            for f in self.params.concept_v2_document_filters or ()
+        )
 
     def build_concept_v2_document_filter(self) -> str | None:
         """
@@ -268,79 +433,75 @@ class YQLBuilder:
         - `concepts_v2 contains sameElement(concept_id contains 'y28e4s6n', classifier_id contains 'kx7m3p9w')`
         - `concepts_v2 contains sameElement(concept_wikibase_id contains 'Q100', count > 5)`
         """
-        if not self.params.concept_v2_document_filters:
-            return None
-
-        document_filters: list[str] = []
-
-        for filter_obj in self.params.concept_v2_document_filters:
-            concept_conditions: list[str] = []
-
-            if filter_obj.concept_id:
-                concept_conditions.append(
-                    f"concept_id contains '{filter_obj.concept_id}'"
-                )
-            if filter_obj.concept_wikibase_id:
-                concept_conditions.append(
-                    f"concept_wikibase_id contains '{filter_obj.concept_wikibase_id}'"
-                )
-            if filter_obj.classifier_id:
-                concept_conditions.append(
-                    f"classifier_id contains '{filter_obj.classifier_id}'"
-                )
+        return _concept_v2_document_filter(self._concept_v2_document_key())
 
-            if filter_obj.count is not None and filter_obj.operand is not None:
-                concept_conditions.append(
-                    f"count {filter_obj.operand.value} {filter_obj.count}"
-                )
-
-            if concept_conditions:
-                conditions_str = ", ".join(concept_conditions)
-                document_filter = f"concepts_v2 contains sameElement({conditions_str})"
-                if filter_obj.negate:
-                    document_filter = f"!({document_filter})"
-                document_filters.append(document_filter)
-
-        if not document_filters:
-            return None
+    def _where_clause_parts(self) -> tuple[tuple[Callable, Hashable], ...]:
+        """
+        Each part of the where clause, as a function and the key it builds from
 
-        return f"({' and '.join(document_filters)})"
+        Filters that aren't set are left out, as they'd add nothing to the query.
+        """
+        params = self.params
+        parts: list[tuple[Callable, Hashable]] = [
+            (_search_term, self._search_term_key())
+        ]
+        if params.family_ids:
+            parts.append((_in_filter, ("family_import_id", tuple(params.family_ids))))
+        if params.document_ids:
+            parts.append(
+                (_in_filter, ("document_import_id", tuple(params.document_ids)))
+            )
+        if params.corpus_type_names:
+            parts.append(
+                (_in_filter, ("corpus_type_name", tuple(params.corpus_type_names)))
+            )
+        if params.corpus_import_ids:
+            parts.append(
+                (_in_filter, ("corpus_import_id", tuple(params.corpus_import_ids)))
+            )
+        if params.metadata:
+            parts.append((_metadata_filter, self._metadata_key()))
+        if params.concept_filters:
+            parts.append((_concepts_filter, self._concepts_key()))
+        if f := params.filters:
+            for field_name in (
+                "family_geographies",
+                "family_geography",
+                "family_category",
+                "document_languages",
+                "family_source",
+            ):
+                if values := getattr(f, field_name):
+                    parts.append((_inclusive_filter, (field_name, tuple(values))))
+        if params.year_range:
+            start, end = params.year_range
+            parts.append((_year_start_filter, start))
+            parts.append((_year_end_filter, end))
+        if params.concept_count_filters:
+            parts.append((_concept_count_filter, self._concept_count_key()))
+        if params.concept_v2_passage_filters:
+            parts.append((_concept_v2_passage_filter, self._concept_v2_passage_key()))
+        if params.concept_v2_document_filters:
+            parts.append((_concept_v2_document_filter, self._concept_v2_document_key()))
+        return tuple(parts)
 
     def build_where_clause(self) -> str:
         """Create the part of the query that adds filters"""
-        filters = []
-        filters.append(self.build_search_term())
-        filters.append(self.build_family_filter())
-        filters.append(self.build_document_filter())
-        filters.append(self.build_corpus_type_name_filter())
-        filters.append(self.build_corpus_import_ids_filter())
-        filters.append(self.build_metadata_filter())
-        filters.append(self.build_concepts_filter())
-        if f := self.params.filters:
-            filters.append(self._inclusive_filters(f, "family_geographies"))
-            filters.append(self._inclusive_filters(f, "family_geography"))
-            filters.append(self._inclusive_filters(f, "family_category"))
-            filters.append(self._inclusive_filters(f, "document_languages"))
-            filters.append(self._inclusive_filters(f, "family_source"))
-        filters.append(self.build_year_start_filter())
-        filters.append(self.build_year_end_filter())
-        filters.append(self.build_concept_count_filter())
-        filters.append(self.build_concept_v2_passage_filter())
-        filters.append(self.build_concept_v2_document_filter())
+        filters = [build(key) for build, key in self._where_clause_parts()]
         return " and ".join([f for f in filters if f])  # Remove empty
 
     def build_continuation(self) -> str:
         """Create the part of the query that adds continuation tokens"""
-        if self.params.continuation_tokens:
-            continuations = ", ".join(f"'{c}'" for c in self.params.continuation_tokens)
-            return f"{{ 'continuations': [{continuations}] }}"
-        else:
-            return ""
+        return _continuation(tuple(self.params.continuation_tokens or ()))
 
     def build_limit(self) -> int:
         """Create the part of the query limiting the number of families returned"""
         return self.params.limit
 
+    def build_summary_class(self) -> str:
+        """Create the part of the query choosing the document summary for hits"""
+        return self.params.summary_class
+
     def build_sort(self) -> str:
         """Creates the part of the query used for sorting by different fields"""
         sort_by = self.params.vespa_sort_by
@@ -355,13 +516,23 @@ class YQLBuilder:
         return self.params.max_hits_per_family
 
     def to_str(self) -> str:
-        """Assemble the yql from parts using the template"""
-        yql = self.yql_base.substitute(
+        """
+        Assemble the yql from parts using the template
+
+        The where clause, and each part of it, is memoised on the filter values it's
+        built from, with its whitespace already normalised, so searches with
+        familiar filters, like browsing, barely build any YQL.
+        """
+        continuation = _compiled(
+            _continuation, tuple(self.params.continuation_tokens or ())
+        )
+        sort = self.build_sort()
+        return self.yql_base.format(
             SOURCES=self.build_sources(),
-            WHERE_CLAUSE=self.build_where_clause(),
-            CONTINUATION=self.build_continuation(),
+            WHERE_CLAUSE=_compiled_where_clause(self._where_clause_parts()),
+            CONTINUATION=f"{continuation} " if continuation else "",
             LIMIT=self.build_limit(),
-            SORT=self.build_sort(),
+            SORT=f"{sort} " if sort else "",
             MAX_HITS_PER_FAMILY=self.build_max_hits_per_family(),
+            SUMMARY_CLASS=self.build_summary_class(),
         )
-        return " ".join(yql.split())
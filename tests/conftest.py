@@ -5,6 +5,7 @@ import boto3
 import pytest
 from moto import mock_aws
 
+from benchmarks.stand_in import running_stand_ins
 from cpr_sdk.search_adaptors import VespaSearchAdapter
 
 VESPA_TEST_SEARCH_URL = "http://localhost:8080"
@@ -20,6 +21,20 @@ def test_vespa():
     yield adaptor
 
 
+@pytest.fixture()
+def stand_in_vespa():
+    """A local stand-in for a Vespa instance, serving a canned search response"""
+    with running_stand_ins(1) as (stand_in,):
+        yield stand_in
+
+
+@pytest.fixture()
+def stand_in_vespas():
+    """Three local stand-ins, for endpoints serving the same Vespa instance"""
+    with running_stand_ins(3) as stand_ins:
+        yield stand_ins
+
+
 @pytest.fixture()
 def s3_client():
     with mock_aws():
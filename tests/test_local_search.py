@@ -0,0 +1,300 @@
+import datetime
+from pathlib import Path
+
+import pytest
+
+from cpr_sdk.exceptions import DocumentNotFoundError, QueryError
+from cpr_sdk.local_search import LocalSearchAdapter, tokenise
+from cpr_sdk.models import (
+    BaseDocument,
+    CPRDocument,
+    CPRDocumentMetadata,
+    Dataset,
+    TextBlock,
+)
+from cpr_sdk.models.search import (
+    ConceptFilter,
+    Document,
+    Filters,
+    MetadataFilter,
+    Passage,
+    SearchParameters,
+)
+from cpr_sdk.parser_models import BlockType
+from cpr_sdk.search_middleware import LatencyHistogramMiddleware
+
+
+def make_document(
+    document_id: str,
+    family_id: str,
+    family_name: str,
+    texts: list[str],
+    year: int = 2020,
+    geography: str = "GBR",
+    sectors: tuple[str, ...] = ("Energy",),
+) -> CPRDocument:
+    return CPRDocument(
+        document_id=document_id,
+        document_name=family_name,
+        document_description=f"The {family_name.lower()} document",
+        document_slug=document_id.lower(),
+        languages=["en"],
+        translated=False,
+        has_valid_text=True,
+        document_content_type="text/html",
+        text_blocks=[
+            TextBlock(
+                text=[text],
+                text_block_id=f"b{i}",
+                type=BlockType.TEXT,
+                type_confidence=1.0,
+                page_number=-1,
+            )
+            for i, text in enumerate(texts)
+        ],
+        document_metadata=CPRDocumentMetadata(
+            geography=geography,
+            geography_iso=geography,
+            slug=family_id.lower(),
+            category="Executive",
+            source="CCLW",
+            type="Law",
+            sectors=list(sectors),
+            family_id=family_id,
+            family_name=family_name,
+            family_slug=family_id.lower(),
+            status="PUBLISHED",
+            publication_ts=datetime.datetime(year, 1, 1),
+        ),
+    )
+
+
+@pytest.fixture
+def local_adaptor() -> LocalSearchAdapter:
+    documents = [
+        make_document(
+            "CCLW.executive.1.0",
+            "CCLW.family.1.0",
+            "Flood defence act",
+            [
+                "Flood defences along the coast",
+                "Funding for flood defences and flood warnings",
+                "Unrelated text about roads",
+            ],
+            year=2010,
+        ),
+        make_document(
+            "CCLW.executive.1.1",
+            "CCLW.family.1.0",
+            "Flood defence act amendment",
+            ["Amends the flood warnings"],
+            year=2010,
+        ),
+        make_document(
+            "CCLW.executive.2.0",
+            "CCLW.family.2.0",
+            "Renewable energy strategy",
+            ["Solar and wind energy targets", "A flood of new investment"],
+            year=2015,
+            geography="FRA",
+            sectors=("Energy", "Transport"),
+        ),
+        make_document(
+            "CCLW.executive.3.0",
+            "CCLW.family.3.0",
+            "Forest protection plan",
+            ["Forest protection from fires"],
+            year=2020,
+            geography="BRA",
+        ),
+    ]
+    return LocalSearchAdapter(Dataset(document_model=CPRDocument, documents=documents))
+
+
+def test_tokenise():
+    assert tokenise("Flood-defences, 2020!") == ["flood", "defences", "2020"]
+
+
+def test_local_search__ranks_families_and_hits_by_bm25(local_adaptor):
+    response = local_adaptor.search(SearchParameters(query_string="flood defences"))
+
+    assert [f.id for f in response.results] == ["CCLW.family.1.0", "CCLW.family.2.0"]
+    family = response.results[0]
+    relevances = [hit.relevance for hit in family.hits]
+    assert relevances == sorted(relevances, reverse=True)
+    assert family.relevance == relevances[0]
+    assert family.total_passage_hits == len(family.hits) == 5
+    assert response.total_hits == 6
+    assert response.total_result_hits == 2
+    assert isinstance(family.hits[0], Passage)
+    assert "defences" in family.hits[0].text_block.lower()
+
+
+def test_local_search__returns_documents_and_passages(local_adaptor):
+    response = local_adaptor.search(SearchParameters(query_string="forest"))
+
+    (family,) = response.results
+    document, passage = sorted(family.hits, key=lambda h: type(h).__name__)
+    assert isinstance(document, Document)
+    assert document.family_name == "Forest protection plan"
+    assert document.family_geography == "BRA"
+    assert document.family_publication_ts == datetime.datetime(2020, 1, 1)
+    assert isinstance(passage, Passage)
+    assert passage.text_block == "Forest protection from fires"
+    assert passage.text_block_id == "b0"
+
+
+def test_local_search__exact_match_requires_the_phrase(local_adaptor):
+    response = local_adaptor.search(
+        SearchParameters(query_string="flood warnings", exact_match=True)
+    )
+
+    texts = [hit.text_block for f in response.results for hit in f.hits]
+    assert sorted(texts) == [
+        "Amends the flood warnings",
+        "Funding for flood defences and flood warnings",
+    ]
+
+
+@pytest.mark.parametrize(
+    "parameters, expected_family_ids",
+    [
+        ({"family_ids": ["CCLW.family.2.0"]}, ["CCLW.family.2.0"]),
+        ({"document_ids": ["CCLW.executive.1.1"]}, ["CCLW.family.1.0"]),
+        ({"year_range": (2011, None)}, ["CCLW.family.2.0"]),
+        ({"year_range": (None, 2010)}, ["CCLW.family.1.0"]),
+        ({"filters": Filters(family_geography=["FRA"])}, ["CCLW.family.2.0"]),
+        ({"filters": Filters(family_geographies=["GBR", "FRA"])}, None),
+        (
+            {"metadata": [MetadataFilter(name="family.sector", value="Transport")]},
+            ["CCLW.family.2.0"],
+        ),
+        ({"corpus_type_names": ["Laws and Policies"]}, []),
+    ],
+)
+def test_local_search__applies_filters(local_adaptor, parameters, expected_family_ids):
+    response = local_adaptor.search(
+        SearchParameters(query_string="flood", **parameters)
+    )
+
+    family_ids = [f.id for f in response.results]
+    if expected_family_ids is None:
+        expected_family_ids = ["CCLW.family.1.0", "CCLW.family.2.0"]
+    assert sorted(family_ids) == expected_family_ids
+
+
+def test_local_search__documents_only(local_adaptor):
+    response = local_adaptor.search(
+        SearchParameters(query_string="flood", documents_only=True)
+    )
+
+    hits = [hit for f in response.results for hit in f.hits]
+    assert len(hits) == 2
+    assert all(isinstance(hit, Document) for hit in hits)
+
+
+def test_local_search__all_results_can_be_sorted(local_adaptor):
+    response = local_adaptor.search(
+        SearchParameters(all_results=True, sort_by="date", sort_order="ascending")
+    )
+
+    assert [f.id for f in response.results] == [
+        "CCLW.family.1.0",
+        "CCLW.family.2.0",
+        "CCLW.family.3.0",
+    ]
+    assert response.total_hits == 11
+
+
+def test_local_search__limits_hits_per_family(local_adaptor):
+    request = SearchParameters(query_string="flood", max_hits_per_family=2)
+    response = local_adaptor.search(request)
+
+    family = response.results[0]
+    assert len(family.hits) == 2
+    assert family.continuation_token is not None
+
+    all_hits = list(local_adaptor.iter_family_hits(request, response, family.id))
+    assert len(all_hits) == family.total_passage_hits
+    assert len(
+        {(h.document_import_id, getattr(h, "text_block_id", None)) for h in all_hits}
+    ) == len(all_hits)
+
+
+def test_local_search__pages_through_families(local_adaptor):
+    request = SearchParameters(query_string="flood", limit=1)
+
+    pages = list(local_adaptor.iter_pages(request))
+
+    assert [f.id for page in pages for f in page.results] == [
+        "CCLW.family.1.0",
+        "CCLW.family.2.0",
+    ]
+    assert pages[1].prev_continuation_token is not None
+
+
+def test_local_search__rejects_concept_filters(local_adaptor):
+    with pytest.raises(QueryError):
+        local_adaptor.search(
+            SearchParameters(
+                query_string="flood",
+                concept_filters=[ConceptFilter(name="name", value="floods")],
+            )
+        )
+
+
+def test_local_search__get_by_id(local_adaptor):
+    document = local_adaptor.get_by_id(
+        "id:doc_search:family_document::CCLW.executive.2.0"
+    )
+    passage = local_adaptor.get_by_id(
+        "id:doc_search:document_passage::CCLW.executive.2.0.1"
+    )
+
+    assert isinstance(document, Document)
+    assert document.document_import_id == "CCLW.executive.2.0"
+    assert isinstance(passage, Passage)
+    assert passage.text_block == "A flood of new investment"
+    for missing in [
+        "id:doc_search:family_document::CCLW.executive.9.0",
+        "id:doc_search:document_passage::CCLW.executive.2.0.7",
+    ]:
+        with pytest.raises(DocumentNotFoundError):
+            local_adaptor.get_by_id(missing)
+
+
+@pytest.mark.asyncio
+async def test_local_search__async_search_matches_search(local_adaptor):
+    request = SearchParameters(query_string="energy targets")
+
+    assert await local_adaptor.async_search(request) == local_adaptor.search(request)
+
+
+@pytest.mark.asyncio
+async def test_local_search__runs_middleware_around_searches(local_adaptor):
+    histogram = LatencyHistogramMiddleware()
+    local_adaptor.add_middleware(histogram)
+    request = SearchParameters(query_string="energy targets")
+
+    local_adaptor.search(request)
+    await local_adaptor.async_search(request)
+
+    assert histogram.count == 2
+    assert histogram.errors == 0
+
+
+def test_local_search__over_a_loaded_dataset():
+    dataset = (
+        Dataset(document_model=BaseDocument)
+        .load_from_local("tests/test_data/valid")
+        .add_metadata(
+            target_model=CPRDocument,
+            metadata_csv_path=Path("tests/test_data/CPR_metadata.csv"),
+        )
+    )
+    adaptor = LocalSearchAdapter(dataset)
+
+    response = adaptor.search(SearchParameters(query_string="energy"))
+
+    assert response.total_hits > 0
+    assert all(f.hits for f in response.results)
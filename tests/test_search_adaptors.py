@@ -1,10 +1,22 @@
+import asyncio
+import json
+import random
+import time
 import traceback
 from collections.abc import Mapping
 from timeit import timeit
 from typing import Union
 
+import httpr
 import pytest
 
+from cpr_sdk.exceptions import (
+    CircuitOpenError,
+    DeadlineExceededError,
+    DocumentNotFoundError,
+    FetchError,
+    QueryError,
+)
 from cpr_sdk.models.search import (
     ConceptCountFilter,
     ConceptFilter,
@@ -14,6 +26,7 @@ from cpr_sdk.models.search import (
     Family,
     Filters,
     Hit,
+    LazyList,
     MetadataFilter,
     OperandTypeEnum,
     Passage,
@@ -21,7 +34,23 @@ from cpr_sdk.models.search import (
     SearchResponse,
     sort_fields,
 )
-from cpr_sdk.search_adaptors import VespaSearchAdapter
+from cpr_sdk.result import Err, Ok, unwrap_err, unwrap_ok
+from cpr_sdk.search_adaptors import SearchAdapter, VespaSearchAdapter
+from cpr_sdk.search_cache import SearchCache
+from cpr_sdk.search_governor import (
+    Priority,
+    RequestGovernor,
+    set_default_governor,
+)
+from cpr_sdk.search_hedging import HedgePolicy
+from cpr_sdk.search_middleware import LatencyHistogramMiddleware, SearchMiddleware
+from cpr_sdk.search_resilience import (
+    CircuitBreaker,
+    CircuitState,
+    RetryPolicy,
+    RetryStats,
+)
+from cpr_sdk.search_routing import RoutingPolicy
 from cpr_sdk.utils import dig
 from cpr_sdk.vespa import build_vespa_request_body
 
@@ -2271,3 +2300,1138 @@ def test_vespa_search_adaptor__v2_concept_with_query_string(test_vespa):
                 break
         # Should find at least one passage with concepts_v2
         assert found_concepts_v2, "Expected at least one passage with concepts_v2"
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__reuses_pooled_session(stand_in_vespa):
+    adaptor = stand_in_vespa.adaptor()
+    request = SearchParameters(query_string="the")
+
+    async with adaptor:
+        session = await adaptor.get_async_session()
+        for _ in range(5):
+            response = await adaptor.async_search(request)
+            assert len(response.results) > 0
+        assert await adaptor.get_async_session() is session
+
+    assert stand_in_vespa.request_count == 5
+    assert stand_in_vespa.connection_count == 1
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__aclose_and_keepalive(stand_in_vespa):
+    adaptor = stand_in_vespa.adaptor(async_keepalive_s=0.05)
+
+    session = await adaptor.get_async_session()
+    assert await adaptor.get_async_session() is session
+
+    await asyncio.sleep(0.1)
+    reopened_session = await adaptor.get_async_session()
+    assert reopened_session is not session
+
+    await adaptor.aclose()
+    await adaptor.aclose()
+    assert await adaptor.get_async_session() is not reopened_session
+    await adaptor.aclose()
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__cert_change_waits_for_queries_in_flight(
+    stand_in_vespa,
+):
+    adaptor = stand_in_vespa.adaptor()
+    stand_in_vespa.latency_s = 0.2
+    request = SearchParameters(query_string="the")
+
+    async with adaptor:
+        session = await adaptor.get_async_session()
+        in_flight = asyncio.create_task(adaptor.async_search(request))
+        await asyncio.sleep(0.05)
+
+        adaptor._credentials = lambda: ("rotated",)
+        reopened_session = await adaptor.get_async_session()
+        assert reopened_session is not session
+        assert not session.httpr_client.is_closed
+
+        response = await in_flight
+        assert len(response.results) > 0
+        assert session.httpr_client.is_closed
+        assert not reopened_session.httpr_client.is_closed
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__keepalive_counts_from_last_response(
+    stand_in_vespa,
+):
+    adaptor = stand_in_vespa.adaptor(async_keepalive_s=0.1)
+    stand_in_vespa.latency_s = 0.15
+    request = SearchParameters(query_string="the")
+
+    async with adaptor:
+        session = await adaptor.get_async_session()
+        await adaptor.async_search(request)
+        assert await adaptor.get_async_session() is session
+
+
+class SlowEchoSearchAdapter(SearchAdapter):
+    """Returns the query's limit as total_hits after a delay, failing on limit 0"""
+
+    def __init__(self, delay_s: float = 0.01):
+        self.delay_s = delay_s
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _respond(self, parameters: SearchParameters) -> SearchResponse[Family]:
+        if parameters.limit == 0:
+            raise ValueError("bad query")
+        return SearchResponse(total_hits=parameters.limit, results=[])
+
+    def search(self, parameters):
+        """Echoes the query after a delay, tracking how many run at once"""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        time.sleep(self.delay_s * (10 - parameters.limit % 10))
+        self.in_flight -= 1
+        return self._respond(parameters)
+
+    async def async_search(self, parameters):
+        """Echoes the query after an async delay, tracking how many run at once"""
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(self.delay_s * (10 - parameters.limit % 10))
+        self.in_flight -= 1
+        return self._respond(parameters)
+
+    def get_by_id(self, document_id):
+        """Not needed by these tests"""
+        raise NotImplementedError
+
+
+def test_search_many__keeps_order_and_isolates_failures():
+    adaptor = SlowEchoSearchAdapter()
+    requests = [SearchParameters(query_string="the", limit=i) for i in range(12)]
+
+    results = adaptor.search_many(requests, max_concurrency=4)
+
+    assert len(results) == len(requests)
+    assert isinstance(results[0], Err)
+    assert "bad query" in unwrap_err(results[0]).msg
+    assert isinstance(unwrap_err(results[0]).metadata["exception"], ValueError)
+    for i, result in enumerate(results[1:], start=1):
+        assert isinstance(result, Ok)
+        assert unwrap_ok(result).total_hits == i
+    assert adaptor.max_in_flight <= 4
+
+
+@pytest.mark.asyncio
+async def test_async_search_many__keeps_order_and_isolates_failures():
+    adaptor = SlowEchoSearchAdapter()
+    requests = [SearchParameters(query_string="the", limit=i) for i in range(12)]
+
+    results = await adaptor.async_search_many(requests, max_concurrency=3)
+
+    assert [r.__class__ for r in results] == [Err] + [Ok] * 11
+    assert [unwrap_ok(r).total_hits for r in results[1:]] == list(range(1, 12))
+    assert adaptor.max_in_flight == 3
+
+
+def test_search_many__rejects_invalid_concurrency():
+    with pytest.raises(ValueError):
+        SlowEchoSearchAdapter().search_many([], max_concurrency=0)
+
+
+@pytest.mark.asyncio
+async def test_vespa_search_many__against_stand_in(stand_in_vespa):
+    adaptor = stand_in_vespa.adaptor()
+    requests = [SearchParameters(query_string=f"query {i}") for i in range(6)]
+
+    sync_results = adaptor.search_many(requests, max_concurrency=3)
+    async with adaptor:
+        async_results = await adaptor.async_search_many(requests, max_concurrency=3)
+
+    assert all(isinstance(r, Ok) for r in sync_results + async_results)
+    assert unwrap_ok(sync_results[0]) == unwrap_ok(async_results[0])
+    assert stand_in_vespa.request_count == 12
+
+
+@pytest.mark.asyncio
+async def test_vespa_search_adaptor__parses_trusted_responses_alike(stand_in_vespa):
+    request = SearchParameters(query_string="the")
+
+    validated = stand_in_vespa.adaptor().search(request)
+    trusted_adaptor = stand_in_vespa.adaptor(trusted_responses=True)
+    trusted = trusted_adaptor.search(request)
+    async with trusted_adaptor:
+        async_trusted = await trusted_adaptor.async_search(request)
+
+    assert trusted.results == validated.results
+    assert async_trusted.results == validated.results
+    assert trusted.total_hits == validated.total_hits
+
+
+def test_vespa_search_adaptor__parses_lazy_responses_alike(stand_in_vespa):
+    request = SearchParameters(query_string="the")
+
+    validated = stand_in_vespa.adaptor().search(request)
+    lazy = stand_in_vespa.adaptor(lazy_responses=True).search(request)
+
+    assert isinstance(lazy.results, LazyList)
+    assert lazy.results == validated.results
+    assert lazy.timings.parse_ns is not None
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+def test_vespa_search_adaptor__streams_responses_alike(stand_in_vespa, trusted):
+    request = SearchParameters(query_string="the")
+    governor = RequestGovernor(max_in_flight=1)
+    adaptor = stand_in_vespa.adaptor(trusted_responses=trusted, governor=governor)
+
+    validated = adaptor.search(request)
+    with adaptor.stream_search(request) as stream:
+        assert governor.stats.in_flight == 1
+        families = list(stream)
+
+    assert families == list(validated.results)
+    assert stream.response.total_hits == validated.total_hits
+    assert stream.response.continuation_token == validated.continuation_token
+    assert governor.stats.in_flight == 0
+
+
+def test_vespa_search_adaptor__projects_summary_fields(stand_in_vespa):
+    request = SearchParameters(query_string="the", summary_fields=["family_name"])
+    adaptor = stand_in_vespa.adaptor()
+
+    response = adaptor.search(request)
+    with adaptor.stream_search(request) as stream:
+        streamed = list(stream)
+
+    sent = json.loads(stand_in_vespa.request_bodies[0])
+    assert sent["presentation.summaryFields"].startswith("family_name,")
+    hits = [hit for family in response.results for hit in family.hits]
+    assert hits and all(hit.family_name for hit in hits)
+    assert all(hit.family_slug is None for hit in hits)
+    assert streamed == list(response.results)
+
+
+@pytest.mark.asyncio
+async def test_vespa_search_adaptor__parses_cbor_responses_alike(stand_in_vespa):
+    cbor2 = pytest.importorskip("cbor2")
+    request = SearchParameters(query_string="the")
+    validated = stand_in_vespa.adaptor().search(request)
+    stand_in_vespa.search_response = cbor2.dumps(
+        json.loads(stand_in_vespa.search_response)
+    )
+
+    adaptor = stand_in_vespa.adaptor(result_format="cbor")
+    response = adaptor.search(request)
+    async with adaptor:
+        async_response = await adaptor.async_search(request)
+
+    sent = json.loads(stand_in_vespa.request_bodies[-1])
+    assert sent["presentation.format"] == "cbor"
+    assert response == validated
+    assert async_response == validated
+
+
+def test_vespa_search_adaptor__closing_a_stream_early_releases_it(stand_in_vespa):
+    governor = RequestGovernor(max_in_flight=1)
+    adaptor = stand_in_vespa.adaptor(governor=governor)
+
+    with adaptor.stream_search(SearchParameters(query_string="the")) as stream:
+        next(iter(stream))
+
+    assert governor.stats.in_flight == 0
+    with pytest.raises(RuntimeError):
+        stream.response
+
+
+def test_vespa_search_adaptor__streamed_failures_raise(stand_in_vespa):
+    stand_in_vespa.status_code = 500
+    governor = RequestGovernor(max_in_flight=1)
+    adaptor = stand_in_vespa.adaptor(governor=governor)
+
+    with pytest.raises(FetchError):
+        adaptor.stream_search(SearchParameters(query_string="the"))
+    assert governor.stats.in_flight == 0
+
+
+@pytest.mark.asyncio
+async def test_vespa_search_adaptor__serves_repeated_queries_from_cache(
+    stand_in_vespa,
+):
+    cache = SearchCache()
+    adaptor = stand_in_vespa.adaptor(cache=cache)
+    request = SearchParameters(query_string="the")
+
+    first = adaptor.search(request)
+    second = adaptor.search(request)
+    async with adaptor:
+        third = await adaptor.async_search(request)
+        await adaptor.async_search(SearchParameters(query_string="other"))
+
+    assert first == second == third
+    assert stand_in_vespa.request_count == 2
+    assert cache.stats.hits == 2
+    assert cache.stats.misses == 2
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__coalesces_identical_in_flight_queries(
+    stand_in_vespa,
+):
+    stand_in_vespa.latency_s = 0.1
+    adaptor = stand_in_vespa.adaptor()
+    request = SearchParameters(query_string="the")
+
+    async with adaptor:
+        responses = await asyncio.gather(
+            *[adaptor.async_search(request) for _ in range(10)],
+            adaptor.async_search(SearchParameters(query_string="other")),
+        )
+
+    assert all(r == responses[0] for r in responses)
+    assert stand_in_vespa.request_count == 2
+    assert adaptor.coalesced_count == 9
+
+
+def test_vespa_search_adaptor__coalesces_identical_in_flight_queries(
+    stand_in_vespa,
+):
+    stand_in_vespa.latency_s = 0.2
+    adaptor = stand_in_vespa.adaptor()
+    requests = [SearchParameters(query_string="the")] * 8
+
+    results = adaptor.search_many(requests, max_concurrency=8)
+
+    assert all(isinstance(r, Ok) for r in results)
+    assert stand_in_vespa.request_count == 1
+    assert adaptor.coalesced_count == 7
+
+
+def test_vespa_search_adaptor__coalescing_can_be_disabled(stand_in_vespa):
+    stand_in_vespa.latency_s = 0.1
+    adaptor = stand_in_vespa.adaptor(coalesce_requests=False)
+
+    adaptor.search_many([SearchParameters(query_string="the")] * 4)
+
+    assert stand_in_vespa.request_count == 4
+    assert adaptor.coalesced_count == 0
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__coalesced_failures_reach_every_caller(
+    stand_in_vespa,
+):
+    stand_in_vespa.latency_s = 0.1
+    stand_in_vespa.status_code = 500
+    adaptor = stand_in_vespa.adaptor()
+    request = SearchParameters(query_string="the")
+
+    async with adaptor:
+        results = await asyncio.gather(
+            *[adaptor.async_search(request) for _ in range(3)],
+            return_exceptions=True,
+        )
+
+    assert all(isinstance(r, FetchError) for r in results)
+    assert adaptor.coalesced_count == 2
+
+
+def test_vespa_search_adaptor__reports_phase_timings(stand_in_vespa):
+    response_json = json.loads(stand_in_vespa.search_response)
+    response_json["timing"] = {
+        "querytime": 0.004,
+        "summaryfetchtime": 0.001,
+        "searchtime": 0.006,
+    }
+    stand_in_vespa.search_response = json.dumps(response_json).encode()
+    adaptor = stand_in_vespa.adaptor()
+
+    response = adaptor.search(SearchParameters(query_string="the"))
+
+    timings = response.timings
+    assert timings is not None
+    phases = [
+        timings.yql_ns,
+        timings.serialise_ns,
+        timings.network_ns,
+        timings.decode_ns,
+        timings.parse_ns,
+    ]
+    assert all(phase is not None and phase > 0 for phase in phases)
+    assert timings.total_ns >= sum(phases)
+    assert timings.vespa_search_time_s == 0.006
+    assert not timings.cache_hit
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__reports_cached_timings(stand_in_vespa):
+    adaptor = stand_in_vespa.adaptor(cache=SearchCache())
+    request = SearchParameters(query_string="the")
+
+    async with adaptor:
+        fresh = await adaptor.async_search(request)
+        cached = await adaptor.async_search(request)
+
+    assert fresh.timings.network_ns is not None
+    assert fresh.timings.vespa_search_time_s is None
+    assert cached.timings.cache_hit
+    assert cached.timings.network_ns is None
+    assert cached.timings.parse_ns is not None
+    assert fresh == cached
+
+
+def test_vespa_search_adaptor__reuses_its_sync_connection(stand_in_vespa):
+    with stand_in_vespa.adaptor() as adaptor:
+        for i in range(3):
+            adaptor.search(SearchParameters(query_string=f"query {i}"))
+
+    assert stand_in_vespa.request_count == 3
+    assert stand_in_vespa.connection_count == 1
+
+
+@pytest.mark.asyncio
+async def test_vespa_search_adaptor__raises_query_error_for_invalid_queries(
+    stand_in_vespa,
+):
+    stand_in_vespa.status_code = 400
+    stand_in_vespa.search_response = json.dumps(
+        {
+            "root": {
+                "errors": [
+                    {
+                        "code": 4,
+                        "summary": "Invalid query parameter",
+                        "message": "Could not parse query",
+                    }
+                ]
+            }
+        }
+    ).encode()
+    adaptor = stand_in_vespa.adaptor()
+    request = SearchParameters(query_string="the")
+
+    with pytest.raises(QueryError):
+        adaptor.search(request)
+    async with adaptor:
+        with pytest.raises(QueryError):
+            await adaptor.async_search(request)
+
+
+class RecordingMiddleware(SearchMiddleware):
+    """Records each hook it's called with in a shared list of calls"""
+
+    def __init__(self, name, calls):
+        self.name = name
+        self.calls = calls
+
+    def before_request(self, context):
+        """Records that the request is about to be sent"""
+        self.calls.append(f"{self.name}.before")
+
+    def after_response(self, context, response):
+        """Records the response, passing it on unchanged"""
+        self.calls.append(f"{self.name}.after")
+        return response
+
+    def on_error(self, context, error):
+        """Records that the request failed"""
+        self.calls.append(f"{self.name}.error")
+
+
+@pytest.mark.asyncio
+async def test_vespa_search_adaptor__runs_middleware_in_order(stand_in_vespa):
+    calls = []
+    adaptor = stand_in_vespa.adaptor(middlewares=[RecordingMiddleware("outer", calls)])
+    adaptor.add_middleware(RecordingMiddleware("inner", calls))
+
+    adaptor.search(SearchParameters(query_string="the"))
+    async with adaptor:
+        await adaptor.async_search(SearchParameters(query_string="the"))
+
+    assert calls == ["outer.before", "inner.before", "inner.after", "outer.after"] * 2
+
+
+def test_vespa_search_adaptor__middleware_can_rewrite_the_request_body(
+    stand_in_vespa,
+):
+    class Rewrite(SearchMiddleware):
+        def before_request(self, context):
+            context.vespa_request_body = {
+                **context.vespa_request_body,
+                "query_string": "rewritten",
+            }
+
+    adaptor = stand_in_vespa.adaptor(middlewares=[Rewrite()])
+
+    adaptor.search(SearchParameters(query_string="the"))
+
+    sent = json.loads(stand_in_vespa.request_bodies[0])
+    assert sent["query_string"] == "rewritten"
+
+
+@pytest.mark.asyncio
+async def test_vespa_search_adaptor__middleware_can_short_circuit(stand_in_vespa):
+    canned = SearchResponse(total_hits=0, results=[])
+    calls = []
+
+    class ShortCircuit(SearchMiddleware):
+        def before_request(self, context):
+            return canned
+
+    adaptor = stand_in_vespa.adaptor(
+        middlewares=[
+            RecordingMiddleware("outer", calls),
+            ShortCircuit(),
+            RecordingMiddleware("skipped", calls),
+        ]
+    )
+
+    assert adaptor.search(SearchParameters(query_string="the")) is canned
+    async with adaptor:
+        response = await adaptor.async_search(SearchParameters(query_string="the"))
+
+    assert response is canned
+    assert stand_in_vespa.request_count == 0
+    assert calls == ["outer.before", "outer.after"] * 2
+
+
+@pytest.mark.asyncio
+async def test_vespa_search_adaptor__middleware_sees_and_can_recover_errors(
+    stand_in_vespa,
+):
+    stand_in_vespa.status_code = 500
+    fallback = SearchResponse(total_hits=0, results=[])
+    histogram = LatencyHistogramMiddleware()
+
+    class Fallback(SearchMiddleware):
+        def on_error(self, context, error):
+            if context.parameters.query_string == "recover":
+                return fallback
+
+    adaptor = stand_in_vespa.adaptor(middlewares=[histogram, Fallback()])
+
+    assert adaptor.search(SearchParameters(query_string="recover")) is fallback
+    with pytest.raises(FetchError):
+        adaptor.search(SearchParameters(query_string="fail"))
+    async with adaptor:
+        with pytest.raises(FetchError):
+            await adaptor.async_search(SearchParameters(query_string="fail"))
+
+    assert histogram.errors == 2
+    assert histogram.count == 1
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__hedges_slow_requests(stand_in_vespa):
+    stand_in_vespa.latencies_s = [1.0]
+    policy = HedgePolicy(delay_s=0.05, max_hedge_rate=1.0)
+    adaptor = stand_in_vespa.adaptor(hedge_policy=policy)
+
+    async with adaptor:
+        start = time.perf_counter()
+        response = await adaptor.async_search(SearchParameters(query_string="the"))
+        elapsed_s = time.perf_counter() - start
+
+    assert elapsed_s < 0.5
+    assert response.timings.hedged
+    assert response.timings.network_ns < 500_000_000
+    assert stand_in_vespa.request_count == 2
+    assert policy.hedges == policy.hedge_wins == 1
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__hedges_within_the_rate_limit(
+    stand_in_vespa,
+):
+    stand_in_vespa.latency_s = 0.1
+    policy = HedgePolicy(delay_s=0.01, max_hedge_rate=0.25)
+    adaptor = stand_in_vespa.adaptor(hedge_policy=policy)
+
+    async with adaptor:
+        for i in range(8):
+            await adaptor.async_search(SearchParameters(query_string=f"query {i}"))
+
+    assert policy.requests == 8
+    assert policy.hedges == 2
+    assert stand_in_vespa.request_count == 10
+
+
+@pytest.mark.asyncio
+async def test_vespa_search_adaptor__retries_retryable_failures(stand_in_vespa):
+    stand_in_vespa.status_codes = [503, 502, 200, 503]
+    retry_policy = RetryPolicy(max_attempts=3, base_delay_s=0.001)
+    adaptor = stand_in_vespa.adaptor(retry_policy=retry_policy)
+
+    adaptor.search(SearchParameters(query_string="the"))
+    async with adaptor:
+        await adaptor.async_search(SearchParameters(query_string="other"))
+
+    assert stand_in_vespa.request_count == 5
+    assert retry_policy.stats == RetryStats(retries=3, exhausted=0)
+
+
+def test_vespa_search_adaptor__never_retries_invalid_queries(stand_in_vespa):
+    stand_in_vespa.status_code = 503
+    stand_in_vespa.search_response = json.dumps(
+        {"root": {"errors": [{"code": 4, "summary": "Invalid query parameter"}]}}
+    ).encode()
+    adaptor = stand_in_vespa.adaptor(retry_policy=RetryPolicy(base_delay_s=0.001))
+
+    with pytest.raises(QueryError):
+        adaptor.search(SearchParameters(query_string="the"))
+
+    assert stand_in_vespa.request_count == 1
+
+
+def test_vespa_search_adaptor__retries_transport_errors_until_exhausted():
+    retry_policy = RetryPolicy(max_attempts=3, base_delay_s=0.001)
+    adaptor = VespaSearchAdapter(
+        instance_url="http://127.0.0.1:9",
+        skip_cert_usage=True,
+        retry_policy=retry_policy,
+    )
+
+    with pytest.raises(httpr.TransportError):
+        adaptor.search(SearchParameters(query_string="the"))
+
+    assert retry_policy.stats == RetryStats(retries=2, exhausted=1)
+
+
+@pytest.mark.asyncio
+async def test_vespa_search_adaptor__fails_fast_while_the_circuit_is_open(
+    stand_in_vespa,
+):
+    stand_in_vespa.status_codes = [500, 500]
+    breaker = CircuitBreaker(window=2, min_requests=2, reset_timeout_s=0.1)
+    adaptor = stand_in_vespa.adaptor(circuit_breaker=breaker)
+    request = SearchParameters(query_string="the")
+
+    for _ in range(2):
+        with pytest.raises(FetchError):
+            adaptor.search(request)
+    with pytest.raises(CircuitOpenError):
+        adaptor.search(request)
+    async with adaptor:
+        with pytest.raises(CircuitOpenError):
+            await adaptor.async_search(request)
+        await asyncio.sleep(0.1)
+        await adaptor.async_search(request)
+
+    assert stand_in_vespa.request_count == 3
+    assert breaker.stats.state == CircuitState.CLOSED
+    assert breaker.stats.opened == 1
+    assert breaker.stats.rejected == 2
+
+
+def routed_adaptor(stand_ins, **kwargs) -> VespaSearchAdapter:
+    return VespaSearchAdapter(
+        instance_url=[stand_in.url for stand_in in stand_ins],
+        skip_cert_usage=True,
+        async_session_kwargs={"http2_only": False},
+        coalesce_requests=False,
+        **kwargs,
+    )
+
+
+def test_vespa_search_adaptor__routes_away_from_slow_endpoints(stand_in_vespas):
+    fast, slower, slowest = stand_in_vespas
+    slower.latency_s = 0.02
+    slowest.latency_s = 0.1
+    adaptor = routed_adaptor(stand_in_vespas, routing_policy=RoutingPolicy(seed=0))
+
+    for i in range(30):
+        adaptor.search(SearchParameters(query_string=f"query {i}"))
+
+    assert fast.request_count > slower.request_count > slowest.request_count > 0
+    assert sum(s.request_count for s in stand_in_vespas) == 30
+    assert all(s.connection_count == 1 for s in stand_in_vespas)
+    assert {stats.url: stats.requests for stats in adaptor.router.stats} == {
+        s.url: s.request_count for s in stand_in_vespas
+    }
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__spreads_concurrent_queries(
+    stand_in_vespas,
+):
+    for stand_in in stand_in_vespas:
+        stand_in.latency_s = 0.05
+    adaptor = routed_adaptor(stand_in_vespas, routing_policy=RoutingPolicy(seed=0))
+
+    async with adaptor:
+        sessions = [await adaptor.get_async_session(s.url) for s in stand_in_vespas]
+        await asyncio.gather(
+            *[
+                adaptor.async_search(SearchParameters(query_string=f"query {i}"))
+                for i in range(9)
+            ]
+        )
+
+    assert len(set(map(id, sessions))) == 3
+    assert [s.request_count for s in stand_in_vespas] == [3, 3, 3]
+    assert all(stats.in_flight == 0 for stats in adaptor.router.stats)
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__doesnt_time_cancelled_queries(
+    stand_in_vespas,
+):
+    for stand_in in stand_in_vespas:
+        stand_in.latency_s = 0.2
+    adaptor = routed_adaptor(stand_in_vespas, routing_policy=RoutingPolicy(seed=0))
+
+    async with adaptor:
+        with pytest.raises(asyncio.TimeoutError):
+            await asyncio.wait_for(
+                adaptor.async_search(SearchParameters(query_string="forest")), 0.05
+            )
+
+    assert all(stats.in_flight == 0 for stats in adaptor.router.stats)
+    assert all(stats.ewma_latency_s is None for stats in adaptor.router.stats)
+    assert all(stats.failures == 0 for stats in adaptor.router.stats)
+
+
+def test_vespa_search_adaptor__ejects_failing_endpoints(stand_in_vespas):
+    failing = stand_in_vespas[0]
+    failing.status_code = 503
+    adaptor = routed_adaptor(
+        stand_in_vespas,
+        routing_policy=RoutingPolicy(failures_to_eject=1, ejection_s=60, seed=0),
+        retry_policy=RetryPolicy(max_attempts=2, base_delay_s=0, max_delay_s=0),
+    )
+
+    for i in range(10):
+        adaptor.search(SearchParameters(query_string=f"query {i}"))
+
+    failing_stats = adaptor.router.stats[0]
+    assert failing.request_count == 1
+    assert failing_stats.ejected and failing_stats.failures == 1
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__waits_for_the_governor(stand_in_vespa):
+    stand_in_vespa.latency_s = 0.03
+    governor = RequestGovernor(max_in_flight=1)
+    adaptor = stand_in_vespa.adaptor(governor=governor, coalesce_requests=False)
+
+    async with adaptor:
+        responses = await asyncio.gather(
+            *[
+                adaptor.async_search(SearchParameters(query_string=f"query {i}"))
+                for i in range(3)
+            ]
+        )
+
+    waits_ns = sorted(response.timings.queue_wait_ns for response in responses)
+    assert waits_ns[0] < 30_000_000 <= waits_ns[1] and waits_ns[2] >= 60_000_000
+    assert all(r.timings.network_ns < r.timings.total_ns for r in responses)
+    assert governor.stats.by_priority[Priority.INTERACTIVE].admitted == 3
+
+
+def test_vespa_search_adaptor__shares_the_default_governor(stand_in_vespa):
+    governor = RequestGovernor(max_in_flight=4)
+    set_default_governor(governor)
+    try:
+        batch = stand_in_vespa.adaptor(priority=Priority.BATCH)
+        interactive = stand_in_vespa.adaptor()
+        batch.search(SearchParameters(query_string="the"))
+        interactive.search(SearchParameters(query_string="the"))
+    finally:
+        set_default_governor(None)
+
+    assert set(governor.stats.by_priority) == {Priority.INTERACTIVE, Priority.BATCH}
+    assert (
+        stand_in_vespa.adaptor()
+        .search(SearchParameters(query_string="the"))
+        .timings.queue_wait_ns
+        is None
+    )
+
+
+def test_vespa_search_adaptor__gives_vespa_the_time_left(stand_in_vespa):
+    cache = SearchCache()
+    adaptor = stand_in_vespa.adaptor(cache=cache)
+    parameters = SearchParameters(query_string="the")
+
+    adaptor.search(parameters, timeout_s=2)
+    response = adaptor.search(parameters)
+
+    body = json.loads(stand_in_vespa.request_bodies[0])
+    assert body["timeout"].endswith("ms") and 1000 < int(body["timeout"][:-2]) < 2000
+    assert body["ranking.softtimeout.enable"] == "true"
+    assert response.timings.cache_hit and stand_in_vespa.request_count == 1
+    with pytest.raises(ValueError):
+        adaptor.search(parameters, timeout_s=0)
+
+
+def test_vespa_search_adaptor__cancels_the_request_at_the_deadline(stand_in_vespa):
+    stand_in_vespa.latency_s = 1.0
+    breaker = CircuitBreaker(window=1, min_requests=1)
+    adaptor = stand_in_vespa.adaptor(circuit_breaker=breaker)
+
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceededError):
+        adaptor.search(SearchParameters(query_string="the"), timeout_s=0.1)
+
+    assert time.perf_counter() - start < 0.5
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_vespa_search_adaptor__settles_a_probe_that_runs_out_of_time(
+    stand_in_vespa,
+):
+    stand_in_vespa.status_codes = [500]
+    breaker = CircuitBreaker(window=1, min_requests=1, reset_timeout_s=0.05)
+    adaptor = stand_in_vespa.adaptor(circuit_breaker=breaker, coalesce_requests=False)
+    request = SearchParameters(query_string="the")
+
+    with pytest.raises(FetchError):
+        adaptor.search(request)
+    time.sleep(0.05)
+    stand_in_vespa.latency_s = 1.0
+    with pytest.raises(DeadlineExceededError):
+        adaptor.search(request, timeout_s=0.1)
+    assert breaker.state == CircuitState.HALF_OPEN
+
+    stand_in_vespa.latency_s = 0.0
+    adaptor.search(request)
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_vespa_search_adaptor__doesnt_retry_past_the_deadline(
+    stand_in_vespa, monkeypatch
+):
+    # Always back off for the longest delay, rather than a jittered one that could
+    # fit inside the deadline
+    monkeypatch.setattr(random, "uniform", lambda low, high: high)
+    stand_in_vespa.status_code = 503
+    retry_policy = RetryPolicy(max_attempts=3, base_delay_s=1.0, max_delay_s=1.0)
+    adaptor = stand_in_vespa.adaptor(retry_policy=retry_policy)
+
+    with pytest.raises(FetchError):
+        adaptor.search(SearchParameters(query_string="the"), timeout_s=0.2)
+
+    assert stand_in_vespa.request_count == 1
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__gives_up_at_the_deadline(stand_in_vespa):
+    stand_in_vespa.latency_s = 0.3
+    governor = RequestGovernor(max_in_flight=1)
+    adaptor = stand_in_vespa.adaptor(governor=governor)
+    parameters = SearchParameters(query_string="the")
+
+    async with adaptor:
+        slow, hurried, waiting = await asyncio.gather(
+            adaptor.async_search(parameters),
+            adaptor.async_search(parameters, timeout_s=0.1),
+            adaptor.async_search(SearchParameters(query_string="other"), timeout_s=0.1),
+            return_exceptions=True,
+        )
+
+    assert isinstance(slow, SearchResponse) and not slow.degraded
+    # The hurried search shared the slow one's request, but didn't wait for it
+    assert isinstance(hurried, DeadlineExceededError)
+    # The waiting search timed out while queued for the governor, so wasn't sent
+    assert isinstance(waiting, DeadlineExceededError)
+    assert stand_in_vespa.request_count == 1
+    assert governor.stats.in_flight == 0 and governor.stats.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__doesnt_share_requests_that_give_up_first(
+    stand_in_vespa,
+):
+    stand_in_vespa.latency_s = 0.2
+    adaptor = stand_in_vespa.adaptor()
+    parameters = SearchParameters(query_string="the")
+
+    async with adaptor:
+        hurried, patient = await asyncio.gather(
+            adaptor.async_search(parameters, timeout_s=0.1),
+            adaptor.async_search(parameters, timeout_s=5),
+            return_exceptions=True,
+        )
+
+    assert isinstance(hurried, DeadlineExceededError)
+    assert isinstance(patient, SearchResponse) and not patient.timings.coalesced
+    assert stand_in_vespa.request_count == 2
+
+
+@pytest.fixture
+def stand_in_vespa_with_documents(stand_in_vespa):
+    for name in ["get_document_response", "get_passage_response"]:
+        with open(f"tests/test_data/search_responses/{name}.json", "rb") as f:
+            document = f.read()
+        stand_in_vespa.documents[json.loads(document)["pathId"]] = document
+    return stand_in_vespa
+
+
+GET_BY_IDS_REQUEST = [
+    "id:doc_search:document_passage::UNFCCC.party.1060.0.3743",
+    "id:doc_search:family_document::CCLW.family.0.0",
+    "id:doc_search:family_document::CCLW.family.11171.0",
+    "not a document id",
+]
+
+
+def assert_get_by_ids_results(results) -> None:
+    assert len(results) == len(GET_BY_IDS_REQUEST)
+    assert isinstance(unwrap_ok(results[0]), Passage)
+    assert isinstance(
+        unwrap_err(results[1]).metadata["exception"], DocumentNotFoundError
+    )
+    assert isinstance(unwrap_ok(results[2]), Document)
+    assert unwrap_ok(results[2]).family_import_id == "CCLW.family.11171.0"
+    assert isinstance(unwrap_err(results[3]).metadata["exception"], ValueError)
+
+
+def test_vespa_search_adaptor__get_by_ids(stand_in_vespa_with_documents):
+    adaptor = stand_in_vespa_with_documents.adaptor()
+    http_client = adaptor.get_sync_http_client()
+
+    results = adaptor.get_by_ids(GET_BY_IDS_REQUEST, max_concurrency=4)
+
+    assert_get_by_ids_results(results)
+    # Batches share the adapter's pooled client, and leave it open for the next
+    assert adaptor.get_sync_http_client() is http_client
+    assert_get_by_ids_results(adaptor.get_by_ids(GET_BY_IDS_REQUEST))
+    with pytest.raises(DocumentNotFoundError):
+        adaptor.get_by_id(GET_BY_IDS_REQUEST[1])
+
+
+@pytest.mark.asyncio
+async def test_vespa_async_search_adaptor__get_by_ids(stand_in_vespa_with_documents):
+    async with stand_in_vespa_with_documents.adaptor() as adaptor:
+        results = await adaptor.async_get_by_ids(GET_BY_IDS_REQUEST, max_concurrency=2)
+        hit = await adaptor.async_get_by_id(GET_BY_IDS_REQUEST[2])
+
+    assert_get_by_ids_results(results)
+    assert hit == unwrap_ok(results[2])
+    assert stand_in_vespa_with_documents.connection_count <= 2
+
+
+@pytest.mark.asyncio
+async def test_async_get_by_ids__defaults_to_get_by_id_in_threads():
+    class FakeAdapter(SlowEchoSearchAdapter):
+        def get_by_id(self, document_id):
+            if document_id == "missing":
+                raise DocumentNotFoundError(document_id)
+            return Hit(document_import_id=document_id)
+
+    results = await FakeAdapter().async_get_by_ids(["a", "missing", "b"])
+
+    assert unwrap_ok(results[0]).document_import_id == "a"
+    assert isinstance(results[1], Err)
+    assert unwrap_ok(results[2]).document_import_id == "b"
+
+
+class PagedSearchAdapter(SlowEchoSearchAdapter):
+    """Serves `n_pages` pages of two families, linked by continuation tokens"""
+
+    def __init__(self, n_pages: int, fail_on_page: int | None = None):
+        super().__init__()
+        self.n_pages = n_pages
+        self.fail_on_page = fail_on_page
+        self.pages_fetched = 0
+
+    def _page(self, parameters: SearchParameters) -> SearchResponse[Family]:
+        tokens = parameters.continuation_tokens or ["A"]
+        page = ord(tokens[0]) - ord("A")
+        if page == self.fail_on_page:
+            raise ValueError(f"page {page} failed")
+        self.pages_fetched += 1
+        is_last = page == self.n_pages - 1
+        return SearchResponse(
+            total_hits=2 * self.n_pages,
+            results=[Family(id=f"family.{page}.{i}", hits=[]) for i in range(2)],
+            continuation_token=None if is_last else chr(ord("A") + page + 1),
+        )
+
+    def search(self, parameters):
+        """Serve the page the continuation tokens point to, after a delay"""
+        time.sleep(self.delay_s)
+        return self._page(parameters)
+
+    async def async_search(self, parameters):
+        """Serve the page the continuation tokens point to, after a delay"""
+        await asyncio.sleep(self.delay_s)
+        return self._page(parameters)
+
+
+EXPECTED_PAGED_FAMILY_IDS = [f"family.{p}.{i}" for p in range(4) for i in range(2)]
+
+
+@pytest.mark.parametrize("prefetch_pages", [0, 1, 3])
+def test_iter_families__follows_continuations(prefetch_pages):
+    adaptor = PagedSearchAdapter(n_pages=4)
+    parameters = SearchParameters(query_string="the")
+
+    families = list(adaptor.iter_families(parameters, prefetch_pages))
+
+    assert [f.id for f in families] == EXPECTED_PAGED_FAMILY_IDS
+    assert parameters.continuation_tokens is None
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("prefetch_pages", [0, 1, 3])
+async def test_aiter_families__follows_continuations(prefetch_pages):
+    adaptor = PagedSearchAdapter(n_pages=4)
+    parameters = SearchParameters(query_string="the")
+
+    families = [f async for f in adaptor.aiter_families(parameters, prefetch_pages)]
+
+    assert [f.id for f in families] == EXPECTED_PAGED_FAMILY_IDS
+
+
+def test_iter_pages__prefetches_a_bounded_number_of_pages():
+    adaptor = PagedSearchAdapter(n_pages=10)
+    pages = adaptor.iter_pages(SearchParameters(query_string="the"), prefetch_pages=2)
+
+    next(pages)
+    time.sleep(0.1)
+    assert adaptor.pages_fetched == 3
+
+    pages.close()
+    time.sleep(0.1)
+    assert adaptor.pages_fetched <= 4
+
+
+@pytest.mark.asyncio
+async def test_aiter_pages__prefetches_a_bounded_number_of_pages():
+    adaptor = PagedSearchAdapter(n_pages=10)
+    pages = adaptor.aiter_pages(SearchParameters(query_string="the"), prefetch_pages=2)
+
+    await anext(pages)
+    await asyncio.sleep(0.1)
+    assert adaptor.pages_fetched == 3
+
+    await pages.aclose()
+    await asyncio.sleep(0.1)
+    assert adaptor.pages_fetched == 3
+
+
+def test_iter_families__raises_errors_from_later_pages():
+    adaptor = PagedSearchAdapter(n_pages=4, fail_on_page=2)
+    families = adaptor.iter_families(SearchParameters(query_string="the"))
+
+    assert [next(families).id for _ in range(4)] == EXPECTED_PAGED_FAMILY_IDS[:4]
+    with pytest.raises(ValueError, match="page 2 failed"):
+        next(families)
+
+
+@pytest.mark.asyncio
+async def test_aiter_families__raises_errors_from_later_pages():
+    adaptor = PagedSearchAdapter(n_pages=4, fail_on_page=1)
+
+    with pytest.raises(ValueError, match="page 1 failed"):
+        async for _ in adaptor.aiter_families(SearchParameters(query_string="the")):
+            pass
+
+
+class PassagePagedSearchAdapter(SlowEchoSearchAdapter):
+    """
+    Serves one page of families, each with pages of two passages
+
+    Passage continuation tokens are two letters: the family's index, and the page.
+    """
+
+    def __init__(self, passages_per_family: list[int], failing_family: int = -1):
+        super().__init__(delay_s=0.001)
+        self.passages_per_family = passages_per_family
+        self.failing_family = failing_family
+        self.requested_tokens: list[list[str]] = []
+
+    def _family(self, index: int, page: int) -> Family:
+        n_passages = self.passages_per_family[index]
+        hits = [
+            Hit(document_import_id=f"{index}.{i}")
+            for i in range(page * 2, min(page * 2 + 2, n_passages))
+        ]
+        has_next = (page + 1) * 2 < n_passages
+        return Family(
+            id=f"family.{index}",
+            hits=hits,
+            total_passage_hits=n_passages,
+            continuation_token=chr(65 + index) + chr(66 + page) if has_next else None,
+        )
+
+    def _page(self, parameters: SearchParameters) -> SearchResponse[Family]:
+        tokens = list(parameters.continuation_tokens or [])
+        self.requested_tokens.append(tokens)
+        pages = [0] * len(self.passages_per_family)
+        if tokens:
+            assert tokens[0] == "THIS"
+            passage_token = tokens[1]
+            if ord(passage_token[0]) - 65 == self.failing_family:
+                raise ValueError(f"family {self.failing_family} failed")
+            pages[ord(passage_token[0]) - 65] = ord(passage_token[1]) - 65
+        return SearchResponse(
+            total_hits=sum(self.passages_per_family),
+            results=[self._family(i, p) for i, p in enumerate(pages)],
+            this_continuation_token="THIS",
+        )
+
+    def search(self, parameters):
+        """Returns the page of families the query's continuations point to"""
+        return self._page(parameters)
+
+    async def async_search(self, parameters):
+        """Returns the same page as `search`, after a delay"""
+        await asyncio.sleep(self.delay_s)
+        return self._page(parameters)
+
+
+def test_iter_family_hits__follows_passage_continuations():
+    adaptor = PassagePagedSearchAdapter([5, 1])
+    parameters = SearchParameters(query_string="the")
+    response = adaptor.search(parameters)
+
+    hits = list(adaptor.iter_family_hits(parameters, response, "family.0"))
+
+    assert [h.document_import_id for h in hits] == [f"0.{i}" for i in range(5)]
+    assert adaptor.requested_tokens == [[], ["THIS", "AB"], ["THIS", "AC"]]
+    with pytest.raises(ValueError):
+        list(adaptor.iter_family_hits(parameters, response, "family.missing"))
+
+
+@pytest.mark.asyncio
+async def test_aiter_family_hits__follows_passage_continuations():
+    adaptor = PassagePagedSearchAdapter([1, 4])
+    parameters = SearchParameters(query_string="the")
+    response = await adaptor.async_search(parameters)
+
+    hits = [
+        h async for h in adaptor.aiter_family_hits(parameters, response, "family.1")
+    ]
+
+    assert [h.document_import_id for h in hits] == [f"1.{i}" for i in range(4)]
+
+
+def test_get_all_family_hits__walks_every_family():
+    adaptor = PassagePagedSearchAdapter([5, 1, 3], failing_family=2)
+    parameters = SearchParameters(query_string="the")
+    response = adaptor.search(parameters)
+
+    results = adaptor.get_all_family_hits(parameters, response, max_concurrency=2)
+
+    assert list(results) == ["family.0", "family.1", "family.2"]
+    assert len(unwrap_ok(results["family.0"])) == 5
+    assert len(unwrap_ok(results["family.1"])) == 1
+    assert "family 2 failed" in unwrap_err(results["family.2"]).msg
+
+
+@pytest.mark.asyncio
+async def test_async_get_all_family_hits__walks_every_family():
+    adaptor = PassagePagedSearchAdapter([6, 2, 3])
+    parameters = SearchParameters(query_string="the")
+    response = await adaptor.async_search(parameters)
+
+    results = await adaptor.async_get_all_family_hits(parameters, response)
+
+    assert {k: len(unwrap_ok(v)) for k, v in results.items()} == {
+        "family.0": 6,
+        "family.1": 2,
+        "family.2": 3,
+    }
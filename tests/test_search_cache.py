@@ -0,0 +1,121 @@
+import json
+import time
+
+import pytest
+from vespa.io import VespaQueryResponse
+
+from cpr_sdk.models.search import SearchParameters
+from cpr_sdk.search_cache import (
+    DiskCacheBackend,
+    InMemoryCacheBackend,
+    SearchCache,
+    is_cacheable,
+    request_cache_key,
+)
+from cpr_sdk.vespa import build_vespa_request_body, parse_vespa_response
+
+
+@pytest.fixture
+def search_response_json():
+    with open("tests/test_data/search_responses/search_response.json") as f:
+        return json.load(f)
+
+
+def test_request_cache_key_is_canonical():
+    body = build_vespa_request_body(SearchParameters(query_string="forest fires"))
+    reordered = dict(reversed(list(body.items())))
+
+    assert request_cache_key(body) == request_cache_key(reordered)
+    assert request_cache_key(body) != request_cache_key(
+        build_vespa_request_body(SearchParameters(query_string="forest"))
+    )
+
+
+def test_in_memory_backend_evicts_least_recently_used():
+    backend = InMemoryCacheBackend(max_entries=2)
+    backend.set("a", {"a": 1}, ttl_s=None)
+    backend.set("b", {"b": 1}, ttl_s=None)
+    assert backend.get("a") == {"a": 1}
+
+    backend.set("c", {"c": 1}, ttl_s=None)
+
+    assert backend.get("b") is None
+    assert backend.get("a") == {"a": 1}
+    assert backend.get("c") == {"c": 1}
+    assert backend.evictions == 1
+
+
+def test_in_memory_backend_expires_entries():
+    backend = InMemoryCacheBackend()
+    backend.set("a", {"a": 1}, ttl_s=0.01)
+    time.sleep(0.02)
+
+    assert backend.get("a") is None
+    assert backend.evictions == 1
+    assert len(backend) == 0
+
+
+def test_disk_backend_persists_and_evicts(tmp_path):
+    path = tmp_path / "cache.sqlite"
+    backend = DiskCacheBackend(path, max_entries=2)
+    backend.set("a", {"a": [1, 2]}, ttl_s=None)
+    backend.set("b", {"b": 1}, ttl_s=None)
+    backend.set("c", {"c": 1}, ttl_s=None)
+    backend.close()
+
+    reopened = DiskCacheBackend(path, max_entries=3)
+    assert reopened.get("a") is None
+    assert reopened.get("b") == {"b": 1}
+    assert reopened.get("c") == {"c": 1}
+
+    reopened.set("d", {"d": 1}, ttl_s=-1)
+    assert reopened.get("d") is None
+    assert reopened.evictions == 1
+
+
+def test_search_cache_counts_hits_and_misses(search_response_json):
+    cache = SearchCache(InMemoryCacheBackend(max_entries=1))
+    body = build_vespa_request_body(SearchParameters(query_string="forest fires"))
+    response = VespaQueryResponse(json=search_response_json, status_code=200, url="")
+
+    assert cache.get(body) is None
+    cache.set(body, response)
+    assert cache.get(body) == search_response_json
+    cache.set({"yql": "other"}, response)
+
+    assert cache.stats.hits == 1
+    assert cache.stats.misses == 1
+    assert cache.stats.evictions == 1
+    assert cache.stats.hit_rate == 0.5
+
+
+@pytest.mark.parametrize(
+    "response_json,status_code,expected",
+    [
+        ({"root": {"fields": {"totalCount": 0}}}, 200, True),
+        ({"root": {"errors": [{"code": 12}]}}, 200, False),
+        ({"root": {"coverage": {"degraded": {"timeout": True}}}}, 200, False),
+        (
+            {
+                "root": {
+                    "coverage": {
+                        "degraded": {
+                            "match-phase": False,
+                            "timeout": False,
+                            "adaptive-timeout": False,
+                            "non-ideal-state": False,
+                        }
+                    }
+                }
+            },
+            200,
+            True,
+        ),
+        ({"root": {}}, 500, False),
+    ],
+)
+def test_is_cacheable(response_json, status_code, expected):
+    response = VespaQueryResponse(json=response_json, status_code=status_code, url="")
+    assert is_cacheable(response) == expected
+    if status_code == 200 and not response_json["root"].get("errors"):
+        assert parse_vespa_response(response).degraded != expected
@@ -0,0 +1,152 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from cpr_sdk.search_governor import (
+    Priority,
+    RequestGovernor,
+    get_default_governor,
+    set_default_governor,
+)
+
+
+def wait_for_waiting(governor: RequestGovernor, waiting: int) -> None:
+    deadline = time.monotonic() + 2
+    while governor.stats.waiting != waiting:
+        assert time.monotonic() < deadline, "timed out waiting for the queue"
+        time.sleep(0.001)
+
+
+def test_governor_limits_requests_in_flight():
+    governor = RequestGovernor(max_in_flight=2)
+    in_flight = []
+    lock = threading.Lock()
+    current = 0
+
+    def request():
+        nonlocal current
+        governor.acquire()
+        with lock:
+            current += 1
+            in_flight.append(current)
+        time.sleep(0.02)
+        with lock:
+            current -= 1
+        governor.release()
+
+    threads = [threading.Thread(target=request) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert max(in_flight) == 2
+    stats = governor.stats
+    assert stats.in_flight == 0 and stats.waiting == 0
+    assert stats.by_priority[Priority.INTERACTIVE].admitted == 6
+    assert stats.by_priority[Priority.INTERACTIVE].max_wait_s >= 0.02
+
+
+def test_governor_limits_the_request_rate():
+    governor = RequestGovernor(max_qps=50, burst=2)
+
+    start = time.perf_counter()
+    for _ in range(6):
+        governor.acquire()
+        governor.release()
+
+    # Two go straight away from the burst, then one every 20ms
+    assert time.perf_counter() - start >= 0.075
+
+
+def test_governor_admits_higher_priorities_first():
+    governor = RequestGovernor(max_in_flight=1)
+    governor.acquire()
+    admitted = []
+
+    def request(priority):
+        governor.acquire(priority)
+        admitted.append(priority)
+        governor.release()
+
+    threads = []
+    for waiting, priority in enumerate([Priority.BATCH, Priority.INTERACTIVE], 1):
+        threads.append(threading.Thread(target=request, args=(priority,)))
+        threads[-1].start()
+        wait_for_waiting(governor, waiting)
+    governor.release()
+    for thread in threads:
+        thread.join()
+
+    assert admitted == [Priority.INTERACTIVE, Priority.BATCH]
+    assert set(governor.stats.by_priority) == {Priority.INTERACTIVE, Priority.BATCH}
+
+
+@pytest.mark.asyncio
+async def test_governor_queues_async_requests_and_forgets_cancelled_ones():
+    governor = RequestGovernor(max_in_flight=1)
+    await governor.aacquire()
+
+    cancelled = asyncio.ensure_future(governor.aacquire())
+    waiting = asyncio.ensure_future(governor.aacquire(Priority.BATCH))
+    await asyncio.sleep(0.01)
+    assert governor.stats.waiting == 2
+
+    cancelled.cancel()
+    await asyncio.sleep(0)
+    assert governor.stats.waiting == 1
+
+    governor.release()
+    wait_ns = await asyncio.wait_for(waiting, 1)
+    governor.release()
+
+    assert wait_ns > 0
+    assert governor.stats.in_flight == 0 and governor.stats.waiting == 0
+
+
+@pytest.mark.asyncio
+async def test_governor_rate_limits_across_threads_and_event_loops():
+    governor = RequestGovernor(max_qps=100, burst=1)
+    results = []
+
+    def other_loop():
+        async def requests():
+            for _ in range(3):
+                await governor.aacquire()
+                governor.release()
+
+        asyncio.run(requests())
+        results.append("other loop")
+
+    thread = threading.Thread(target=other_loop)
+    start = time.perf_counter()
+    thread.start()
+    for _ in range(3):
+        await governor.aacquire()
+        governor.release()
+    await asyncio.to_thread(thread.join)
+
+    assert results == ["other loop"]
+    assert time.perf_counter() - start >= 0.045
+    assert governor.stats.by_priority[Priority.INTERACTIVE].admitted == 6
+
+
+def test_default_governor():
+    governor = RequestGovernor(max_in_flight=1)
+    assert get_default_governor() is None
+
+    set_default_governor(governor)
+    try:
+        assert get_default_governor() is governor
+    finally:
+        set_default_governor(None)
+
+
+@pytest.mark.parametrize(
+    "kwargs", [{"max_qps": 0}, {"max_in_flight": 0}, {"max_qps": 1, "burst": 0}]
+)
+def test_governor_validates_limits(kwargs):
+    with pytest.raises(ValueError):
+        RequestGovernor(**kwargs)
@@ -0,0 +1,69 @@
+import pytest
+
+from cpr_sdk.search_hedging import HedgePolicy
+
+
+def test_hedge_policy__uses_a_fixed_delay():
+    policy = HedgePolicy(delay_s=0.2)
+
+    assert policy.hedge_delay() == 0.2
+
+
+def test_hedge_policy__switches_to_the_percentile_once_there_are_enough_samples():
+    policy = HedgePolicy(delay_s=1.0, percentile=90, min_samples=10)
+
+    for latency_s in range(1, 10):
+        policy.record(latency_s / 100)
+    assert policy.hedge_delay() == 1.0
+
+    policy.record(0.1)
+    assert policy.hedge_delay() == 0.09
+
+
+def test_hedge_policy__without_a_delay_waits_for_samples():
+    policy = HedgePolicy(percentile=50, min_samples=2)
+    assert policy.hedge_delay() is None
+
+    policy.record(0.1)
+    policy.record(0.3)
+    assert policy.hedge_delay() == 0.1
+
+
+def test_hedge_policy__caps_the_hedge_rate_over_the_window():
+    policy = HedgePolicy(delay_s=0.0, max_hedge_rate=0.5, window=100)
+
+    allowed = []
+    for _ in range(6):
+        policy.start_request()
+        allowed.append(policy.try_hedge())
+
+    assert allowed == [False, True, False, True, False, True]
+    assert policy.hedges == 3
+    assert policy.hedge_rate == 0.5
+
+
+def test_hedge_policy__forgets_hedges_that_leave_the_window():
+    policy = HedgePolicy(delay_s=0.0, max_hedge_rate=0.5, window=4)
+    policy.start_request()
+    policy.start_request()
+    assert policy.try_hedge()
+
+    for _ in range(4):
+        policy.start_request()
+
+    assert policy.hedge_rate == 0.0
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {},
+        {"delay_s": -1},
+        {"percentile": 100},
+        {"delay_s": 0.1, "max_hedge_rate": 1.5},
+        {"delay_s": 0.1, "window": 0},
+    ],
+)
+def test_hedge_policy__rejects_invalid_settings(kwargs):
+    with pytest.raises(ValueError):
+        HedgePolicy(**kwargs)
@@ -0,0 +1,56 @@
+import logging
+
+import pytest
+
+from cpr_sdk.models.search import SearchParameters, SearchResponse
+from cpr_sdk.search_middleware import (
+    LatencyHistogramMiddleware,
+    SearchContext,
+    SlowQueryLogMiddleware,
+)
+
+
+def test_latency_histogram__buckets_latencies():
+    histogram = LatencyHistogramMiddleware(buckets_ms=[10, 100])
+
+    for latency_ms in [1, 5, 10, 50, 500]:
+        histogram.observe(latency_ms)
+
+    assert histogram.counts == [3, 1, 1]
+    assert histogram.count == 5
+    assert histogram.sum_ms == 566
+
+
+def test_latency_histogram__estimates_quantiles():
+    histogram = LatencyHistogramMiddleware(buckets_ms=[10, 100])
+    assert histogram.quantile(0.5) is None
+
+    for latency_ms in [1] * 90 + [50] * 9 + [500]:
+        histogram.observe(latency_ms)
+
+    assert histogram.quantile(0.5) == 10
+    assert histogram.quantile(0.95) == 100
+    assert histogram.quantile(1.0) == float("inf")
+
+
+@pytest.mark.parametrize("buckets_ms", [[], [100, 10]])
+def test_latency_histogram__rejects_invalid_buckets(buckets_ms):
+    with pytest.raises(ValueError):
+        LatencyHistogramMiddleware(buckets_ms=buckets_ms)
+
+
+def test_slow_query_log__only_logs_slow_searches(caplog):
+    middleware = SlowQueryLogMiddleware(threshold_ms=50)
+    response = SearchResponse(total_hits=0, results=[])
+    fast = SearchContext(parameters=SearchParameters(query_string="fast"))
+    slow = SearchContext(
+        parameters=SearchParameters(query_string="slow"),
+        started_ns=fast.started_ns - 100_000_000,
+    )
+
+    with caplog.at_level(logging.WARNING):
+        middleware.after_response(fast, response)
+        middleware.after_response(slow, response)
+
+    assert len(caplog.records) == 1
+    assert "'slow'" in caplog.records[0].getMessage()
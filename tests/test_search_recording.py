@@ -0,0 +1,149 @@
+import time
+
+import pytest
+from vespa.io import VespaQueryResponse
+
+from cpr_sdk.exceptions import DeadlineExceededError, RecordingNotFoundError
+from cpr_sdk.models.search import SearchParameters
+from cpr_sdk.result import Err
+from cpr_sdk.search_cache import SearchCache
+from cpr_sdk.search_recording import (
+    RecordingSearchAdapter,
+    RecordingStore,
+    ReplaySearchAdapter,
+)
+from cpr_sdk.vespa import build_vespa_request_body
+
+
+def record(stand_in_vespa, store: RecordingStore, **kwargs) -> RecordingSearchAdapter:
+    return RecordingSearchAdapter(
+        stand_in_vespa.url,
+        store,
+        skip_cert_usage=True,
+        async_session_kwargs={"http2_only": False},
+        **kwargs,
+    )
+
+
+def test_recording_store_persists_responses_and_latencies(tmp_path):
+    path = tmp_path / "recording.sqlite"
+    store = RecordingStore(path)
+    body = build_vespa_request_body(SearchParameters(query_string="forest"))
+    store.record(body, VespaQueryResponse({"root": {}}, 200, ""), latency_s=0.1)
+    store.record(body, VespaQueryResponse({"root": {"a": 1}}, 200, ""), latency_s=0.2)
+    store.close()
+
+    reopened = RecordingStore(path)
+    assert len(reopened) == 1
+    recorded = reopened.get(body)
+    assert recorded is not None
+    assert recorded.content == b'{"root":{"a":1}}'
+    assert recorded.status_code == 200
+    assert list(reopened.request_bodies()) == [body]
+    assert reopened.latencies_s() == [0.1, 0.2]
+    assert (
+        reopened.get(build_vespa_request_body(SearchParameters(query_string="x")))
+        is None
+    )
+
+
+@pytest.mark.asyncio
+async def test_replay_matches_recorded_searches(stand_in_vespa, tmp_path):
+    store = RecordingStore(tmp_path / "recording.sqlite")
+    recorder = record(stand_in_vespa, store)
+    requests = [SearchParameters(query_string=f"query {i}") for i in range(3)]
+    recorded = [recorder.search(request) for request in requests]
+    async with recorder:
+        recorded.append(await recorder.async_search(requests[0]))
+
+    replay = ReplaySearchAdapter(store, latency_scale=0)
+
+    assert len(store) == 3
+    assert stand_in_vespa.request_count == 4
+    assert [replay.search(request) for request in requests] == recorded[:3]
+    assert await replay.async_search(requests[0]) == recorded[3]
+    assert replay.search(requests[0]).timings.decode_ns > 0
+
+
+def test_replay_streams_recorded_searches(stand_in_vespa, tmp_path):
+    store = RecordingStore(tmp_path / "recording.sqlite")
+    request = SearchParameters(query_string="forest")
+    recorded = record(stand_in_vespa, store).search(request)
+
+    with ReplaySearchAdapter(store, latency_scale=0).stream_search(request) as stream:
+        families = list(stream)
+
+    assert families == list(recorded.results)
+    assert stream.response.total_hits == recorded.total_hits
+
+
+def test_recording_skips_cached_responses(stand_in_vespa, tmp_path):
+    store = RecordingStore(tmp_path / "recording.sqlite")
+    recorder = record(stand_in_vespa, store, cache=SearchCache())
+    request = SearchParameters(query_string="forest")
+
+    recorder.search(request)
+    recorder.search(request)
+
+    assert stand_in_vespa.request_count == 1
+    assert len(store.latencies_s()) == 1
+
+
+def test_replay_misses_deadlines_shorter_than_its_latency(tmp_path):
+    store = RecordingStore(tmp_path / "recording.sqlite")
+    body = build_vespa_request_body(SearchParameters(query_string="forest"))
+    store.record(body, VespaQueryResponse({"root": {}}, 200, ""), latency_s=0.05)
+    replay = ReplaySearchAdapter(store, fixed_latency_s=0.2)
+
+    start = time.perf_counter()
+    with pytest.raises(DeadlineExceededError):
+        replay.search(SearchParameters(query_string="forest"), timeout_s=0.05)
+    assert time.perf_counter() - start < 0.15
+    assert replay.search(SearchParameters(query_string="forest"), timeout_s=1)
+
+
+def test_replay_draws_latencies_from_the_recording(tmp_path):
+    store = RecordingStore(tmp_path / "recording.sqlite")
+    body = build_vespa_request_body(SearchParameters(query_string="forest"))
+    store.record(body, VespaQueryResponse({"root": {}}, 200, ""), latency_s=0.05)
+
+    replay = ReplaySearchAdapter(store)
+    start = time.perf_counter()
+    response = replay.search(SearchParameters(query_string="forest"))
+    assert time.perf_counter() - start >= 0.05
+    assert response.timings.network_ns >= 50_000_000
+
+    assert ReplaySearchAdapter(store, latency_scale=2)._latency_s() == 0.1
+    for latency_s in [0.01, 0.02, 0.03]:
+        store.record(body, VespaQueryResponse({"root": {}}, 200, ""), latency_s)
+    first, second = (ReplaySearchAdapter(store, seed=1) for _ in range(2))
+    assert [first._latency_s() for _ in range(10)] == [
+        second._latency_s() for _ in range(10)
+    ]
+    assert ReplaySearchAdapter(store, fixed_latency_s=0.01)._latency_s() == 0.01
+    assert (
+        ReplaySearchAdapter(RecordingStore(tmp_path / "empty.sqlite"))._latency_s() == 0
+    )
+
+
+def test_replay_raises_for_unrecorded_requests(tmp_path):
+    replay = ReplaySearchAdapter(RecordingStore(tmp_path / "recording.sqlite"))
+
+    with pytest.raises(RecordingNotFoundError):
+        replay.search(SearchParameters(query_string="forest"))
+    with pytest.raises(RecordingNotFoundError):
+        replay.get_by_id("id:doc_search:family_document::CCLW.executive.1.0")
+    assert isinstance(
+        replay.get_by_ids(["id:doc_search:family_document::CCLW.executive.1.0"])[0],
+        Err,
+    )
+
+
+@pytest.mark.asyncio
+async def test_replay_raises_for_unrecorded_document_fetches(tmp_path):
+    replay = ReplaySearchAdapter(RecordingStore(tmp_path / "recording.sqlite"))
+    document_id = "id:doc_search:family_document::CCLW.executive.1.0"
+
+    with pytest.raises(RecordingNotFoundError):
+        await replay.async_get_by_id(document_id)
+    assert isinstance((await replay.async_get_by_ids([document_id]))[0], Err)
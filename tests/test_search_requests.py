@@ -2,7 +2,11 @@ import pytest
 from pydantic import ValidationError
 
 from cpr_sdk.models.search import Filters, SearchParameters, sort_fields, sort_orders
-from cpr_sdk.vespa import build_vespa_request_body
+from cpr_sdk.vespa import (
+    build_vespa_request_body,
+    summary_field_projection,
+    with_vespa_timeout,
+)
 
 
 @pytest.mark.parametrize(
@@ -38,6 +42,44 @@ def test_build_vespa_request_body__all():
     assert not body.get("ranking.profile")
 
 
+def test_with_vespa_timeout():
+    body = build_vespa_request_body(SearchParameters(query_string="the"))
+
+    timed_body = with_vespa_timeout(body, 1.2345)
+
+    assert timed_body["timeout"] == "1234ms"
+    assert timed_body["ranking.softtimeout.enable"] == "true"
+    assert body["timeout"] == "20"
+    assert with_vespa_timeout(body, 0.0001)["timeout"] == "1ms"
+
+
+def test_build_vespa_request_body__summary_fields():
+    body = build_vespa_request_body(SearchParameters(query_string="the"))
+    assert "presentation.summaryFields" not in body
+    assert summary_field_projection(body) is None
+
+    params = SearchParameters(
+        query_string="the", summary_fields=["family_name", "document_import_id"]
+    )
+    body = build_vespa_request_body(params)
+
+    assert body["presentation.summaryFields"] == (
+        "document_import_id,family_name,text_block,text_block_id,text_block_type"
+    )
+    assert summary_field_projection(body) >= {"family_name", "sddocname"}
+
+
+def test_build_vespa_request_body__result_format():
+    params = SearchParameters(query_string="the")
+    assert "presentation.format" not in build_vespa_request_body(params)
+    with pytest.raises(ValueError):
+        build_vespa_request_body(params, result_format="xml")
+
+    pytest.importorskip("cbor2")
+    body = build_vespa_request_body(params, result_format="cbor")
+    assert body["presentation.format"] == "cbor"
+
+
 def test_whether_an_empty_query_string_does_all_result_search():
     params = SearchParameters(query_string="")
     assert params.all_results
@@ -159,6 +201,19 @@ def test_whether_an_invalid_sort_field_raises_a_validation_error():
     assert "sort_by must be one of" in str(excinfo.value)
 
 
+@pytest.mark.parametrize("summary_class", ["search_summary; drop", "", "a b"])
+def test_whether_an_invalid_summary_class_raises_a_validation_error(summary_class):
+    with pytest.raises(ValidationError) as excinfo:
+        SearchParameters(query_string="test", summary_class=summary_class)
+    assert "Invalid summary class" in str(excinfo.value)
+
+
+def test_whether_an_invalid_summary_field_raises_a_validation_error():
+    with pytest.raises(ValidationError) as excinfo:
+        SearchParameters(query_string="test", summary_fields=["text_block", "nope"])
+    assert "Invalid summary fields: ['nope']" in str(excinfo.value)
+
+
 @pytest.mark.parametrize("order", sort_orders.keys())
 def test_whether_valid_sort_orders_are_accepted(order):
     params = SearchParameters(query_string="test", sort_order=order)
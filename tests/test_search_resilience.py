@@ -0,0 +1,149 @@
+import time
+
+import httpr
+import pytest
+from vespa.io import VespaQueryResponse
+
+from cpr_sdk.search_resilience import (
+    CircuitBreaker,
+    CircuitState,
+    RetryPolicy,
+    RetryStats,
+)
+
+
+def response(status_code, errors=None):
+    root = {"errors": errors} if errors else {}
+    return VespaQueryResponse(json={"root": root}, status_code=status_code, url="")
+
+
+def test_retry_policy__backs_off_exponentially_up_to_the_cap():
+    policy = RetryPolicy(max_attempts=10, base_delay_s=0.1, max_delay_s=0.5)
+
+    for attempt, cap in enumerate([0.1, 0.2, 0.4, 0.5, 0.5]):
+        delays = [policy.next_delay(attempt, retryable=True) for _ in range(50)]
+        assert all(0 <= delay <= cap for delay in delays)
+
+
+def test_retry_policy__stops_after_max_attempts():
+    policy = RetryPolicy(max_attempts=2)
+
+    assert policy.next_delay(0, retryable=True) is not None
+    assert policy.next_delay(1, retryable=True) is None
+    assert policy.next_delay(0, retryable=False) is None
+    assert policy.stats == RetryStats(retries=1, exhausted=1)
+
+
+def test_retry_policy__decides_what_is_retryable():
+    policy = RetryPolicy()
+
+    assert policy.is_retryable_response(response(503))
+    assert policy.is_retryable_response(response(504, [{"code": 12}]))
+    assert not policy.is_retryable_response(response(500))
+    assert not policy.is_retryable_response(response(400, [{"code": 4}]))
+    assert not policy.is_retryable_response(response(503, [{"code": 4}]))
+    assert policy.is_retryable_error(httpr.ConnectError("refused"))
+    assert not policy.is_retryable_error(ValueError())
+
+
+def test_circuit_breaker__opens_at_the_failure_rate():
+    breaker = CircuitBreaker(failure_rate_threshold=0.5, window=4, min_requests=4)
+
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_success()
+    assert breaker.state == CircuitState.CLOSED
+
+    breaker.record_failure()
+    assert breaker.state == CircuitState.OPEN
+    assert not breaker.allow_request()
+    assert breaker.stats.rejected == 1
+
+
+def test_circuit_breaker__probes_after_the_reset_timeout():
+    breaker = CircuitBreaker(window=1, min_requests=1, reset_timeout_s=0.05)
+    breaker.record_failure(breaker.allow_request())
+    time.sleep(0.05)
+
+    assert breaker.state == CircuitState.HALF_OPEN
+    probe = breaker.allow_request()
+    assert probe is not None and probe.probe
+    assert not breaker.allow_request()
+
+    breaker.record_failure(probe)
+    assert breaker.state == CircuitState.OPEN
+    time.sleep(0.05)
+    probe = breaker.allow_request()
+    assert probe
+
+    breaker.record_success(probe)
+    assert breaker.state == CircuitState.CLOSED
+    assert breaker.stats.opened == 2
+    assert breaker.stats.failure_rate == 0.0
+
+
+def test_circuit_breaker__lets_another_probe_through_once_one_is_released():
+    breaker = CircuitBreaker(window=1, min_requests=1, reset_timeout_s=0.05)
+    breaker.record_failure(breaker.allow_request())
+    time.sleep(0.05)
+
+    released = breaker.allow_request()
+    breaker.release_probe(released)
+    assert breaker.state == CircuitState.HALF_OPEN
+    probe = breaker.allow_request()
+    assert probe
+    assert not breaker.allow_request()
+
+    # The released probe no longer counts, however it ends
+    breaker.record_success(released)
+    assert breaker.state == CircuitState.HALF_OPEN
+    breaker.record_success(probe)
+    breaker.release_probe(probe)
+    assert breaker.state == CircuitState.CLOSED
+
+
+def test_circuit_breaker__ignores_stale_outcomes_while_open():
+    breaker = CircuitBreaker(window=2, min_requests=2, reset_timeout_s=0.1)
+    stale = [breaker.allow_request() for _ in range(4)]
+    breaker.record_failure(stale[0])
+    breaker.record_failure(stale[1])
+    assert breaker.state == CircuitState.OPEN
+
+    # Requests sent before it opened neither close it nor push back the reset
+    time.sleep(0.06)
+    breaker.record_success(stale[2])
+    assert breaker.state == CircuitState.OPEN
+    breaker.record_failure(stale[3])
+    time.sleep(0.06)
+
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.stats.opened == 1
+
+
+def test_circuit_breaker__only_the_probe_closes_it():
+    breaker = CircuitBreaker(window=1, min_requests=1, reset_timeout_s=0.05)
+    stale = breaker.allow_request()
+    breaker.record_failure(breaker.allow_request())
+    time.sleep(0.05)
+    probe = breaker.allow_request()
+
+    breaker.record_success(stale)
+    breaker.record_failure(stale)
+    assert breaker.state == CircuitState.HALF_OPEN
+    assert breaker.stats.opened == 1
+
+    breaker.record_success(probe)
+    assert breaker.state == CircuitState.CLOSED
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [
+        {"failure_rate_threshold": 0},
+        {"window": 5, "min_requests": 6},
+        {"min_requests": 0},
+    ],
+)
+def test_circuit_breaker__rejects_invalid_settings(kwargs):
+    with pytest.raises(ValueError):
+        CircuitBreaker(**kwargs)
@@ -1,16 +1,30 @@
 from datetime import datetime
 from cpr_sdk.result import Error, Ok, Err
+import copy
 import json
+import pickle
 
 import pytest
 from cpr_sdk.exceptions import FetchError
+from cpr_sdk.models import search as search_models
 from cpr_sdk.models.search import (
     Hit,
+    LazyList,
+    SharedFamilyFields,
+    construct_without_validation,
     extract_schema_name,
     SCHEMA_NAME_FIELD_NAME,
 )
-from cpr_sdk.vespa import parse_vespa_response, split_document_id
-from cpr_sdk.models.search import Passage
+from cpr_sdk.vespa import (
+    build_vespa_request_body,
+    decode_vespa_response,
+    encode_vespa_request_body,
+    parse_vespa_response,
+    split_document_id,
+    summary_field_projection,
+)
+from cpr_sdk.models.search import Passage, SearchParameters
+from cpr_sdk.search_streaming import SearchResponseStream
 from vespa.io import VespaResponse
 
 
@@ -73,6 +87,330 @@ def test_whether_continuation_token_is_returned_when_present(
     assert response.prev_continuation_token
 
 
+def test_whether_a_decoded_response_parses_like_the_original(
+    valid_vespa_search_response,
+):
+    content = encode_vespa_request_body(valid_vespa_search_response.json)
+    decoded = decode_vespa_response(content, status_code=200, url="")
+
+    assert decoded.json == valid_vespa_search_response.json
+    assert parse_vespa_response(decoded) == parse_vespa_response(
+        valid_vespa_search_response
+    )
+
+
+def test_whether_a_cbor_response_parses_like_a_json_one(valid_vespa_search_response):
+    cbor2 = pytest.importorskip("cbor2")
+    content = cbor2.dumps(valid_vespa_search_response.json)
+    decoded = decode_vespa_response(content, status_code=200, url="")
+
+    assert len(content) < len(encode_vespa_request_body(decoded.json))
+    assert decoded.json == valid_vespa_search_response.json
+    assert parse_vespa_response(decoded) == parse_vespa_response(
+        valid_vespa_search_response
+    )
+
+
+def test_whether_a_malformed_cbor_response_is_kept_as_its_message():
+    pytest.importorskip("cbor2")
+    decoded = decode_vespa_response(b"\xa1\x61", status_code=502, url="")
+
+    assert "message" in decoded.json
+
+
+def test_whether_a_degraded_response_is_flagged(valid_vespa_search_response):
+    assert not parse_vespa_response(valid_vespa_search_response).degraded
+
+    valid_vespa_search_response.json["root"]["coverage"] = {
+        "degraded": {"match-phase": False, "timeout": True}
+    }
+    assert parse_vespa_response(valid_vespa_search_response).degraded
+
+
+def vespa_search_response_from_test_documents(name: str) -> VespaResponse:
+    """A grouped search response over the documents and passages fed to vespa"""
+    test_documents = "tests/local_vespa/test_documents"
+    with open(f"{test_documents}/family_document.{name}.json") as f:
+        document = json.load(f)
+    with open(f"{test_documents}/document_passage.{name}.json") as f:
+        passages = json.load(f)
+    family_fields = {
+        key: value
+        for key, value in document["fields"].items()
+        if key not in ("concepts_v2", "concept_counts", "document_title")
+    }
+    hits = [
+        {
+            "id": document["id"],
+            "relevance": 2.5,
+            "fields": document["fields"] | {SCHEMA_NAME_FIELD_NAME: "family_document"},
+        }
+    ] + [
+        {
+            "id": passage["id"],
+            "relevance": 1.5,
+            "fields": family_fields
+            | passage["fields"]
+            | {SCHEMA_NAME_FIELD_NAME: "document_passage"},
+        }
+        for passage in passages
+    ]
+    family = {
+        "value": document["fields"]["family_import_id"],
+        "relevance": 2.5,
+        "fields": {"count()": len(hits)},
+        "children": [{"continuation": {"next": "next"}, "children": hits}],
+    }
+    response_json = {
+        "root": {
+            "fields": {"totalCount": len(hits)},
+            "children": [
+                {"fields": {"count()": 1}, "children": [{"children": [family]}]}
+            ],
+        }
+    }
+    return VespaResponse(json=response_json, status_code=200, url="", operation_type="")
+
+
+def family_hits_json(vespa_response: VespaResponse) -> list[dict]:
+    """The hits of the first family in a grouped search response"""
+    root = vespa_response.json["root"]
+    return root["children"][0]["children"][0]["children"][0]["children"][0]["children"]
+
+
+def test_whether_a_trusted_parse_matches_a_validated_one(
+    valid_vespa_search_response, empty_vespa_search_response
+):
+    for vespa_response in (
+        valid_vespa_search_response,
+        empty_vespa_search_response,
+        vespa_search_response_from_test_documents("AF.document.009MHNWR.n0007"),
+    ):
+        validated = parse_vespa_response(vespa_response)
+        trusted = parse_vespa_response(vespa_response, trusted=True)
+
+        assert trusted == validated
+        assert trusted.model_dump_json() == validated.model_dump_json()
+        assert trusted.model_fields_set == validated.model_fields_set
+        for trusted_family, family in zip(trusted.results, validated.results):
+            for trusted_hit, hit in zip(trusted_family.hits, family.hits):
+                assert type(trusted_hit) is type(hit)
+                assert trusted_hit.model_fields_set == hit.model_fields_set
+
+
+def test_whether_a_trusted_parse_keeps_every_hit():
+    vespa_response = vespa_search_response_from_test_documents(
+        "AF.document.009MHNWR.n0007"
+    )
+    response = parse_vespa_response(vespa_response, trusted=True)
+
+    (family,) = response.results
+    assert len(family.hits) == 1457
+    assert any(hit.spans for hit in family.hits[1:])
+    assert family.hits[0].concepts_v2
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+def test_whether_a_lazy_parse_matches_a_validated_one(
+    valid_vespa_search_response, trusted
+):
+    validated = parse_vespa_response(valid_vespa_search_response)
+    lazy = parse_vespa_response(valid_vespa_search_response, trusted=trusted, lazy=True)
+
+    assert isinstance(lazy.results, LazyList)
+    assert lazy.results[0].hits[-1] == validated.results[0].hits[-1]
+    assert [family.id for family in lazy.results] == [
+        family.id for family in validated.results
+    ]
+    assert lazy == validated
+    assert lazy.model_dump() == validated.model_dump()
+    assert lazy.model_dump_json() == validated.model_dump_json()
+    assert pickle.loads(pickle.dumps(lazy)) == validated
+
+
+def test_whether_a_lazy_parse_only_builds_what_is_read():
+    vespa_response = vespa_search_response_from_test_documents(
+        "AF.document.009MHNWR.n0007"
+    )
+    response = parse_vespa_response(vespa_response, lazy=True)
+
+    (family,) = response.results
+    assert isinstance(family.hits[1], Passage)
+    built = [type(hit) is not dict for hit in family.hits._items]
+    assert built[:3] == [False, True, False]
+    assert sum(built) == 1
+    assert len(family.hits) == 1457
+
+
+def test_whether_a_lazy_list_behaves_like_a_list():
+    lazy = LazyList([{"n": 1}, {"n": 2}, {"n": 3}], lambda raw: raw["n"] * 10)
+
+    assert len(lazy) == 3
+    assert lazy[-1] == 30
+    assert lazy[:2] == [10, 20]
+    assert list(reversed(lazy)) == [30, 20, 10]
+    assert 20 in lazy
+    assert lazy == [10, 20, 30]
+    assert lazy.index(20) == 1
+    assert repr(lazy) == "[10, 20, 30]"
+    assert type(lazy.copy()) is list
+    assert copy.copy(lazy) == [10, 20, 30]
+
+
+def test_whether_a_lazy_list_never_shows_its_raw_json():
+    lazy = LazyList([{"n": 1}, {"n": 2}], lambda raw: raw["n"] * 10)
+
+    with pytest.raises(TypeError):
+        json.dumps(lazy)
+    assert json.dumps(list(lazy)) == "[10, 20]"
+    assert [*lazy] == sorted(lazy) == [10, 20]
+    assert not isinstance(lazy, list)
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+def test_whether_hits_in_a_family_share_its_fields(trusted):
+    vespa_response = vespa_search_response_from_test_documents(
+        "AF.document.009MHNWR.n0007"
+    )
+    response = parse_vespa_response(vespa_response, trusted=trusted)
+
+    (family,) = response.results
+    document, passage, *passages = family.hits
+    assert family == parse_vespa_response(vespa_response).results[0]
+    for name in ("family_description", "family_publication_ts"):
+        assert getattr(document, name) is not None
+        assert all(getattr(p, name) is getattr(document, name) for p in passages)
+    assert document.metadata
+    assert all(p.metadata == document.metadata for p in passages)
+    assert all(p.metadata is not document.metadata for p in passages)
+    passage_json = family_hits_json(vespa_response)[1]
+    assert passage.model_fields_set == (
+        Passage.from_vespa_response(passage_json).model_fields_set
+    )
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+def test_whether_changing_a_hit_leaves_its_siblings_alone(trusted):
+    vespa_response = vespa_search_response_from_test_documents(
+        "AF.document.009MHNWR.n0007"
+    )
+    response = parse_vespa_response(vespa_response, trusted=trusted)
+
+    (family,) = response.results
+    document, passage, *_ = family.hits
+    sibling_metadata = [dict(item) for item in passage.metadata]
+    sibling_geographies = list(passage.family_geographies)
+
+    document.metadata[0]["value"] = "changed"
+    document.metadata.append({"name": "added", "value": "added"})
+    document.family_geographies.append("XAA")
+
+    assert passage.metadata == sibling_metadata
+    assert passage.family_geographies == sibling_geographies
+
+
+def test_whether_hits_with_different_family_fields_are_not_shared():
+    family_fields = SharedFamilyFields()
+    response_hit = {
+        "id": "id:doc_search:document_passage::CCLW.executive.1.1.1",
+        "fields": {
+            "family_name": "A family",
+            "text_block": "Some text",
+            "text_block_id": "1",
+            "text_block_type": "Text",
+        },
+    }
+    renamed_hit = response_hit | {
+        "fields": response_hit["fields"] | {"family_name": "Another family"}
+    }
+
+    first = Passage.from_vespa_response(response_hit, family_fields)
+    renamed = Passage.from_vespa_response(renamed_hit, family_fields)
+    again = Passage.from_vespa_response(renamed_hit, family_fields)
+
+    assert first.family_name == "A family"
+    assert renamed.family_name == "Another family"
+    assert again == renamed == Passage.from_vespa_response(renamed_hit)
+
+
+@pytest.mark.parametrize("trusted", [False, True])
+def test_whether_a_family_parses_its_publication_time_once(trusted, monkeypatch):
+    vespa_response = vespa_search_response_from_test_documents(
+        "AF.document.009MHNWR.n0007"
+    )
+    parsed = []
+    parse = search_models._parse_publication_ts
+    monkeypatch.setattr(
+        search_models,
+        "_parse_publication_ts",
+        lambda raw: parsed.append(raw) or parse(raw),
+    )
+
+    (family,) = parse_vespa_response(vespa_response, trusted=trusted).results
+
+    assert len(family.hits) > 1
+    assert len(parsed) == 1
+    assert family.hits[0].family_publication_ts == parse(parsed[0])
+
+
+@pytest.mark.parametrize("trusted, lazy", [(False, False), (True, False), (True, True)])
+def test_whether_a_projected_parse_only_builds_the_projected_fields(trusted, lazy):
+    vespa_response = vespa_search_response_from_test_documents(
+        "AF.document.009MHNWR.n0007"
+    )
+    summary_fields = summary_field_projection(
+        build_vespa_request_body(
+            SearchParameters(summary_fields=["family_name", "text_block_page"])
+        )
+    )
+
+    full = parse_vespa_response(vespa_response)
+    projected = parse_vespa_response(
+        vespa_response, trusted=trusted, lazy=lazy, summary_fields=summary_fields
+    )
+
+    assert [family.id for family in projected.results] == [
+        family.id for family in full.results
+    ]
+    for full_hit, hit in zip(full.results[0].hits, projected.results[0].hits):
+        assert type(hit) is type(full_hit)
+        assert hit.family_name == full_hit.family_name
+        assert hit.family_description is None
+        assert hit.metadata is None
+        if isinstance(hit, Passage):
+            assert hit.text_block == full_hit.text_block
+            assert hit.text_block_page == full_hit.text_block_page
+            assert hit.spans == []
+    assert projected == parse_vespa_response(
+        vespa_response, summary_fields=summary_fields
+    )
+
+
+def test_whether_constructing_without_validation_matches_validation():
+    values = {
+        "id": "concept_1",
+        "name": "flood",
+        "parent_concepts": [{"name": "hazard", "id": "concept_0"}],
+        "parent_concept_ids_flat": "concept_0,",
+        "model": "flood_model",
+        "end": 10,
+        "start": 5,
+        "timestamp": datetime(2024, 1, 1),
+    }
+    constructed = construct_without_validation(Passage.Concept, values)
+
+    assert constructed == Passage.Concept(**values)
+    assert constructed.model_fields_set == Passage.Concept(**values).model_fields_set
+
+
+def test_whether_a_non_json_response_body_is_kept_as_its_message():
+    decoded = decode_vespa_response(b"Bad Gateway", status_code=502, url="")
+
+    assert decoded.json == {"message": "Bad Gateway"}
+    with pytest.raises(FetchError):
+        parse_vespa_response(decoded)
+
+
 def test_whether_valid_get_document_response_is_parsed(valid_get_document_response):
     assert Hit.from_vespa_response(valid_get_document_response)
 
@@ -1054,3 +1392,72 @@ def test_document_passage_parse_from_valid_response():
 )
 def test_extract_schema_name(hit, expected):
     assert extract_schema_name(hit) == expected
+
+
+def load_vespa_search_response(name: str) -> VespaResponse:
+    with open(f"tests/test_data/search_responses/{name}.json") as f:
+        response_json = json.load(f)
+    return VespaResponse(json=response_json, status_code=200, url="", operation_type="")
+
+
+def in_chunks(content: bytes, size: int) -> list[bytes]:
+    return [content[i : i + size] for i in range(0, len(content), size)]
+
+
+@pytest.mark.parametrize("name", ["search_response", "empty_search_response"])
+@pytest.mark.parametrize("chunk_size", [1, 7, 4096, 1 << 30])
+@pytest.mark.parametrize("trusted", [False, True])
+def test_whether_a_streamed_response_parses_like_a_whole_one(name, chunk_size, trusted):
+    vespa_response = load_vespa_search_response(name)
+    expected = parse_vespa_response(vespa_response)
+    content = json.dumps(vespa_response.json, indent=2).encode("utf-8")
+
+    stream = SearchResponseStream(in_chunks(content, chunk_size), trusted=trusted)
+    families = list(stream)
+
+    assert families == list(expected.results)
+    assert stream.response.results == []
+    assert stream.response.model_copy(update={"results": families}) == expected
+
+
+def test_whether_a_large_family_is_streamed_whole():
+    vespa_response = vespa_search_response_from_test_documents(
+        "AF.document.009MHNWR.n0007"
+    )
+    expected = parse_vespa_response(vespa_response)
+    content = json.dumps(vespa_response.json).encode("utf-8")
+
+    families = list(SearchResponseStream(in_chunks(content, 4096)))
+
+    assert families == list(expected.results)
+
+
+def test_whether_characters_split_across_chunks_are_kept():
+    vespa_response = load_vespa_search_response("search_response")
+    family = vespa_response.json["root"]["children"][0]["children"][0]["children"][0]
+    family["value"] = "famille-été-日本"
+    content = json.dumps(vespa_response.json, ensure_ascii=False).encode("utf-8")
+
+    families = list(SearchResponseStream(in_chunks(content, 1)))
+
+    assert families[0].id == "famille-été-日本"
+    assert families == list(parse_vespa_response(vespa_response).results)
+
+
+def test_whether_a_truncated_response_raises():
+    content = json.dumps(load_vespa_search_response("search_response").json)
+    truncated = content.encode("utf-8")[: len(content) // 2]
+
+    with pytest.raises(ValueError):
+        list(SearchResponseStream(in_chunks(truncated, 1024)))
+
+
+def test_whether_a_failed_response_raises_and_closes():
+    closed = []
+    stream = SearchResponseStream(
+        [b"{}"], status_code=500, on_close=lambda: closed.append(True)
+    )
+
+    with pytest.raises(FetchError):
+        list(stream)
+    assert closed == [True]
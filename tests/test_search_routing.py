@@ -0,0 +1,115 @@
+import time
+
+import pytest
+
+from cpr_sdk.search_routing import EndpointRouter, RoutingPolicy
+
+URLS = ["http://a", "http://b", "http://c"]
+
+
+def stats_by_url(router: EndpointRouter):
+    return {stats.url: stats for stats in router.stats}
+
+
+def test_router_tries_every_endpoint_before_it_has_latencies():
+    router = EndpointRouter(URLS, RoutingPolicy(seed=0))
+
+    chosen = {router.acquire() for _ in range(3)}
+
+    assert chosen == set(URLS)
+    assert all(stats.in_flight == 1 for stats in router.stats)
+
+
+def test_router_prefers_faster_endpoints():
+    router = EndpointRouter(URLS, RoutingPolicy(seed=0))
+    latencies_s = {"http://a": 0.01, "http://b": 0.01, "http://c": 1.0}
+
+    for _ in range(100):
+        url = router.acquire()
+        router.release(url, latencies_s[url])
+
+    stats = stats_by_url(router)
+    assert stats["http://c"].requests < stats["http://a"].requests
+    assert stats["http://c"].requests < stats["http://b"].requests
+    assert stats["http://a"].ewma_latency_s == pytest.approx(0.01)
+
+
+def test_router_weighs_latency_by_in_flight_queries():
+    router = EndpointRouter(URLS[:2], RoutingPolicy(ewma_alpha=1.0))
+    router.release(router.acquire(), 0.01)
+    router.release(router.acquire(), 0.02)
+
+    assert [router.acquire() for _ in range(3)] == [
+        "http://a",
+        "http://b",
+        "http://a",
+    ]
+
+
+def test_router_assumes_unmeasured_endpoints_are_as_fast_as_the_others():
+    router = EndpointRouter(URLS[:2], RoutingPolicy(ewma_alpha=1.0))
+    router.release(router.acquire(), 0.01)
+
+    # http://b has no latency yet, but isn't sent every query until it has one
+    assert [router.acquire() for _ in range(4)] == [
+        "http://a",
+        "http://b",
+        "http://a",
+        "http://b",
+    ]
+
+
+def test_router_ignores_the_latency_of_cancelled_queries():
+    router = EndpointRouter(URLS[:1])
+    router.release(router.acquire(), 0.01)
+
+    router.release(router.acquire(), None)
+
+    (stats,) = router.stats
+    assert stats.ewma_latency_s == pytest.approx(0.01)
+    assert stats.in_flight == 0 and stats.failures == 0
+
+
+def test_router_ejects_failing_endpoints():
+    router = EndpointRouter(
+        URLS[:2], RoutingPolicy(failures_to_eject=2, ejection_s=0.05)
+    )
+    router.release("http://a", 0.01, failed=True)
+    assert not stats_by_url(router)["http://a"].ejected
+
+    router.release("http://a", 0.01, failed=True)
+
+    stats = stats_by_url(router)["http://a"]
+    assert stats.ejected and stats.ejections == 1 and stats.failures == 2
+    assert {router.acquire() for _ in range(5)} == {"http://b"}
+
+    time.sleep(0.05)
+    assert not stats_by_url(router)["http://a"].ejected
+    # A returning endpoint has no latency, so it's tried as soon as it's the
+    # cheapest, and a single failure ejects it again
+    assert router.acquire() == "http://a"
+    router.release("http://a", 0.01, failed=True)
+    assert stats_by_url(router)["http://a"].ejections == 2
+
+
+def test_router_falls_back_when_every_endpoint_is_ejected():
+    router = EndpointRouter(URLS[:2], RoutingPolicy(failures_to_eject=1))
+    router.release("http://b", 0.01, failed=True)
+    router.release("http://a", 0.01, failed=True)
+
+    assert router.acquire() == "http://b"
+
+
+@pytest.mark.parametrize("urls", [[], ["http://a", "http://a"]])
+def test_router_validates_endpoints(urls):
+    with pytest.raises(ValueError):
+        EndpointRouter(urls)
+
+
+@pytest.mark.parametrize(
+    "kwargs",
+    [{"ewma_alpha": 0}, {"failures_to_eject": 0}, {"ejection_s": -1}],
+)
+def test_routing_policy_validates_settings(kwargs):
+    with pytest.raises(ValueError):
+        RoutingPolicy(**kwargs)
@@ -0,0 +1,114 @@
+from pathlib import Path
+
+import pytest
+
+from cpr_sdk.search_adaptors import VespaSearchAdapter
+from cpr_sdk.vespa import VESPA_CERT_CACHE, VespaCertCache, find_vespa_cert_paths
+
+
+@pytest.fixture
+def vespa_home(tmp_path, monkeypatch):
+    """A home directory with certs for a vespa application"""
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+    vespa_directory = tmp_path / ".vespa"
+    write_application(vespa_directory, "tenant.app.default")
+    return vespa_directory
+
+
+def write_application(vespa_directory: Path, application: str) -> Path:
+    cert_directory = vespa_directory / application
+    cert_directory.mkdir(parents=True)
+    (cert_directory / "data-plane-public-cert.pem").write_text("cert")
+    (cert_directory / "data-plane-private-key.pem").write_text("key")
+    (vespa_directory / "config.yaml").write_text(f"application: {application}\n")
+    return cert_directory
+
+
+@pytest.fixture
+def fresh_cert_cache(monkeypatch):
+    """The process-wide cert cache, emptied and checking files on every lookup"""
+    monkeypatch.setattr(VESPA_CERT_CACHE, "check_interval_s", 0.0)
+    VESPA_CERT_CACHE.clear()
+    yield VESPA_CERT_CACHE
+    VESPA_CERT_CACHE.clear()
+
+
+def test_cert_cache_finds_paths_once(vespa_home):
+    cache = VespaCertCache(check_interval_s=0.0)
+
+    for _ in range(3):
+        cert_path, key_path = cache.cert_paths()
+
+    cert_directory = vespa_home / "tenant.app.default"
+    assert cert_path == str(cert_directory / "data-plane-public-cert.pem")
+    assert key_path == str(cert_directory / "data-plane-private-key.pem")
+    assert cache.scans == 1
+
+
+def test_cert_cache_picks_up_a_new_application(vespa_home):
+    cache = VespaCertCache(check_interval_s=0.0)
+    cache.cert_paths()
+
+    cert_directory = write_application(vespa_home, "tenant.other-app.default")
+
+    assert cache.cert_paths()[0] == str(cert_directory / "data-plane-public-cert.pem")
+    assert cache.scans == 2
+
+
+def test_cert_cache_only_checks_files_after_the_interval(vespa_home):
+    cache = VespaCertCache(check_interval_s=60.0)
+    original = cache.cert_paths()
+
+    write_application(vespa_home, "tenant.other-app.default")
+
+    assert cache.cert_paths() == original
+    cache.clear()
+    assert cache.scans == 0
+    assert cache.cert_paths() != original
+    assert cache.scans == 1
+
+
+def test_cert_cache_fingerprint_changes_when_certs_are_rotated(vespa_home):
+    cache = VespaCertCache(check_interval_s=0.0)
+    cert_path, key_path = cache.cert_paths()
+    fingerprint = cache.fingerprint(cert_path, key_path)
+    assert cache.fingerprint(cert_path, key_path) == fingerprint
+
+    Path(cert_path).write_text("rotated cert")
+
+    assert cache.fingerprint(cert_path, key_path) != fingerprint
+    assert cache.fingerprint(None, None) == ()
+
+
+def test_cert_cache_without_a_vespa_directory(tmp_path, monkeypatch):
+    monkeypatch.setattr(Path, "home", lambda: tmp_path)
+
+    assert VespaCertCache().cert_paths() == (None, None)
+
+
+def test_adapters_share_the_process_wide_cert_cache(vespa_home, fresh_cert_cache):
+    adaptors = [VespaSearchAdapter("https://example.com") for _ in range(5)]
+
+    assert fresh_cert_cache.scans == 1
+    assert find_vespa_cert_paths() == (adaptors[0].client.cert, adaptors[0].client.key)
+
+
+def test_adapter_reopens_its_client_when_certs_change(vespa_home, fresh_cert_cache):
+    adaptor = VespaSearchAdapter("https://example.com")
+    opened = []
+
+    def get_sync_session():
+        opened.append(object())
+        return opened[-1]
+
+    adaptor.client.get_sync_session = get_sync_session
+    http_client = adaptor.get_sync_http_client()
+    assert adaptor.get_sync_http_client() is http_client
+
+    Path(adaptor.client.cert).write_text("rotated cert")
+    assert adaptor.get_sync_http_client() is not http_client
+    assert len(opened) == 2
+
+    cert_directory = write_application(vespa_home, "tenant.other-app.default")
+    adaptor._credentials()
+    assert adaptor.client.cert == str(cert_directory / "data-plane-public-cert.pem")
@@ -7,13 +7,14 @@ from cpr_sdk.models.search import (
     ConceptV2DocumentFilter,
     ConceptV2PassageFilter,
     Filters,
+    MetadataFilter,
     OperandTypeEnum,
     SearchParameters,
     sort_fields,
     sort_orders,
 )
 from cpr_sdk.vespa import VespaErrorDetails
-from cpr_sdk.yql_builder import YQLBuilder
+from cpr_sdk.yql_builder import YQLBuilder, _compiled_where_clause
 
 
 def test_whether_document_only_search_ignores_passages_in_yql():
@@ -82,6 +83,13 @@ def test_sorting_does_not_appear_in_yql():
     assert "order" not in YQLBuilder(params).to_str()
 
 
+def test_summary_class_appears_in_yql():
+    params = SearchParameters(query_string="test")
+    assert "summary(search_summary)" in YQLBuilder(params).to_str()
+    params = SearchParameters(query_string="test", summary_class="ids_summary")
+    assert "summary(ids_summary)" in YQLBuilder(params).to_str()
+
+
 def test_vespa_error_details():
     # With invalid query parameter code
     err_object = [
@@ -425,3 +433,40 @@ def test_concept_v2_filters_appear_in_yql():
         yql
         == "select * from sources family_document, document_passage where ( (userInput(@query_string)) ) and (spans contains sameElement(concepts_v2_flat matches 'Q374')) and (concepts_v2 contains sameElement(concept_id contains 'nhhzwfva', count = 1)) limit 0 | all( group(family_import_id) output(count()) max(100) each( output(count()) max(10) each( output( summary(search_summary) ) ) ) )"
     )
+
+
+def test_yql_with_continuation_sort_and_multiline_filters():
+    """Test the assembled YQL is normalised, including inside filter values"""
+    params = SearchParameters(
+        query_string="",
+        family_ids=["CCLW.family.10014.0"],
+        metadata=[MetadataFilter(name="family.sector", value="Price  and\n Tax")],
+        continuation_tokens=["BKAAAAABKBGA"],
+        sort_by="date",
+        sort_order="ascending",
+    )
+    yql = YQLBuilder(params).to_str()
+    assert (
+        yql
+        == "select * from sources family_document, document_passage where ( true ) and (family_import_id in('CCLW.family.10014.0')) and ( ( metadata contains sameElement( name contains 'family.sector', value contains 'Price and Tax' ) ) ) limit 0 | { 'continuations': ['BKAAAAABKBGA'] } all( group(family_import_id) output(count()) max(100) order(+max(family_publication_ts)) each( output(count()) max(10) each( output( summary(search_summary) ) ) ) )"
+    )
+    assert " ".join(YQLBuilder(params).build_where_clause().split()) in yql
+
+
+def test_yql_fragments_are_memoised_on_filter_values():
+    """Test that equal filters reuse the YQL built for them, and others don't"""
+
+    def params(geography: str) -> SearchParameters:
+        return SearchParameters(
+            query_string="",
+            filters=Filters(family_geography=[geography]),
+            family_ids=[f"CCLW.family.{i}.0" for i in range(1000)],
+        )
+
+    first = YQLBuilder(params("GBR")).to_str()
+    hits = _compiled_where_clause.cache_info().hits
+    assert YQLBuilder(params("GBR")).to_str() == first
+    assert _compiled_where_clause.cache_info().hits == hits + 1
+
+    other = YQLBuilder(params("FRA")).to_str()
+    assert other == first.replace('"GBR"', '"FRA"')